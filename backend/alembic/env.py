@@ -14,6 +14,8 @@ from app.core.config import settings
 from app.models import Project, DataFile, SpatialAnalysis, ValidationResult
 from app.models.transformation import Transformation
 from app.models.export import Export
+from app.models.diagnosis_job import DiagnosisJob
+from app.models.diagnosis_cache import DiagnosisCacheEntry
 
 # this is the Alembic Config object
 config = context.config
@@ -1,42 +1,34 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
 from typing import Optional
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.models.data_file import DataFile
 from app.models.spatial_analysis import SpatialAnalysis
 from app.schemas.analysis import AnalysisRequest, AnalysisResponse, AnalysisPreview, AnalysisListResponse, AnalysisListItem
+from app.models.diagnosis_job import DiagnosisJob
+from app.schemas.diagnosis_job import DiagnosisJobResponse
 from app.services.spatial.file_loader import FileLoader
-from app.services.inference.crs_inference import CRSInferenceEngine
-from app.services.inference.unit_detector import UnitDetector
-from app.services.inference.origin_detector import OriginDetector
-from app.services.inference.scale_estimator import ScaleEstimator
-from app.services.validation.geometric_validator import GeometricValidator
+from app.services.spatial.preview import PreviewBuilder
+from app.services.spatial.vector_tiles import TileLayer, render_tile, is_valid_tile, MVT_MEDIA_TYPE
 from app.services.validation.quality_assessor import QualityAssessor
-from app.services.validation.error_calculator import ErrorCalculator
-from app.services.validation.use_case_assessor import UseCaseAssessor
-from app.models.validation_result import ValidationResult
+from app.services.diagnosis.diagnosis_service import DiagnosisService, clean_float_value
+from app.services.diagnosis.job_queue import job_queue
 import json
-import math
 
 router = APIRouter()
 
-def clean_float_value(value: float | None) -> float | None:
-    """
-    Limpia valores float inválidos (nan, inf, -inf) y los convierte a None
-    para que sean JSON-compliant
-    """
-    if value is None:
-        return None
-    if math.isnan(value) or math.isinf(value):
-        return None
-    return value
-
-@router.post("/analysis/{file_id}/diagnose", response_model=AnalysisResponse)
+@router.post("/analysis/{file_id}/diagnose", response_model=DiagnosisJobResponse, status_code=202)
 async def diagnose_file(
     file_id: int,
     db: Session = Depends(get_db)
 ):
-    """Ejecuta análisis de detección CRS y diagnóstico básico"""
+    """Encola el análisis de detección CRS y diagnóstico básico
+
+    El diagnóstico se ejecuta en segundo plano; el progreso y el resultado se
+    consultan en GET /analysis/jobs/{job_id}.
+    """
     
     # Obtener archivo
     file = db.query(DataFile).filter(DataFile.id == file_id).first()
@@ -44,105 +36,45 @@ async def diagnose_file(
         raise HTTPException(status_code=404, detail="Archivo no encontrado")
     
     try:
-        # Cargar archivo
-        loader = FileLoader(file.ruta_almacenamiento)
-        gdf = loader.load()
-        
-        if gdf is None:
-            raise HTTPException(status_code=500, detail="Error: No se pudo cargar el archivo")
-        
-        # Detectar CRS
-        crs_engine = CRSInferenceEngine(gdf)
-        crs_results = crs_engine.infer_crs()
-        
-        # Detectar unidades
-        unit_detector = UnitDetector(gdf.total_bounds, crs_results['crs_detectado'])
-        unit_results = unit_detector.detect_units()
-        
-        # Detectar origen
-        origin_detector = OriginDetector(gdf, crs_results['crs_detectado'])
-        origin_results = origin_detector.detect_origin()
-        
-        # Estimar escala
-        scale_estimator = ScaleEstimator(gdf)
-        scale_results = scale_estimator.estimate_scale()
-        
-        # Calcular errores
-        error_calculator = ErrorCalculator(gdf)
-        error_results = error_calculator.calculate_errors(
-            crs_detectado=crs_results['crs_detectado'],
-            escala_estimada=scale_results.get('escala_estimada')
-        )
-        
-        # Validación geométrica
-        validator = GeometricValidator(gdf)
-        validation_results = validator.validate()
-        
-        # Evaluar calidad
-        analysis_data = {
-            'crs_detectado': crs_results['crs_detectado'],
-            'crs_confidence': crs_results['confidence'],
-            'unidades_detectadas': unit_results['unidades'],
-            'origen_detectado': origin_results['origen'],
-            'escala_estimada': scale_results.get('escala_estimada'),
-            'error_planimetrico': error_results.get('error_planimetrico'),
-            'error_altimetrico': error_results.get('error_altimetrico'),
-            'validation': validation_results
-        }
-        
-        quality_assessor = QualityAssessor()
-        quality_results = quality_assessor.assess(analysis_data)
-        
-        # Evaluar casos de uso
-        use_case_assessor = UseCaseAssessor()
-        use_case_results = use_case_assessor.assess_use_cases(analysis_data)
-        
-        # Guardar análisis en BD
-        # Limpiar valores float inválidos antes de guardar
-        analysis = SpatialAnalysis(
-            archivo_id=file_id,
-            crs_detectado=crs_results['crs_detectado'],
-            crs_original=str(gdf.crs) if gdf.crs else None,
-            unidades_detectadas=unit_results['unidades'],
-            origen_detectado=origin_results['origen'],
-            escala_estimada=clean_float_value(scale_results.get('escala_estimada')),
-            error_planimetrico=clean_float_value(error_results.get('error_planimetrico')),
-            error_altimetrico=clean_float_value(error_results.get('error_altimetrico')),
-            confiabilidad=quality_results['confiabilidad']
-        )
-        db.add(analysis)
-        db.flush()  # Para obtener el ID
-        
-        # Guardar resultados de validación por caso de uso
-        validation_results_data = use_case_assessor.create_validation_results(analysis.id, use_case_results)
-        for vr_data in validation_results_data:
-            validation_result = ValidationResult(**vr_data)
-            db.add(validation_result)
-        
-        db.commit()
-        db.refresh(analysis)
-        
-        # Preparar respuesta
-        response = AnalysisResponse(
-            id=analysis.id,
-            archivo_id=analysis.archivo_id,
-            crs_detectado=analysis.crs_detectado,
-            crs_original=analysis.crs_original,
-            unidades_detectadas=analysis.unidades_detectadas,
-            origen_detectado=analysis.origen_detectado,
-            escala_estimada=clean_float_value(analysis.escala_estimada),
-            error_planimetrico=clean_float_value(analysis.error_planimetrico),
-            error_altimetrico=clean_float_value(analysis.error_altimetrico),
-            confiabilidad=analysis.confiabilidad.value,
-            fecha_analisis=analysis.fecha_analisis,
-            recomendaciones=quality_results['recomendaciones'],
-            explicacion_tecnica=quality_results['explicacion_tecnica']
-        )
-        
-        return response
-        
+        job = job_queue.create_job(db, file_id)
+        job_queue.submit(job.id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error en análisis: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error encolando análisis: {str(e)}")
+    
+    db.refresh(job)
+    return _job_response(job)
+
+@router.get("/analysis/jobs/{job_id}", response_model=DiagnosisJobResponse)
+async def get_diagnosis_job(
+    job_id: str,
+    db: Session = Depends(get_db)
+):
+    """Obtiene el estado y progreso por etapa de un trabajo de diagnóstico"""
+    job = db.query(DiagnosisJob).filter(DiagnosisJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Trabajo de diagnóstico no encontrado")
+    
+    return _job_response(job)
+
+def _job_response(job: DiagnosisJob) -> DiagnosisJobResponse:
+    """Convierte un trabajo de diagnóstico en su respuesta de API"""
+    progreso = json.loads(job.progreso) if job.progreso else {}
+    completadas = sum(1 for estado in progreso.values() if estado == 'completado')
+    porcentaje = (completadas / len(DiagnosisService.STAGES)) * 100
+    
+    return DiagnosisJobResponse(
+        id=job.id,
+        archivo_id=job.archivo_id,
+        estado=job.estado,
+        etapa_actual=job.etapa_actual,
+        progreso=progreso,
+        porcentaje=porcentaje,
+        analisis_id=job.analisis_id,
+        resultado=AnalysisResponse.model_validate_json(job.resultado) if job.resultado else None,
+        error=job.error,
+        fecha_creacion=job.fecha_creacion,
+        fecha_actualizacion=job.fecha_actualizacion
+    )
 
 @router.get("/analyses", response_model=AnalysisListResponse)
 async def list_analyses(
@@ -228,9 +160,17 @@ async def get_analysis(
 @router.get("/analysis/{analysis_id}/preview", response_model=AnalysisPreview)
 async def get_preview(
     analysis_id: int,
+    zoom: Optional[int] = Query(None, ge=0, le=24, description="Zoom de destino: define la tolerancia de simplificación"),
+    tolerancia: Optional[float] = Query(None, gt=0, description="Tolerancia de simplificación en unidades del CRS (prioritaria sobre zoom)"),
+    max_vertices: Optional[int] = Query(None, gt=0, description="Presupuesto de vértices de la vista previa"),
+    columnas: Optional[str] = Query(None, description="Atributos a incluir, separados por comas (por defecto ninguno)"),
     db: Session = Depends(get_db)
 ):
-    """Vista previa de datos para visualización"""
+    """Vista previa de datos para visualización
+    
+    Las geometrías se simplifican y sus coordenadas se redondean según el zoom,
+    y el GeoJSON se envía por bloques sin construirlo completo en memoria.
+    """
     analysis = db.query(SpatialAnalysis).filter(SpatialAnalysis.id == analysis_id).first()
     if not analysis:
         raise HTTPException(status_code=404, detail="Análisis no encontrado")
@@ -240,9 +180,10 @@ async def get_preview(
         raise HTTPException(status_code=404, detail="Archivo no encontrado")
     
     try:
-        # Cargar archivo
-        loader = FileLoader(file.ruta_almacenamiento)
-        gdf = loader.load()
+        # Cargar archivo (solo los atributos pedidos)
+        columns = [c.strip() for c in columnas.split(',') if c.strip()] if columnas else []
+        loader = FileLoader(file.ruta_almacenamiento, optimized_path=file.ruta_optimizada)
+        gdf = loader.load(columns=columns)
         
         if gdf is None:
             raise HTTPException(status_code=500, detail="Error: No se pudo cargar el archivo para preview")
@@ -250,12 +191,11 @@ async def get_preview(
         # Aplicar CRS detectado si existe
         if analysis.crs_detectado:
             try:
-                gdf.set_crs(analysis.crs_detectado, allow_override=True)
-            except:
+                gdf = gdf.set_crs(analysis.crs_detectado, allow_override=True)
+            except Exception:
                 pass
         
-        # Convertir a GeoJSON
-        geojson = json.loads(gdf.to_json())
+        preview = PreviewBuilder(gdf, zoom=zoom, tolerance=tolerancia, max_vertices=max_vertices).build()
         
         # Obtener bounds y limpiar valores inválidos
         bounds_raw = gdf.total_bounds.tolist()
@@ -264,11 +204,50 @@ async def get_preview(
         # Obtener CRS aplicado de forma segura
         crs_aplicado = analysis.crs_detectado or (str(gdf.crs) if gdf.crs else None) or "unknown"
         
-        return AnalysisPreview(
-            geojson=geojson,
-            crs_aplicado=crs_aplicado,
-            bounds=bounds
-        )
-        
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generando preview: {str(e)}")
+    
+    return StreamingResponse(preview.iter_geojson(crs_aplicado, bounds), media_type="application/json")
+
+@router.get("/analysis/{analysis_id}/tiles/{z}/{x}/{y}.mvt")
+async def get_analysis_tile(
+    analysis_id: int,
+    z: int,
+    x: int,
+    y: int,
+    db: Session = Depends(get_db)
+):
+    """Tesela vectorial (MVT) de la capa analizada, en el esquema XYZ de Web Mercator"""
+    if not is_valid_tile(z, x, y):
+        raise HTTPException(status_code=400, detail=f"Tesela inválida: {z}/{x}/{y}")
+    
+    analysis = db.query(SpatialAnalysis).filter(SpatialAnalysis.id == analysis_id).first()
+    if not analysis:
+        raise HTTPException(status_code=404, detail="Análisis no encontrado")
+    
+    file = db.query(DataFile).filter(DataFile.id == analysis.archivo_id).first()
+    if not file:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    
+    ruta, ruta_optimizada, crs_detectado = file.ruta_almacenamiento, file.ruta_optimizada, analysis.crs_detectado
+    
+    def build_layer() -> TileLayer:
+        gdf = FileLoader(ruta, optimized_path=ruta_optimizada).load(geometry_only=True)
+        if gdf is None:
+            raise ValueError("No se pudo cargar el archivo")
+        if crs_detectado:
+            gdf = gdf.set_crs(crs_detectado, allow_override=True)
+        return TileLayer(gdf)
+    
+    try:
+        content = await run_in_threadpool(render_tile, ('analisis', analysis_id), build_layer, z, x, y)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generando tesela: {str(e)}")
+    
+    if not content:
+        return Response(status_code=204)
+    return Response(content=content, media_type=MVT_MEDIA_TYPE)
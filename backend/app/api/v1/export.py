@@ -12,6 +12,7 @@ from app.models.transformation import Transformation
 from app.schemas.export import ExportRequest, ExportResponse
 from app.services.spatial.file_loader import FileLoader
 from app.services.export.export_service import ExportService
+from app.services.transformation.geometry_cache import file_hash, load_transformed
 from pathlib import Path
 import os
 
@@ -35,17 +36,6 @@ async def export_data(
         raise HTTPException(status_code=404, detail="Archivo no encontrado")
     
     try:
-        # Cargar archivo
-        loader = FileLoader(file.ruta_almacenamiento)
-        gdf = loader.load()
-        
-        # Aplicar CRS detectado si existe
-        if analysis.crs_detectado:
-            try:
-                gdf.set_crs(analysis.crs_detectado, allow_override=True)
-            except Exception:
-                pass
-        
         # Obtener transformación si existe
         transformation = None
         if request.crs_target:
@@ -55,6 +45,25 @@ async def export_data(
                 Transformation.crs_destino == request.crs_target
             ).first()
         
+        crs_target = request.crs_target
+        if transformation is not None:
+            # La capa transformada se lee de la caché en disco (se genera si no está)
+            gdf, ruta_geometria = load_transformed(
+                file.ruta_almacenamiento, file.ruta_optimizada, file_hash(file),
+                transformation.crs_origen, transformation.crs_destino
+            )
+            transformation.ruta_geometria = ruta_geometria
+            crs_target = None
+        else:
+            loader = FileLoader(file.ruta_almacenamiento, optimized_path=file.ruta_optimizada)
+            gdf = loader.load()
+            # Aplicar CRS detectado si existe
+            if analysis.crs_detectado:
+                try:
+                    gdf = gdf.set_crs(analysis.crs_detectado, allow_override=True)
+                except Exception:
+                    pass
+        
         # Crear servicio de exportación
         upload_dir = settings.get_upload_dir()
         export_dir = os.path.join(upload_dir, "exports")
@@ -74,7 +83,7 @@ async def export_data(
             format=request.formato,
             filename=filename,
             metadata=metadata,
-            crs_target=request.crs_target
+            crs_target=crs_target
         )
         
         # Guardar registro de exportación
@@ -1,15 +1,24 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.core.config import settings
 from app.models.data_file import DataFile
 from app.schemas.file import FileResponse
 from app.services.spatial.format_detector import FormatDetector
+from app.services.spatial.raster_optimizer import optimize_raster
 import os
+import logging
 import shutil
+import hashlib
+import tempfile
 from pathlib import Path
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Bytes iniciales usados para detectar el formato real del contenido
+SNIFF_SIZE = 512
 
 # Crear directorio de uploads si no existe
 upload_dir = settings.get_upload_dir()
@@ -26,29 +35,74 @@ async def upload_file(
     if not FormatDetector.is_supported(file.filename):
         raise HTTPException(
             status_code=400,
-            detail=f"Formato no soportado: {file.filename}. Formatos soportados: SHP, GeoJSON, CSV"
+            detail=f"Formato no soportado: {file.filename}. Formatos soportados: SHP, GeoJSON, CSV, ZIP (Shapefile, GeoPackage o GeoJSON)"
         )
     
-    # Validar tamaño
-    file_content = await file.read()
-    file_size = len(file_content)
+    # Recibir por bloques a un archivo temporal: memoria acotada por carga,
+    # límite de tamaño aplicado sobre la marcha y hash calculado en el camino
+    upload_dir = settings.get_upload_dir()
+    file_path = os.path.abspath(os.path.join(upload_dir, file.filename))
+    tmp = tempfile.NamedTemporaryFile(dir=upload_dir, prefix=".upload_", delete=False)
+    digest = hashlib.sha256()
+    file_size = 0
+    header = b""
     
-    if file_size > settings.MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Archivo demasiado grande. Tamaño máximo: {settings.MAX_FILE_SIZE / 1024 / 1024}MB"
-        )
+    try:
+        with tmp:
+            while True:
+                chunk = await file.read(settings.UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                
+                file_size += len(chunk)
+                if file_size > settings.MAX_FILE_SIZE:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Archivo demasiado grande. Tamaño máximo: {settings.MAX_FILE_SIZE / 1024 / 1024}MB"
+                    )
+                
+                # Detectar el formato real con los primeros bytes
+                if len(header) < SNIFF_SIZE:
+                    header += chunk[:SNIFF_SIZE - len(header)]
+                    if len(header) >= SNIFF_SIZE and not FormatDetector.content_matches(file.filename, header):
+                        raise HTTPException(
+                            status_code=400,
+                            detail=f"El contenido de {file.filename} no corresponde a su extensión"
+                        )
+                
+                digest.update(chunk)
+                tmp.write(chunk)
+        
+        if len(header) < SNIFF_SIZE and not FormatDetector.content_matches(file.filename, header):
+            raise HTTPException(
+                status_code=400,
+                detail=f"El contenido de {file.filename} no corresponde a su extensión"
+            )
+        
+        # Mover atómicamente a su ubicación final (ruta absoluta); NamedTemporaryFile crea con 0600
+        os.chmod(tmp.name, 0o644)
+        os.replace(tmp.name, file_path)
+    except BaseException:
+        if os.path.exists(tmp.name):
+            os.remove(tmp.name)
+        raise
     
-    # Guardar archivo (usar ruta absoluta)
-    upload_dir = settings.get_upload_dir()
-    file_path = os.path.join(upload_dir, file.filename)
-    # Asegurar que la ruta sea absoluta
-    file_path = os.path.abspath(file_path)
-    with open(file_path, "wb") as f:
-        f.write(file_content)
+    # Hash del contenido: clave de la caché de diagnósticos
+    file_hash = digest.hexdigest()
+    file_format = FormatDetector.detect(file.filename)
     
-    # Si es Shapefile, verificar que existan los archivos auxiliares
-    if FormatDetector.detect(file.filename) == 'SHP':
+    # Si es ZIP, se registra el formato interno; se leerá con /vsizip/ sin descomprimir
+    if file_format == 'ZIP':
+        inner = FormatDetector.inspect_archive(file_path)
+        if inner is None:
+            os.remove(file_path)
+            raise HTTPException(
+                status_code=400,
+                detail="El ZIP debe contener un Shapefile completo (.shp, .shx, .dbf), un GeoPackage o un GeoJSON"
+            )
+        file_format = inner['format']
+    # Si es Shapefile suelto, verificar que existan los archivos auxiliares
+    elif file_format == 'SHP':
         base_name = Path(file_path).stem
         shp_dir = Path(file_path).parent
         required_files = [f"{base_name}.shp", f"{base_name}.shx", f"{base_name}.dbf"]
@@ -59,12 +113,23 @@ async def upload_file(
                 detail="Shapefile incompleto. Se requieren .shp, .shx y .dbf"
             )
     
+    # Rasters: copia COG para que las lecturas posteriores sean por teselas y overviews.
+    # Si falla, se sigue usando el original
+    optimized_path = None
+    if file_format in FormatDetector.RASTER_FORMATS and settings.RASTER_OPTIMIZE_ON_UPLOAD:
+        try:
+            optimized_path = await run_in_threadpool(optimize_raster, file_path)
+        except Exception as e:
+            logger.warning(f"No se pudo optimizar {file.filename}: {e}")
+    
     # Guardar en base de datos
     db_file = DataFile(
         nombre_archivo=file.filename,
-        formato=FormatDetector.detect(file.filename),
+        formato=file_format,
         tamaño=file_size,
-        ruta_almacenamiento=file_path
+        ruta_almacenamiento=file_path,
+        ruta_optimizada=optimized_path,
+        hash_sha256=file_hash
     )
     db.add(db_file)
     db.commit()
@@ -7,6 +7,8 @@ from sqlalchemy import func, case
 from app.core.database import get_db
 from app.models.spatial_analysis import SpatialAnalysis, ConfiabilidadEnum
 from app.models.data_file import DataFile
+from app.services.spatial.crs_pool import pool_stats
+from app.services.spatial.vector_tiles import layer_cache, tile_cache
 from typing import Dict, Any
 
 router = APIRouter()
@@ -103,3 +105,13 @@ async def get_dashboard_stats(db: Session = Depends(get_db)) -> Dict[str, Any]:
         'quality_stats': quality_stats
     }
 
+@router.get("/stats/cache")
+async def get_cache_stats() -> Dict[str, Any]:
+    """
+    Ocupación y aciertos/fallos de los cachés en memoria del proceso
+    """
+    return {
+        **pool_stats(),
+        'teselas': tile_cache.stats(),
+        'capas_teselas': layer_cache.stats()
+    }
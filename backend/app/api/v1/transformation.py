@@ -2,15 +2,35 @@
 Endpoints para transformación/reproyección de datos espaciales
 """
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.orm import Session
+from sqlalchemy import func
+from typing import Optional
+import numpy as np
+from app.core.config import settings
 from app.core.database import get_db
 from app.models.data_file import DataFile
 from app.models.spatial_analysis import SpatialAnalysis
 from app.models.transformation import Transformation
-from app.schemas.transformation import TransformationRequest, TransformationResponse
+from app.models.project import Project
+from app.schemas.transformation import (
+    TransformationRequest, TransformationResponse,
+    BatchTransformationRequest, BatchTransformationResponse, BatchTransformationItem,
+    CoordinateTransformRequest, CoordinateTransformResponse
+)
+from app.services.spatial.crs_pool import get_crs, get_transformer
 from app.services.spatial.file_loader import FileLoader
+from app.services.spatial.preview import PreviewBuilder
+from app.services.spatial.vector_tiles import TileLayer, render_tile, is_valid_tile, MVT_MEDIA_TYPE
 from app.services.transformation.reprojection_service import ReprojectionService
+from app.services.transformation.geometry_cache import ReprojectedLayerCache, file_hash, load_transformed
+from app.services.transformation.batch_reprojection import batch_reprojection
 import json
+import os
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -37,8 +57,8 @@ async def reproject_analysis(
         raise HTTPException(status_code=404, detail="Archivo no encontrado")
     
     try:
-        # Cargar archivo
-        loader = FileLoader(file.ruta_almacenamiento)
+        # Cargar archivo completo: la capa transformada se guarda con sus atributos
+        loader = FileLoader(file.ruta_almacenamiento, optimized_path=file.ruta_optimizada)
         gdf = loader.load()
         
         # Determinar CRS origen
@@ -66,6 +86,18 @@ async def reproject_analysis(
         if not transform_result['success']:
             raise HTTPException(status_code=400, detail=f"Error en transformación: {transform_result.get('error', 'Unknown error')}")
         
+        # Persistir la capa transformada para preview, teselas y exportación.
+        # Si falla, esos endpoints reproyectan desde el original
+        ruta_geometria = None
+        try:
+            cache = ReprojectedLayerCache()
+            ruta_geometria = cache.path_for(file_hash(file), crs_origen, request.crs_destino)
+            if not os.path.exists(ruta_geometria):
+                cache.write(transform_result['gdf_transformed'], ruta_geometria)
+        except Exception as e:
+            ruta_geometria = None
+            logger.warning(f"No se pudo guardar la capa transformada: {e}")
+        
         # Guardar transformación en BD
         transformation = Transformation(
             analisis_id=analysis_id,
@@ -73,8 +105,10 @@ async def reproject_analysis(
             crs_destino=request.crs_destino,
             parametros_transformacion=json.dumps({
                 'method': transform_result.get('method'),
+                'operation': transform_result.get('operation'),
                 'statistics': transform_result.get('statistics', {})
-            })
+            }),
+            ruta_geometria=ruta_geometria
         )
         db.add(transformation)
         db.commit()
@@ -97,6 +131,130 @@ async def reproject_analysis(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error en transformación: {str(e)}")
 
+@router.post("/transformation/batch", response_model=BatchTransformationResponse)
+async def reproject_batch(
+    request: BatchTransformationRequest,
+    db: Session = Depends(get_db)
+):
+    """Transforma varios análisis (o el último análisis de cada archivo de un proyecto) a un CRS destino
+    
+    Las capas se agrupan por CRS origen y se reproyectan en el pool de
+    procesos; las transformaciones exitosas se guardan en una sola transacción.
+    """
+    if not request.analysis_ids and request.project_id is None:
+        raise HTTPException(status_code=400, detail="Se requiere analysis_ids o project_id")
+    
+    try:
+        get_crs(request.crs_destino)
+    except Exception:
+        raise HTTPException(status_code=400, detail=f"CRS destino inválido: {request.crs_destino}")
+    
+    if request.analysis_ids:
+        analysis_ids = list(dict.fromkeys(request.analysis_ids))
+    else:
+        project = db.query(Project).filter(Project.id == request.project_id).first()
+        if not project:
+            raise HTTPException(status_code=404, detail="Proyecto no encontrado")
+        analysis_ids = sorted(
+            analysis_id for (analysis_id,) in db.query(func.max(SpatialAnalysis.id))
+            .join(DataFile, DataFile.id == SpatialAnalysis.archivo_id)
+            .filter(DataFile.proyecto_id == request.project_id)
+            .group_by(SpatialAnalysis.archivo_id)
+        )
+        if not analysis_ids:
+            raise HTTPException(status_code=404, detail="El proyecto no tiene análisis")
+    
+    analyses = {a.id: a for a in db.query(SpatialAnalysis).filter(SpatialAnalysis.id.in_(analysis_ids))}
+    missing = [analysis_id for analysis_id in analysis_ids if analysis_id not in analyses]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Análisis no encontrados: {missing}")
+    
+    files = {f.id: f for f in db.query(DataFile).filter(DataFile.id.in_({a.archivo_id for a in analyses.values()}))}
+    items = []
+    for analysis_id in analysis_ids:
+        file = files.get(analyses[analysis_id].archivo_id)
+        if not file:
+            raise HTTPException(status_code=404, detail=f"Archivo no encontrado para el análisis {analysis_id}")
+        items.append({
+            'analisis_id': analysis_id,
+            'ruta': file.ruta_almacenamiento,
+            'ruta_optimizada': file.ruta_optimizada,
+            'hash': file_hash(file),
+            'crs_origen': analyses[analysis_id].crs_detectado
+        })
+    
+    try:
+        results = await run_in_threadpool(batch_reprojection.run, items, request.crs_destino)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error en transformación por lotes: {str(e)}")
+    
+    # Guardar todas las transformaciones exitosas en una sola transacción
+    transformations = {
+        result['analisis_id']: Transformation(
+            analisis_id=result['analisis_id'],
+            crs_origen=result['crs_origen'],
+            crs_destino=request.crs_destino,
+            parametros_transformacion=json.dumps({
+                'method': result.get('method'),
+                'operation': result.get('operation'),
+                'statistics': result.get('statistics', {})
+            }),
+            ruta_geometria=result.get('ruta_geometria')
+        )
+        for result in results if result['success']
+    }
+    db.add_all(transformations.values())
+    db.commit()
+    
+    resultados = [
+        BatchTransformationItem(
+            analisis_id=result['analisis_id'],
+            success=result['success'],
+            transformacion_id=transformations[result['analisis_id']].id if result['success'] else None,
+            crs_origen=result.get('crs_origen'),
+            error=result.get('error')
+        )
+        for result in results
+    ]
+    return BatchTransformationResponse(
+        crs_destino=request.crs_destino,
+        total=len(resultados),
+        exitosos=len(transformations),
+        resultados=resultados
+    )
+
+@router.post("/transform/coordinates", response_model=CoordinateTransformResponse)
+async def transform_coordinates(request: CoordinateTransformRequest):
+    """Transforma coordenadas sueltas ([x, y] o [x, y, z], x = longitud/este) sin cargar archivos"""
+    if len(request.coordenadas) > settings.TRANSFORM_MAX_COORDINATES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Máximo {settings.TRANSFORM_MAX_COORDINATES} coordenadas por petición"
+        )
+    dimensions = {len(coordinate) for coordinate in request.coordenadas}
+    if len(dimensions) > 1 or not dimensions <= {2, 3}:
+        raise HTTPException(status_code=400, detail="Todas las coordenadas deben ser [x, y] o todas [x, y, z]")
+    
+    try:
+        transformer = get_transformer(request.crs_origen, request.crs_destino)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"No se puede crear la transformación: {str(e)}")
+    
+    if not request.coordenadas:
+        return CoordinateTransformResponse(crs_origen=request.crs_origen, crs_destino=request.crs_destino, coordenadas=[])
+    
+    coords = np.asarray(request.coordenadas, dtype=np.float64)
+    transformed = np.column_stack(transformer.transform(*coords.T))
+    invalid = ~np.isfinite(transformed).all(axis=1)
+    empty = [None] * transformed.shape[1]
+    
+    return CoordinateTransformResponse(
+        crs_origen=request.crs_origen,
+        crs_destino=request.crs_destino,
+        coordenadas=[empty if bad else row for row, bad in zip(transformed.tolist(), invalid)],
+        invalidas=np.flatnonzero(invalid).tolist()
+    )
+
 @router.get("/transformation/{transformation_id}", response_model=TransformationResponse)
 async def get_transformation(
     transformation_id: int,
@@ -122,10 +280,7 @@ async def get_transformation_preview(
     transformation_id: int,
     db: Session = Depends(get_db)
 ):
-    """Obtiene preview de datos transformados"""
-    from app.schemas.analysis import AnalysisPreview
-    import json
-    
+    """Obtiene preview de datos transformados (simplificada, ver PreviewBuilder)"""
     transformation = db.query(Transformation).filter(Transformation.id == transformation_id).first()
     if not transformation:
         raise HTTPException(status_code=404, detail="Transformación no encontrada")
@@ -139,32 +294,65 @@ async def get_transformation_preview(
         raise HTTPException(status_code=404, detail="Archivo no encontrado")
     
     try:
-        # Cargar archivo
-        loader = FileLoader(file.ruta_almacenamiento)
-        gdf = loader.load()
-        
-        # Aplicar CRS origen
-        if transformation.crs_origen:
-            try:
-                gdf.set_crs(transformation.crs_origen, allow_override=True)
-            except:
-                pass
-        
-        # Transformar a CRS destino
-        gdf_transformed = gdf.to_crs(transformation.crs_destino)
+        # Capa ya transformada (se reproyecta y guarda solo si no está en caché)
+        gdf_transformed, ruta_geometria = load_transformed(
+            file.ruta_almacenamiento, file.ruta_optimizada, file_hash(file),
+            transformation.crs_origen, transformation.crs_destino, columns=[]
+        )
+        if transformation.ruta_geometria != ruta_geometria:
+            transformation.ruta_geometria = ruta_geometria
+            db.commit()
         
-        # Convertir a GeoJSON
-        geojson = json.loads(gdf_transformed.to_json())
+        # Simplificar y redondear para el mapa
+        preview = PreviewBuilder(gdf_transformed).build()
         
         # Obtener bounds
         bounds = gdf_transformed.total_bounds.tolist()
         
-        return AnalysisPreview(
-            geojson=geojson,
-            crs_aplicado=transformation.crs_destino,
-            bounds=bounds
-        )
-        
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generando preview: {str(e)}")
+    
+    return StreamingResponse(preview.iter_geojson(transformation.crs_destino, bounds), media_type="application/json")
 
+
+@router.get("/transformation/{transformation_id}/tiles/{z}/{x}/{y}.mvt")
+async def get_transformation_tile(
+    transformation_id: int,
+    z: int,
+    x: int,
+    y: int,
+    db: Session = Depends(get_db)
+):
+    """Tesela vectorial (MVT) de los datos transformados, en el esquema XYZ de Web Mercator"""
+    if not is_valid_tile(z, x, y):
+        raise HTTPException(status_code=400, detail=f"Tesela inválida: {z}/{x}/{y}")
+    
+    transformation = db.query(Transformation).filter(Transformation.id == transformation_id).first()
+    if not transformation:
+        raise HTTPException(status_code=404, detail="Transformación no encontrada")
+    
+    analysis = db.query(SpatialAnalysis).filter(SpatialAnalysis.id == transformation.analisis_id).first()
+    if not analysis:
+        raise HTTPException(status_code=404, detail="Análisis no encontrado")
+    
+    file = db.query(DataFile).filter(DataFile.id == analysis.archivo_id).first()
+    if not file:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    
+    ruta, ruta_optimizada, content_hash = file.ruta_almacenamiento, file.ruta_optimizada, file.hash_sha256
+    crs_origen, crs_destino = transformation.crs_origen, transformation.crs_destino
+    
+    def build_layer() -> TileLayer:
+        gdf, _ = load_transformed(ruta, ruta_optimizada, content_hash, crs_origen, crs_destino, columns=[])
+        return TileLayer(gdf)
+    
+    try:
+        content = await run_in_threadpool(render_tile, ('transformacion', transformation_id), build_layer, z, x, y)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generando tesela: {str(e)}")
+    
+    if not content:
+        return Response(status_code=204)
+    return Response(content=content, media_type=MVT_MEDIA_TYPE)
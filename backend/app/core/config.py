@@ -14,6 +14,49 @@ class Settings(BaseSettings):
     # File storage
     UPLOAD_DIR: str = "./uploads"
     MAX_FILE_SIZE: int = 100 * 1024 * 1024  # 100MB
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # 1MB por bloque al recibir archivos
+    CSV_CHUNK_ROWS: int = 500_000  # Filas por bloque al leer CSV con coordenadas
+    
+    # Vectorización de rasters por ventanas de bloque
+    RASTER_MAX_FEATURES: int = 100_000  # Límite de polígonos generados (0: sin límite)
+    RASTER_VECTOR_BATCH_SIZE: int = 10_000  # Polígonos por lote producido
+    RASTER_QUANTIZE_LEVELS: int = 32  # Niveles para rasters continuos (float) al vectorizar
+    RASTER_SIEVE_SIZE: int = 0  # Píxeles mínimos por región (0: sin sieve)
+    RASTER_SAMPLE_SIZE: int = 1024  # Lado máximo (píxeles) de las lecturas reducidas de estadísticas
+    RASTER_OPTIMIZE_ON_UPLOAD: bool = True  # Guardar una copia COG (teselada, comprimida, con overviews)
+    RASTER_COG_BLOCKSIZE: int = 512
+    RASTER_COG_COMPRESSION: str = "DEFLATE"
+    PREVIEW_MAX_VERTICES: int = 250_000  # Presupuesto de vértices de las vistas previas
+    PREVIEW_PIXELS: int = 1024  # Píxeles de pantalla que cubre la extensión sin zoom explícito
+    PREVIEW_BATCH_SIZE: int = 1000  # Features por bloque de la respuesta
+    TILE_EXTENT: int = 4096  # Resolución de la rejilla de cada tesela MVT
+    TILE_BUFFER: int = 64  # Margen (en unidades de la rejilla) alrededor de cada tesela
+    TILE_MAX_ZOOM: int = 22
+    TILE_CACHE_SIZE: int = 2048  # Teselas codificadas en memoria
+    TILE_LAYER_CACHE_SIZE: int = 4  # Capas reproyectadas e indexadas en memoria
+    REPROJECTION_CACHE_MAX_BYTES: int = 2 * 1024 ** 3  # Tamaño en disco de capas reproyectadas (0: sin límite)
+    CRS_CACHE_SIZE: int = 256  # Objetos CRS interpretados en memoria
+    TRANSFORMER_CACHE_SIZE: int = 128  # Transformers de pyproj en memoria (por par de CRS)
+    DEM_STATS_EXACT: bool = False  # Estadísticas DEM a resolución completa (por bloques) en vez de overviews
+    
+    # Diagnóstico en segundo plano: "process" (pool de procesos) o "inline" (pruebas)
+    DIAGNOSIS_EXECUTOR: str = "process"
+    DIAGNOSIS_MAX_WORKERS: int = 2
+    # Capas con más entidades se diagnostican sobre una muestra estratificada (0 desactiva)
+    DIAGNOSIS_SAMPLE_SIZE: int = 50000
+    DIAGNOSIS_SAMPLE_SEED: int = 42
+    
+    # Reproyección por lotes: "process" (pool de procesos) o "inline" (pruebas)
+    REPROJECTION_EXECUTOR: str = "process"
+    REPROJECTION_MAX_WORKERS: int = 2
+    TRANSFORM_MAX_COORDINATES: int = 1_000_000  # Coordenadas por petición en /transform/coordinates
+    # Reproyección particionada de capas grandes (memoria compartida + pool de procesos)
+    REPROJECTION_PARALLEL_MIN_COORDINATES: int = 1_000_000  # Vértices a partir de los cuales se particiona (0 desactiva)
+    REPROJECTION_PARALLEL_WORKERS: int = 0  # 0: un proceso por núcleo
+    REPROJECTION_CHUNK_SIZE: int = 500_000  # Vértices por bloque
+    
+    # Motor de lectura vectorial: "pyogrio" (Arrow, con respaldo en fiona) o "fiona"
+    VECTOR_READ_ENGINE: str = "pyogrio"
     
     def get_upload_dir(self) -> str:
         """Obtiene la ruta absoluta del directorio de uploads"""
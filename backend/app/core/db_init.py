@@ -1,16 +1,42 @@
 """
 Utilidades para inicializar la base de datos
 """
-from sqlalchemy import text
+from sqlalchemy import inspect, text
 from app.core.database import Base, engine
 # Importar todos los modelos para que SQLAlchemy los registre en Base.metadata
 from app.models import Project, DataFile, SpatialAnalysis, ValidationResult
 from app.models.transformation import Transformation
 from app.models.export import Export
+from app.models.diagnosis_job import DiagnosisJob
+from app.models.diagnosis_cache import DiagnosisCacheEntry
 import logging
 
 logger = logging.getLogger(__name__)
 
+# create_all no modifica tablas existentes: columnas agregadas a los modelos
+# después de creada la tabla (tabla, columna, tipo SQL, indexada)
+ADDED_COLUMNS = [
+    ("data_files", "hash_sha256", "VARCHAR(64)", True),
+    ("data_files", "ruta_optimizada", "VARCHAR(500)", False),
+    ("transformations", "ruta_geometria", "VARCHAR(500)", False),
+]
+
+
+def upgrade_schema():
+    """Agrega a las tablas existentes las columnas que les falten (idempotente)"""
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    with engine.begin() as conn:
+        for table, column, sql_type, indexed in ADDED_COLUMNS:
+            if table not in tables:
+                continue
+            if column not in {c["name"] for c in inspector.get_columns(table)}:
+                print(f"[DB] Agregando columna {table}.{column}")
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {sql_type}"))
+                if indexed:
+                    conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_{column} ON {table} ({column})"))
+
+
 def init_db():
     """
     Inicializa la base de datos creando todas las tablas si no existen
@@ -34,6 +60,7 @@ def init_db():
         
         # Crear todas las tablas definidas en los modelos
         Base.metadata.create_all(bind=engine)
+        upgrade_schema()
         
         print("[DB] Base de datos inicializada correctamente")
         return True
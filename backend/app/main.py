@@ -6,6 +6,9 @@ from app.core.config import settings
 from app.core.db_health import check_db_connection
 from app.core.db_init import init_db
 from app.api.v1 import files, analysis, export, transformation, layers, stats
+from app.services.diagnosis.job_queue import job_queue
+from app.services.transformation.batch_reprojection import batch_reprojection
+from app.services.transformation.parallel_reprojection import parallel_reprojector
 import os
 from pathlib import Path
 
@@ -49,6 +52,13 @@ async def startup_event():
         print("[APP] ADVERTENCIA: La aplicacion se inicio sin conexion a base de datos")
         print("[APP] Algunas funcionalidades pueden no estar disponibles")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Detener los workers de diagnóstico y de reproyección (lotes y particionada)
+    job_queue.shutdown()
+    batch_reprojection.shutdown()
+    parallel_reprojector.shutdown()
+
 # Routers
 app.include_router(files.router, prefix="/api/v1", tags=["files"])
 app.include_router(analysis.router, prefix="/api/v1", tags=["analysis"])
@@ -12,7 +12,9 @@ class DataFile(Base):
     tamaño = Column(BigInteger)
     proyecto_id = Column(Integer, ForeignKey("projects.id"), nullable=True)
     fecha_carga = Column(DateTime(timezone=True), server_default=func.now())
-    ruta_almacenamiento = Column(String(500), nullable=False)
+    ruta_almacenamiento = Column(String(500), nullable=False)  # Archivo original cargado
+    ruta_optimizada = Column(String(500), nullable=True)  # Copia COG de rasters (None si no se generó)
+    hash_sha256 = Column(String(64), nullable=True, index=True)  # Hash del contenido cargado
     
     # Relationships
     proyecto = relationship("Project", backref="archivos")
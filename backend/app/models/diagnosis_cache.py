@@ -0,0 +1,20 @@
+"""
+Caché de resultados de diagnóstico direccionada por contenido
+"""
+from sqlalchemy import Column, Integer, String, Text, DateTime, UniqueConstraint
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class DiagnosisCacheEntry(Base):
+    __tablename__ = "diagnosis_cache"
+    __table_args__ = (
+        UniqueConstraint("hash_sha256", "version_motor", name="uq_diagnosis_cache_hash_version"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    hash_sha256 = Column(String(64), nullable=False, index=True)
+    version_motor = Column(String(64), nullable=False)
+    payload = Column(Text, nullable=False)  # JSON string con el resultado completo del diagnóstico
+
+    fecha_creacion = Column(DateTime(timezone=True), server_default=func.now())
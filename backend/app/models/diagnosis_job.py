@@ -0,0 +1,23 @@
+"""
+Modelo de trabajo de diagnóstico ejecutado en segundo plano
+"""
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class DiagnosisJob(Base):
+    __tablename__ = "diagnosis_jobs"
+
+    id = Column(String(36), primary_key=True, index=True)  # UUID
+    archivo_id = Column(Integer, ForeignKey("data_files.id"), nullable=False)
+    analisis_id = Column(Integer, ForeignKey("spatial_analyses.id"), nullable=True)
+
+    estado = Column(String(20), nullable=False, default="pendiente")  # pendiente, en_proceso, completado, error
+    etapa_actual = Column(String(50), nullable=True)
+    progreso = Column(Text, nullable=True)  # JSON string: {etapa: estado}
+    resultado = Column(Text, nullable=True)  # JSON string con la respuesta del análisis
+    error = Column(Text, nullable=True)
+
+    fecha_creacion = Column(DateTime(timezone=True), server_default=func.now())
+    fecha_actualizacion = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
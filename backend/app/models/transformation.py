@@ -16,6 +16,7 @@ class Transformation(Base):
     crs_origen = Column(String(50), nullable=False)
     crs_destino = Column(String(50), nullable=False)
     parametros_transformacion = Column(Text, nullable=True)  # JSON string
+    ruta_geometria = Column(String(500), nullable=True)  # GeoParquet con la capa ya transformada (caché)
     
     fecha_aplicacion = Column(DateTime(timezone=True), server_default=func.now())
     usuario_id = Column(Integer, nullable=True)
@@ -0,0 +1,24 @@
+"""
+Schemas para trabajos de diagnóstico en segundo plano
+"""
+from pydantic import BaseModel
+from typing import Optional, Dict
+from datetime import datetime
+from app.schemas.analysis import AnalysisResponse
+
+
+class DiagnosisJobResponse(BaseModel):
+    id: str
+    archivo_id: int
+    estado: str
+    etapa_actual: Optional[str] = None
+    progreso: Dict[str, str] = {}
+    porcentaje: float = 0.0
+    analisis_id: Optional[int] = None
+    resultado: Optional[AnalysisResponse] = None
+    error: Optional[str] = None
+    fecha_creacion: Optional[datetime] = None
+    fecha_actualizacion: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
+from typing import Optional
 
 class FileUpload(BaseModel):
     nombre: str
@@ -12,6 +13,7 @@ class FileResponse(BaseModel):
     formato: str
     tamaño: int
     fecha_carga: datetime
+    hash_sha256: Optional[str] = None
     
     class Config:
         from_attributes = True
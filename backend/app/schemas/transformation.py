@@ -2,7 +2,7 @@
 Schemas para transformación
 """
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 
 
@@ -24,3 +24,37 @@ class TransformationResponse(BaseModel):
     class Config:
         from_attributes = True
 
+
+
+class BatchTransformationRequest(BaseModel):
+    crs_destino: str
+    analysis_ids: Optional[List[int]] = None
+    project_id: Optional[int] = None  # Último análisis de cada archivo del proyecto
+
+
+class BatchTransformationItem(BaseModel):
+    analisis_id: int
+    success: bool
+    transformacion_id: Optional[int] = None
+    crs_origen: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BatchTransformationResponse(BaseModel):
+    crs_destino: str
+    total: int
+    exitosos: int
+    resultados: List[BatchTransformationItem]
+
+
+class CoordinateTransformRequest(BaseModel):
+    crs_origen: str
+    crs_destino: str
+    coordenadas: List[List[float]]  # [x, y] o [x, y, z] (x = longitud/este)
+
+
+class CoordinateTransformResponse(BaseModel):
+    crs_origen: str
+    crs_destino: str
+    coordenadas: List[List[Optional[float]]]
+    invalidas: List[int] = []  # Posiciones que no se pudieron transformar (coordenadas nulas)
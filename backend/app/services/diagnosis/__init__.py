@@ -0,0 +1,4 @@
+from app.services.diagnosis.diagnosis_service import DiagnosisService
+from app.services.diagnosis.job_queue import DiagnosisJobQueue, job_queue
+
+__all__ = ["DiagnosisService", "DiagnosisJobQueue", "job_queue"]
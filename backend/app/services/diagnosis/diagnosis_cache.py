@@ -0,0 +1,71 @@
+"""
+Caché de diagnósticos por (hash SHA-256 del archivo, versión del motor de análisis)
+"""
+import json
+import hashlib
+import numpy as np
+from typing import Optional, Dict, Any
+from sqlalchemy.orm import Session
+from app.models.diagnosis_cache import DiagnosisCacheEntry
+
+# Tamaño de bloque para leer archivos al calcular su hash
+HASH_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+
+def sha256_file(file_path: str) -> str:
+    """Calcula el hash SHA-256 de un archivo leyéndolo por bloques"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _json_default(value: Any) -> Any:
+    """Convierte tipos numpy a tipos nativos para serializar el payload"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+class DiagnosisCache:
+    """Guarda y recupera el payload completo de un diagnóstico"""
+
+    def __init__(self, db: Session, engine_version: str):
+        self.db = db
+        self.engine_version = engine_version
+
+    def get(self, file_hash: str) -> Optional[Dict[str, Any]]:
+        """Retorna el payload cacheado para el hash, o None si no existe"""
+        entry = self.db.query(DiagnosisCacheEntry).filter(
+            DiagnosisCacheEntry.hash_sha256 == file_hash,
+            DiagnosisCacheEntry.version_motor == self.engine_version
+        ).first()
+        if entry is None:
+            return None
+
+        try:
+            return json.loads(entry.payload)
+        except ValueError:
+            return None
+
+    def put(self, file_hash: str, payload: Dict[str, Any]) -> None:
+        """Guarda el payload (no hace commit; se confirma junto con el análisis)"""
+        serialized = json.dumps(payload, default=_json_default)
+        try:
+            # Savepoint: si otro worker guardó el mismo hash, no se pierde la transacción
+            with self.db.begin_nested():
+                exists = self.db.query(DiagnosisCacheEntry.id).filter(
+                    DiagnosisCacheEntry.hash_sha256 == file_hash,
+                    DiagnosisCacheEntry.version_motor == self.engine_version
+                ).first()
+                if exists is None:
+                    self.db.add(DiagnosisCacheEntry(
+                        hash_sha256=file_hash,
+                        version_motor=self.engine_version,
+                        payload=serialized
+                    ))
+        except Exception:
+            pass
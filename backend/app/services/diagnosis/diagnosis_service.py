@@ -0,0 +1,293 @@
+"""
+Pipeline de diagnóstico de archivos espaciales (CRS, unidades, escala, errores, validación)
+"""
+import math
+from typing import Optional, Dict, Any, Callable
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.data_file import DataFile
+from app.models.spatial_analysis import SpatialAnalysis
+from app.models.validation_result import ValidationResult
+from app.schemas.analysis import AnalysisResponse
+from app.services.spatial.file_loader import FileLoader
+from app.services.spatial.format_detector import FormatDetector
+from app.services.spatial.analysis_context import AnalysisContext
+from app.services.inference.crs_inference import CRSInferenceEngine
+from app.services.inference.unit_detector import UnitDetector
+from app.services.inference.origin_detector import OriginDetector
+from app.services.inference.scale_estimator import ScaleEstimator
+from app.services.validation.geometric_validator import GeometricValidator
+from app.services.validation.quality_assessor import QualityAssessor
+from app.services.validation.error_calculator import ErrorCalculator
+from app.services.validation.use_case_assessor import UseCaseAssessor
+from app.services.diagnosis.diagnosis_cache import DiagnosisCache, sha256_file
+from app.services.diagnosis.raster_analysis import RasterAnalyzer
+
+# Versión del motor de análisis: forma parte de la clave de la caché de
+# diagnósticos. Incrementarla cuando cambie cualquier analizador.
+DIAGNOSIS_ENGINE_VERSION = "1.10.0"
+
+
+def cache_engine_version() -> str:
+    """Versión usada como clave de caché: incluye la configuración de muestreo"""
+    version = DIAGNOSIS_ENGINE_VERSION
+    if settings.DIAGNOSIS_SAMPLE_SIZE:
+        version += f"-m{settings.DIAGNOSIS_SAMPLE_SIZE}s{settings.DIAGNOSIS_SAMPLE_SEED}"
+    if settings.DEM_STATS_EXACT:
+        version += "-dx"
+    return version
+
+
+def clean_float_value(value: float | None) -> float | None:
+    """
+    Limpia valores float inválidos (nan, inf, -inf) y los convierte a None
+    para que sean JSON-compliant
+    """
+    if value is None:
+        return None
+    if math.isnan(value) or math.isinf(value):
+        return None
+    return value
+
+
+class DiagnosisService:
+    """Ejecuta el diagnóstico completo de un archivo y persiste el análisis"""
+
+    # Etapas reportadas al callback de progreso, en orden de ejecución
+    STAGES = ['carga', 'crs', 'unidades', 'escala', 'errores', 'validacion', 'persistencia']
+
+    def __init__(
+        self,
+        db: Session,
+        progress_callback: Optional[Callable[[str, str], None]] = None,
+        use_cache: bool = True
+    ):
+        self.db = db
+        self.progress_callback = progress_callback
+        self.cache = DiagnosisCache(db, cache_engine_version()) if use_cache else None
+
+    def _report(self, stage: str, status: str) -> None:
+        if self.progress_callback is not None:
+            self.progress_callback(stage, status)
+
+    def diagnose(self, file: DataFile) -> Dict[str, Any]:
+        """Diagnostica el archivo y retorna el análisis guardado y la evaluación de calidad
+
+        Si el mismo contenido (hash SHA-256) ya se diagnosticó con esta versión
+        del motor, se reutiliza el resultado sin cargar el archivo.
+        """
+        file_hash = self._ensure_file_hash(file) if self.cache is not None else None
+
+        payload = self.cache.get(file_hash) if file_hash else None
+        from_cache = payload is not None
+        if from_cache:
+            for stage in self.STAGES[:-1]:
+                self._report(stage, 'completado')
+        else:
+            payload = self._analyze(file)
+            if file_hash:
+                self.cache.put(file_hash, payload)
+
+        analysis = self._persist(file, payload)
+
+        return {
+            'analysis': analysis,
+            'quality': payload['quality'],
+            'from_cache': from_cache
+        }
+
+    def _ensure_file_hash(self, file: DataFile) -> Optional[str]:
+        """Hash del contenido; se calcula desde disco para archivos cargados sin hash"""
+        if file.hash_sha256:
+            return file.hash_sha256
+        try:
+            loader = FileLoader(file.ruta_almacenamiento)
+            file.hash_sha256 = sha256_file(loader.file_path)
+        except Exception:
+            return None
+        return file.hash_sha256
+
+    def _analyze(self, file: DataFile) -> Dict[str, Any]:
+        """Ejecuta los analizadores y retorna el payload serializable del diagnóstico"""
+        # Cargar archivo (el diagnóstico solo usa la geometría)
+        self._report('carga', 'en_proceso')
+        loader = FileLoader(file.ruta_almacenamiento, optimized_path=file.ruta_optimizada)
+        if loader.format in FormatDetector.RASTER_FORMATS:
+            return self._analyze_raster(loader)
+        gdf = loader.load(geometry_only=True)
+
+        if gdf is None:
+            raise ValueError("No se pudo cargar el archivo")
+
+        # Contexto compartido: las vistas WGS84 y proyectada se calculan una sola vez;
+        # en capas grandes las métricas se estiman sobre una muestra estratificada
+        context = AnalysisContext(
+            gdf,
+            sample_size=settings.DIAGNOSIS_SAMPLE_SIZE or None,
+            seed=settings.DIAGNOSIS_SAMPLE_SEED
+        )
+        self._report('carga', 'completado')
+
+        # Detectar CRS
+        self._report('crs', 'en_proceso')
+        crs_engine = CRSInferenceEngine(gdf, context=context)
+        crs_results = crs_engine.infer_crs()
+        self._report('crs', 'completado')
+
+        # Detectar unidades y origen
+        self._report('unidades', 'en_proceso')
+        unit_detector = UnitDetector(context.bounds, crs_results['crs_detectado'])
+        unit_results = unit_detector.detect_units()
+
+        origin_detector = OriginDetector(gdf, crs_results['crs_detectado'])
+        origin_results = origin_detector.detect_origin()
+        self._report('unidades', 'completado')
+
+        # Estimar escala
+        self._report('escala', 'en_proceso')
+        scale_estimator = ScaleEstimator(gdf, context=context)
+        scale_results = scale_estimator.estimate_scale()
+        self._report('escala', 'completado')
+
+        # Calcular errores
+        self._report('errores', 'en_proceso')
+        error_calculator = ErrorCalculator(gdf, context=context)
+        error_results = error_calculator.calculate_errors(
+            crs_detectado=crs_results['crs_detectado'],
+            escala_estimada=scale_results.get('escala_estimada')
+        )
+        self._report('errores', 'completado')
+
+        # Validación geométrica
+        self._report('validacion', 'en_proceso')
+        validator = GeometricValidator(gdf, context=context)
+        validation_results = validator.validate()
+
+        payload = {
+            'crs': crs_results,
+            'crs_original': str(gdf.crs) if gdf.crs else None,
+            'unidades': unit_results,
+            'origen': origin_results,
+            'escala': scale_results,
+            'errores': error_results,
+            'validacion': validation_results,
+            'muestreo': context.sampling_summary()
+        }
+        self._assess(payload)
+        self._report('validacion', 'completado')
+
+        return payload
+
+    def _analyze_raster(self, loader: FileLoader) -> Dict[str, Any]:
+        """Diagnóstico de GeoTIFF/DEM desde metadatos y lecturas reducidas, sin vectorizar"""
+        analyzer = RasterAnalyzer(loader.raster_reader(), loader.format)
+        self._report('carga', 'completado')
+
+        self._report('crs', 'en_proceso')
+        crs_results = analyzer.infer_crs()
+        crs_detectado = crs_results['crs_detectado']
+        self._report('crs', 'completado')
+
+        self._report('unidades', 'en_proceso')
+        unit_results = UnitDetector(analyzer.bounds, crs_detectado).detect_units()
+        origin_results = OriginDetector(analyzer.bounds_gdf, crs_detectado).detect_origin()
+        self._report('unidades', 'completado')
+
+        self._report('escala', 'en_proceso')
+        scale_results = analyzer.estimate_scale(crs_detectado)
+        self._report('escala', 'completado')
+
+        self._report('errores', 'en_proceso')
+        error_results = analyzer.calculate_errors(
+            crs_detectado=crs_detectado,
+            escala_estimada=scale_results.get('escala_estimada')
+        )
+        self._report('errores', 'completado')
+
+        self._report('validacion', 'en_proceso')
+        payload = {
+            'crs': crs_results,
+            'crs_original': analyzer.metadata['crs'],
+            'unidades': unit_results,
+            'origen': origin_results,
+            'escala': scale_results,
+            'errores': error_results,
+            'validacion': analyzer.validate(crs_detectado),
+            'muestreo': None
+        }
+        self._assess(payload)
+        self._report('validacion', 'completado')
+
+        return payload
+
+    @staticmethod
+    def _assess(payload: Dict[str, Any]) -> None:
+        """Agrega al payload la evaluación de calidad y de casos de uso"""
+        analysis_data = {
+            'crs_detectado': payload['crs']['crs_detectado'],
+            'crs_confidence': payload['crs']['confidence'],
+            'unidades_detectadas': payload['unidades']['unidades'],
+            'origen_detectado': payload['origen']['origen'],
+            'escala_estimada': payload['escala'].get('escala_estimada'),
+            'error_planimetrico': payload['errores'].get('error_planimetrico'),
+            'error_altimetrico': payload['errores'].get('error_altimetrico'),
+            'validation': payload['validacion'],
+            'muestreo': payload['muestreo']
+        }
+
+        quality_assessor = QualityAssessor()
+        payload['quality'] = quality_assessor.assess(analysis_data)
+
+        # Evaluar casos de uso
+        use_case_assessor = UseCaseAssessor()
+        payload['use_cases'] = use_case_assessor.assess_use_cases(analysis_data)
+
+    def _persist(self, file: DataFile, payload: Dict[str, Any]) -> SpatialAnalysis:
+        """Guarda el análisis y sus resultados de validación a partir del payload"""
+        self._report('persistencia', 'en_proceso')
+        # Limpiar valores float inválidos antes de guardar
+        analysis = SpatialAnalysis(
+            archivo_id=file.id,
+            crs_detectado=payload['crs']['crs_detectado'],
+            crs_original=payload['crs_original'],
+            unidades_detectadas=payload['unidades']['unidades'],
+            origen_detectado=payload['origen']['origen'],
+            escala_estimada=clean_float_value(payload['escala'].get('escala_estimada')),
+            error_planimetrico=clean_float_value(payload['errores'].get('error_planimetrico')),
+            error_altimetrico=clean_float_value(payload['errores'].get('error_altimetrico')),
+            confiabilidad=payload['quality']['confiabilidad']
+        )
+        self.db.add(analysis)
+        self.db.flush()  # Para obtener el ID
+
+        # Guardar resultados de validación por caso de uso
+        use_case_assessor = UseCaseAssessor()
+        validation_results_data = use_case_assessor.create_validation_results(analysis.id, payload['use_cases'])
+        for vr_data in validation_results_data:
+            validation_result = ValidationResult(**vr_data)
+            self.db.add(validation_result)
+
+        self.db.commit()
+        self.db.refresh(analysis)
+        self._report('persistencia', 'completado')
+
+        return analysis
+
+    @staticmethod
+    def build_response(analysis: SpatialAnalysis, quality_results: Dict[str, Any]) -> AnalysisResponse:
+        """Construye la respuesta de la API a partir del análisis guardado"""
+        return AnalysisResponse(
+            id=analysis.id,
+            archivo_id=analysis.archivo_id,
+            crs_detectado=analysis.crs_detectado,
+            crs_original=analysis.crs_original,
+            unidades_detectadas=analysis.unidades_detectadas,
+            origen_detectado=analysis.origen_detectado,
+            escala_estimada=clean_float_value(analysis.escala_estimada),
+            error_planimetrico=clean_float_value(analysis.error_planimetrico),
+            error_altimetrico=clean_float_value(analysis.error_altimetrico),
+            confiabilidad=analysis.confiabilidad.value,
+            fecha_analisis=analysis.fecha_analisis,
+            recomendaciones=quality_results['recomendaciones'],
+            explicacion_tecnica=quality_results['explicacion_tecnica']
+        )
@@ -0,0 +1,161 @@
+"""
+Cola de trabajos de diagnóstico ejecutados fuera del event loop de la API
+"""
+import json
+import uuid
+import logging
+import functools
+import multiprocessing
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Dict
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.data_file import DataFile
+from app.models.diagnosis_job import DiagnosisJob
+# Registrar todos los modelos: los workers del pool no importan app.main
+from app.models import Project, SpatialAnalysis, ValidationResult
+from app.models.transformation import Transformation
+from app.models.export import Export
+from app.models.diagnosis_cache import DiagnosisCacheEntry
+from app.services.diagnosis.diagnosis_service import DiagnosisService
+from app.services.transformation.parallel_reprojection import mark_pool_worker
+
+logger = logging.getLogger(__name__)
+
+
+def _update_job(db: Session, job: DiagnosisJob, **fields) -> None:
+    for name, value in fields.items():
+        setattr(job, name, value)
+    db.commit()
+
+
+def run_diagnosis_job(job_id: str) -> None:
+    """Ejecuta un trabajo de diagnóstico (en un proceso del pool o en línea)
+
+    Usa sus propias sesiones de BD: una para el análisis y otra para ir
+    actualizando el progreso del trabajo sin interferir con la transacción.
+    """
+    job_db = SessionLocal()
+    db = SessionLocal()
+    try:
+        job = job_db.query(DiagnosisJob).filter(DiagnosisJob.id == job_id).first()
+        if job is None:
+            return
+
+        progress: Dict[str, str] = json.loads(job.progreso) if job.progreso else {}
+
+        def on_progress(stage: str, status: str) -> None:
+            progress[stage] = status
+            _update_job(job_db, job, etapa_actual=stage, progreso=json.dumps(progress))
+
+        _update_job(job_db, job, estado='en_proceso')
+
+        try:
+            file = db.query(DataFile).filter(DataFile.id == job.archivo_id).first()
+            if file is None:
+                raise ValueError("Archivo no encontrado")
+
+            service = DiagnosisService(db, progress_callback=on_progress)
+            result = service.diagnose(file)
+            response = service.build_response(result['analysis'], result['quality'])
+
+            _update_job(
+                job_db, job,
+                estado='completado',
+                analisis_id=result['analysis'].id,
+                resultado=response.model_dump_json()
+            )
+        except Exception as e:
+            db.rollback()
+            if job.etapa_actual:
+                progress[job.etapa_actual] = 'error'
+            _update_job(
+                job_db, job,
+                estado='error',
+                progreso=json.dumps(progress),
+                error=f"Error en análisis: {str(e)}"
+            )
+    finally:
+        db.close()
+        job_db.close()
+
+
+def mark_job_failed(job_id: str, error: str) -> None:
+    """Cierra como ``error`` un trabajo que sigue abierto (pendiente o en proceso)"""
+    db = SessionLocal()
+    try:
+        job = db.query(DiagnosisJob).filter(DiagnosisJob.id == job_id).first()
+        if job is not None and job.estado in ('pendiente', 'en_proceso'):
+            _update_job(db, job, estado='error', error=error)
+    except Exception as e:
+        logger.error(f"No se pudo marcar como fallido el trabajo {job_id}: {e}")
+    finally:
+        db.close()
+
+
+class DiagnosisJobQueue:
+    """Envía trabajos de diagnóstico a un pool de procesos (o los ejecuta en línea)
+
+    Modos (settings.DIAGNOSIS_EXECUTOR):
+    - ``process``: pool de procesos, no bloquea el event loop (por defecto)
+    - ``inline``: ejecución síncrona en el mismo proceso, pensado para pruebas
+    """
+
+    def __init__(self, mode: Optional[str] = None, max_workers: Optional[int] = None):
+        self.mode = mode or settings.DIAGNOSIS_EXECUTOR
+        self.max_workers = max_workers or settings.DIAGNOSIS_MAX_WORKERS
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            # spawn: los workers no heredan conexiones del pool de SQLAlchemy ni hilos de uvicorn
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=mark_pool_worker
+            )
+        return self._executor
+
+    def create_job(self, db: Session, file_id: int) -> DiagnosisJob:
+        """Registra un trabajo pendiente para el archivo"""
+        job = DiagnosisJob(
+            id=uuid.uuid4().hex,
+            archivo_id=file_id,
+            estado='pendiente',
+            progreso=json.dumps({stage: 'pendiente' for stage in DiagnosisService.STAGES})
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        return job
+
+    def submit(self, job_id: str) -> None:
+        """Encola la ejecución del trabajo"""
+        if self.mode == 'inline':
+            run_diagnosis_job(job_id)
+        else:
+            executor = self._get_executor()
+            future = executor.submit(run_diagnosis_job, job_id)
+            future.add_done_callback(functools.partial(self._on_failure, job_id, executor))
+
+    def _on_failure(self, job_id: str, executor: Executor, future: Future) -> None:
+        # Errores fuera del pipeline (p. ej. el worker murió o no pudo arrancar) no quedan en el trabajo
+        if future.cancelled() or future.exception() is None:
+            return
+        error = future.exception()
+        logger.error(f"Error ejecutando trabajo de diagnóstico {job_id}: {error}")
+        if isinstance(error, BrokenProcessPool) and self._executor is executor:
+            # Un pool roto rechaza todo envío posterior: se descarta y el siguiente trabajo crea otro
+            self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+        mark_job_failed(job_id, f"Error en análisis: el proceso de diagnóstico terminó inesperadamente ({error})")
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+job_queue = DiagnosisJobQueue()
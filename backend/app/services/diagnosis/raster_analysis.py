@@ -0,0 +1,185 @@
+"""
+Diagnóstico nativo de rasters (GeoTIFF, DEM) sin vectorizar
+
+Produce los mismos resultados que los analizadores vectoriales a partir de
+los metadatos del archivo y de lecturas reducidas de la banda.
+"""
+import numpy as np
+from typing import Optional, Dict, Any, Tuple
+from app.services.spatial.raster_reader import RasterReader
+from app.services.spatial.dem_statistics import DEMStatistics
+from app.services.spatial.analysis_context import AnalysisContext
+from app.services.inference.crs_inference import CRSInferenceEngine
+
+
+class RasterAnalyzer:
+    """Analiza un raster a partir de metadatos y estadísticas de banda muestreadas"""
+
+    def __init__(self, reader: RasterReader, file_format: Optional[str] = None):
+        self.reader = reader
+        self.format = file_format
+        self.metadata = reader.read_metadata()
+        self.bounds_gdf = reader.get_bounds_gdf()
+        self.context = AnalysisContext(self.bounds_gdf)
+        self._band_sample = None
+        self._sample_size = 0
+
+    @property
+    def bounds(self) -> np.ndarray:
+        return np.asarray(self.metadata['bounds'], dtype=np.float64)
+
+    @property
+    def band_sample(self) -> np.ndarray:
+        """Valores válidos de una lectura reducida de la banda 1 (se lee una sola vez)"""
+        if self._band_sample is None:
+            sample = self.reader.read_band_sample(1)
+            self._band_sample = RasterReader.valid_values(sample).astype(np.float64)
+            self._sample_size = sample.size
+        return self._band_sample
+
+    @property
+    def is_elevation(self) -> bool:
+        """DEM o raster de una banda float (modelo de superficie continuo)"""
+        return self.format == 'DEM' or (
+            self.metadata['count'] == 1 and np.issubdtype(np.dtype(self.metadata['dtype']), np.floating)
+        )
+
+    def infer_crs(self) -> Dict[str, Any]:
+        """CRS de los metadatos o inferido a partir de la extensión del raster"""
+        return CRSInferenceEngine(self.bounds_gdf, context=self.context).infer_crs()
+
+    def pixel_size_meters(self, crs_detectado: Optional[str] = None) -> Tuple[float, float]:
+        """Tamaño de píxel (x, y) en metros según las unidades del CRS"""
+        return self.reader.pixel_size_meters(crs_detectado)
+
+    def estimate_scale(self, crs_detectado: Optional[str] = None) -> Dict[str, Any]:
+        """Escala a partir de la resolución del píxel en metros"""
+        try:
+            pixel_x, pixel_y = self.pixel_size_meters(crs_detectado)
+        except Exception as e:
+            return {
+                'escala_estimada': None,
+                'confidence': 0.0,
+                'method': 'raster_resolution_error',
+                'explicacion': f'Error en análisis de resolución: {str(e)}'
+            }
+
+        resolution = float((pixel_x + pixel_y) / 2)
+        estimated_scale = self.reader.estimate_scale_from_resolution(resolution)
+        return {
+            'escala_estimada': estimated_scale,
+            'confidence': 0.8,
+            'method': 'raster_resolution',
+            'explicacion': f'Resolución del píxel: {resolution:.2f}m sugiere escala 1:{estimated_scale}',
+            'resolucion_metros': resolution
+        }
+
+    def calculate_errors(self, crs_detectado: Optional[str] = None, escala_estimada: Optional[float] = None) -> Dict[str, Any]:
+        """Error planimétrico por resolución/escala y altimétrico por estadísticas de la banda"""
+        results = {
+            'error_planimetrico': None,
+            'error_altimetrico': None,
+            'method_planimetrico': None,
+            'method_altimetrico': None,
+            'explicacion': None
+        }
+
+        # Planimétrico: medio píxel o el error esperado de la escala (el mayor)
+        pixel_x, pixel_y = self.pixel_size_meters(crs_detectado)
+        errors = {'resolucion_raster': float(max(pixel_x, pixel_y) / 2)}
+        if escala_estimada:
+            errors['scale_based'] = escala_estimada / 2000.0
+        method = max(errors, key=errors.get)
+        results['error_planimetrico'] = errors[method]
+        results['method_planimetrico'] = method
+
+        explanations = [f"Error planimétrico: {results['error_planimetrico']:.2f}m (Error calculado mediante {method})"]
+
+        if self.is_elevation:
+            altimetric = self._altimetric_error(crs_detectado)
+            results['error_altimetrico'] = altimetric.get('error')
+            results['method_altimetrico'] = altimetric.get('method')
+            results['estadisticas_dem'] = altimetric.get('estadisticas')
+            if results['error_altimetrico'] is not None:
+                explanations.append(f"Error altimétrico: {results['error_altimetrico']:.2f}m ({altimetric['explicacion']})")
+        else:
+            results['method_altimetrico'] = 'no_z_data'
+
+        results['explicacion'] = ' | '.join(explanations)
+        return results
+
+    def _altimetric_error(self, crs_detectado: Optional[str] = None) -> Dict[str, Any]:
+        """Error vertical por pendiente y rugosidad del DEM (ver DEMStatistics)"""
+        try:
+            stats = DEMStatistics(self.reader, band=1, crs=crs_detectado).compute()
+        except Exception as e:
+            return {
+                'error': None,
+                'method': 'error',
+                'explicacion': f'Error en cálculo altimétrico: {str(e)}'
+            }
+
+        if stats['error_altimetrico'] is None:
+            return {
+                'error': None,
+                'method': 'no_z_data',
+                'explicacion': 'La banda no tiene valores de elevación válidos',
+                'estadisticas': stats
+            }
+
+        return {
+            'error': stats['error_altimetrico'],
+            'method': 'slope_roughness',
+            'explicacion': (
+                f"pendiente media {stats['pendiente_media_grados']:.1f}° y rugosidad "
+                f"{stats['rugosidad'] or 0.0:.2f}m sobre {stats['pixeles_leidos']} píxeles ({stats['fuente']})"
+            ),
+            'estadisticas': stats
+        }
+
+    def validate(self, crs_detectado: Optional[str] = None) -> Dict[str, Any]:
+        """Validación equivalente a GeometricValidator (el raster es una única cobertura)"""
+        results = {
+            'is_valid': True,
+            'errors': [],
+            'warnings': [],
+            'outliers': [],
+            'statistics': {}
+        }
+
+        if self.metadata['crs'] is None:
+            results['warnings'].append('El raster no tiene CRS en sus metadatos')
+
+        valid = self.band_sample
+        nodata_ratio = 1.0 - len(valid) / self._sample_size if self._sample_size else 1.0
+        if len(valid) == 0:
+            results['is_valid'] = False
+            results['errors'].append({
+                'tipo': 'sin_pixeles_validos',
+                'razon': 'La banda 1 no contiene píxeles válidos',
+                'cantidad': 1,
+                'indices': []
+            })
+        elif nodata_ratio > 0.5:
+            results['warnings'].append(f'El {nodata_ratio:.0%} de los píxeles muestreados es nodata')
+
+        pixel_x, pixel_y = self.pixel_size_meters(crs_detectado)
+        minx, miny, maxx, maxy = self.bounds
+        results['statistics'] = {
+            'num_features': int(self.metadata['width'] * self.metadata['height']),  # Píxeles
+            'bounds': [float(minx), float(miny), float(maxx), float(maxy)],
+            'area_estimated': float(self.metadata['width'] * pixel_x * self.metadata['height'] * pixel_y),
+            'width': self.metadata['width'],
+            'height': self.metadata['height'],
+            'bandas': self.metadata['count'],
+            'dtype': self.metadata['dtype'],
+            'resolucion': list(self.metadata['resolution'])
+        }
+        if len(valid):
+            results['statistics'].update({
+                'valor_minimo': float(valid.min()),
+                'valor_maximo': float(valid.max()),
+                'valor_medio': float(valid.mean())
+            })
+
+        return results
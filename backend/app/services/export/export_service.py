@@ -9,6 +9,7 @@ from typing import Dict, Any, Optional
 from datetime import datetime
 import zipfile
 import tempfile
+from app.services.spatial.crs_pool import to_crs
 
 
 class ExportService:
@@ -38,7 +39,7 @@ class ExportService:
             if gdf.crs is None:
                 raise ValueError("No se puede transformar: GDF no tiene CRS definido")
             try:
-                gdf = gdf.to_crs(crs_target)
+                gdf = to_crs(gdf, crs_target)
             except Exception as e:
                 raise ValueError(f"Error al transformar CRS: {str(e)}")
         
@@ -170,7 +171,7 @@ class ExportService:
         
         # Convertir a WGS84 si no está ya en ese CRS (KML requiere WGS84)
         if gdf.crs and not gdf.crs.to_string().startswith('EPSG:4326'):
-            gdf_kml = gdf.to_crs('EPSG:4326')
+            gdf_kml = to_crs(gdf, 'EPSG:4326')
         else:
             gdf_kml = gdf.copy()
             if not gdf_kml.crs:
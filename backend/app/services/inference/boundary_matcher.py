@@ -4,6 +4,7 @@ Matching de límites administrativos para mejorar detección CRS
 import geopandas as gpd
 from typing import Dict, Any, Optional, List
 import numpy as np
+from app.services.spatial.analysis_context import AnalysisContext
 
 
 class BoundaryMatcher:
@@ -48,20 +49,15 @@ class BoundaryMatcher:
     def match_boundaries(
         self,
         gdf: gpd.GeoDataFrame,
-        confidence_boost: float = 0.1
+        confidence_boost: float = 0.1,
+        context: Optional[AnalysisContext] = None
     ) -> Dict[str, Any]:
         """Hace matching con límites administrativos conocidos"""
         try:
-            # Convertir a WGS84 para comparación
-            if gdf.crs is None:
-                gdf_wgs84 = gdf.copy()
-                gdf_wgs84.set_crs('EPSG:4326', allow_override=True)
-            elif gdf.crs.is_geographic:
-                gdf_wgs84 = gdf.copy()
-            else:
-                gdf_wgs84 = gdf.to_crs('EPSG:4326')
-            
-            bounds = gdf_wgs84.total_bounds
+            # Vista WGS84 compartida para comparación
+            if context is None:
+                context = AnalysisContext(gdf)
+            bounds = context.wgs84_bounds
             minx, miny, maxx, maxy = bounds
             
             # Verificar si está dentro del bounding box de Colombia
@@ -6,6 +6,7 @@ import numpy as np
 from typing import Dict, Any, Optional, List, Tuple
 from pyproj import CRS
 import pyproj
+from app.services.spatial.coordinates import extract_coordinates
 
 
 class CRSDetector:
@@ -84,17 +85,8 @@ class CRSDetector:
         }
 
     def _extract_coordinates(self, gdf: gpd.GeoDataFrame) -> np.ndarray:
-        """Extrae coordenadas de todas las geometrías"""
-        coords_list = []
-        for geom in gdf.geometry:
-            if geom.geom_type == "Point":
-                coords_list.append([geom.x, geom.y])
-            elif geom.geom_type in ["LineString", "MultiLineString"]:
-                coords_list.extend([[p[0], p[1]] for p in geom.coords])
-            elif geom.geom_type in ["Polygon", "MultiPolygon"]:
-                for ring in geom.exterior.coords if hasattr(geom, "exterior") else []:
-                    coords_list.extend([[p[0], p[1]] for p in [ring]])
-        return np.array(coords_list)
+        """Extrae coordenadas de todas las geometrías (incluye Multi* y huecos)"""
+        return extract_coordinates(gdf.geometry).xy
 
     def _analyze_coordinate_ranges(self, coords: np.ndarray) -> Dict[str, Any]:
         """Analiza los rangos de coordenadas"""
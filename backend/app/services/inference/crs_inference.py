@@ -2,6 +2,7 @@ import geopandas as gpd
 from typing import Optional, Dict, Any
 import numpy as np
 from app.services.inference.boundary_matcher import BoundaryMatcher
+from app.services.spatial.analysis_context import AnalysisContext
 
 class CRSInferenceEngine:
     """Motor de inferencia de CRS basado en reglas geodésicas y heurísticas"""
@@ -24,9 +25,10 @@ class CRSInferenceEngine:
         'EPSG:4326': 'WGS84',
     }
     
-    def __init__(self, gdf: gpd.GeoDataFrame):
+    def __init__(self, gdf: gpd.GeoDataFrame, context: Optional[AnalysisContext] = None):
         self.gdf = gdf
-        self.bounds = gdf.total_bounds
+        self.context = context if context is not None else AnalysisContext(gdf)
+        self.bounds = self.context.bounds
         
     def infer_crs(self) -> Dict[str, Any]:
         """Infiere el CRS más probable del GeoDataFrame"""
@@ -45,26 +47,21 @@ class CRSInferenceEngine:
             results['explicacion'] = f'CRS encontrado en metadatos: {self.gdf.crs}'
             return results
         
-        # Convertir a WGS84 para análisis
-        if self.gdf.crs is None:
-            # Asumir que está en coordenadas geográficas sin CRS
-            gdf_wgs84 = self.gdf.copy()
-            gdf_wgs84.set_crs('EPSG:4326', allow_override=True)
-        else:
-            gdf_wgs84 = self.gdf.to_crs('EPSG:4326')
+        # Vista WGS84 compartida (sin CRS se asumen coordenadas geográficas)
+        gdf_wgs84 = self.context.wgs84
         
         # Análisis de rangos de coordenadas
-        coord_analysis = self._analyze_coordinates(gdf_wgs84)
+        coord_analysis = self._analyze_coordinates(self.context.wgs84_bounds)
         
         # Matching con bounding boxes conocidos
-        bbox_match = self._match_bounding_box(gdf_wgs84)
+        bbox_match = self._match_bounding_box(self.context.wgs84_bounds)
         
         # Matching con límites administrativos (mejora)
         boundary_matcher = BoundaryMatcher()
-        boundary_match = boundary_matcher.match_boundaries(gdf_wgs84)
+        boundary_match = boundary_matcher.match_boundaries(gdf_wgs84, context=self.context)
         
-        # Inferencia estadística
-        stats_inference = self._statistical_inference(gdf_wgs84)
+        # Inferencia estadística (sobre la muestra en capas grandes)
+        stats_inference = self._statistical_inference(self.context.sample.wgs84)
         
         # Combinar resultados con boost de boundary matching
         base_confidence = 0.0
@@ -112,11 +109,16 @@ class CRSInferenceEngine:
         results['method'] = method
         results['explicacion'] = explicacion
         
+        if self.context.is_sampled:
+            results['muestreo'] = {
+                **self.context.sampling_summary(),
+                'metricas': stats_inference.get('intervalos', {})
+            }
+        
         return results
     
-    def _analyze_coordinates(self, gdf: gpd.GeoDataFrame) -> Dict[str, Any]:
+    def _analyze_coordinates(self, bounds: np.ndarray) -> Dict[str, Any]:
         """Analiza las coordenadas para determinar si son geográficas o proyectadas"""
-        bounds = gdf.total_bounds
         minx, miny, maxx, maxy = bounds
         
         # Si las coordenadas están en rangos típicos de lat/lon
@@ -132,9 +134,8 @@ class CRSInferenceEngine:
             'bounds': bounds
         }
     
-    def _match_bounding_box(self, gdf: gpd.GeoDataFrame) -> Dict[str, Any]:
+    def _match_bounding_box(self, bounds: np.ndarray) -> Dict[str, Any]:
         """Compara con bounding boxes conocidos"""
-        bounds = gdf.total_bounds
         minx, miny, maxx, maxy = bounds
         
         colombia_bbox = self.BOUNDING_BOXES['colombia']
@@ -165,8 +166,9 @@ class CRSInferenceEngine:
     
     def _statistical_inference(self, gdf: gpd.GeoDataFrame) -> Dict[str, Any]:
         """Inferencia estadística de patrones espaciales"""
-        # Extraer coordenadas
-        coords = np.array([[geom.x, geom.y] for geom in gdf.geometry if geom is not None])
+        # Extraer coordenadas (buffer vectorizado compartido)
+        coord_arrays = self.context.sample.coordinates(gdf)
+        coords = coord_arrays.xy
         
         if len(coords) == 0:
             return {
@@ -181,6 +183,9 @@ class CRSInferenceEngine:
         lon_std = np.std(coords[:, 0])
         lat_std = np.std(coords[:, 1])
         
+        # Intervalos de confianza del centro cuando se trabaja sobre una muestra
+        intervals = self._center_intervals(coord_arrays) if self.context.is_sampled else {}
+        
         # Si la distribución es razonable para Colombia
         colombia_bbox = self.BOUNDING_BOXES['colombia']
         if (colombia_bbox['lon_min'] <= lon_mean <= colombia_bbox['lon_max'] and
@@ -188,13 +193,28 @@ class CRSInferenceEngine:
             return {
                 'crs': 'EPSG:4686',
                 'confidence': 0.75,
-                'explicacion': f'Análisis estadístico sugiere MAGNA-SIRGAS. Centro: ({lon_mean:.4f}, {lat_mean:.4f})'
+                'explicacion': f'Análisis estadístico sugiere MAGNA-SIRGAS. Centro: ({lon_mean:.4f}, {lat_mean:.4f})',
+                'intervalos': intervals
             }
         
         return {
             'crs': None,
             'confidence': 0.5,
-            'explicacion': 'Análisis estadístico no concluyente'
+            'explicacion': 'Análisis estadístico no concluyente',
+            'intervalos': intervals
+        }
+    
+    def _center_intervals(self, coord_arrays) -> Dict[str, Any]:
+        """Intervalos de confianza de la media de X e Y a partir de sumas por entidad"""
+        per_feature = np.column_stack([
+            coord_arrays.counts,
+            coord_arrays.sum_by_geometry(coord_arrays.xy[:, 0]),
+            coord_arrays.sum_by_geometry(coord_arrays.xy[:, 1])
+        ])
+        stats = self.context.sample_statistics
+        return {
+            'lon_media': stats.from_sums(per_feature, lambda s: s[..., 1] / s[..., 0]),
+            'lat_media': stats.from_sums(per_feature, lambda s: s[..., 2] / s[..., 0])
         }
 
 
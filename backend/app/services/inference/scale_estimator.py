@@ -4,7 +4,7 @@ Estimador de escala basado en densidad de vértices, resolución espacial y áre
 import geopandas as gpd
 import numpy as np
 from typing import Optional, Dict, Any
-from shapely.geometry import Point, LineString, Polygon
+from app.services.spatial.analysis_context import AnalysisContext
 
 
 class ScaleEstimator:
@@ -29,9 +29,10 @@ class ScaleEstimator:
         100000: 50.0, # 1:100000 -> 50m
     }
     
-    def __init__(self, gdf: gpd.GeoDataFrame):
+    def __init__(self, gdf: gpd.GeoDataFrame, context: Optional[AnalysisContext] = None):
         self.gdf = gdf
-        self.bounds = gdf.total_bounds
+        self.context = context if context is not None else AnalysisContext(gdf)
+        self.bounds = self.context.bounds
         
     def estimate_scale(self) -> Dict[str, Any]:
         """Estima la escala más probable del dataset"""
@@ -75,55 +76,26 @@ class ScaleEstimator:
         # Seleccionar la escala más probable (promedio ponderado)
         best_scale = self._select_best_scale(candidates)
         
+        if self.context.is_sampled:
+            metrics = {}
+            for candidate in (vertex_density_scale, spatial_resolution_scale):
+                metrics.update(candidate.get('intervalos', {}))
+            best_scale['muestreo'] = {**self.context.sampling_summary(), 'metricas': metrics}
+        
         return best_scale
     
     def _ensure_projected(self) -> gpd.GeoDataFrame:
-        """Convierte a CRS proyectado si es geográfico"""
-        if self.gdf.crs is None:
-            # Asumir WGS84 si no hay CRS
-            gdf_copy = self.gdf.copy()
-            gdf_copy.set_crs('EPSG:4326', allow_override=True)
-        else:
-            gdf_copy = self.gdf.copy()
-        
-        # Si es geográfico, convertir a proyección local (Bogotá)
-        if gdf_copy.crs and gdf_copy.crs.is_geographic:
-            try:
-                # Intentar convertir a MAGNA-SIRGAS Bogotá
-                gdf_copy = gdf_copy.to_crs('EPSG:3116')
-            except Exception:
-                # Si falla, usar UTM
-                try:
-                    gdf_copy = gdf_copy.to_crs('EPSG:32618')  # UTM 18N
-                except Exception:
-                    pass
-        
-        return gdf_copy
+        """Vista proyectada compartida (de la muestra en capas grandes)"""
+        return self.context.sample.projected
     
     def _estimate_from_vertex_density(self, gdf: gpd.GeoDataFrame) -> Dict[str, Any]:
         """Estima escala basándose en la densidad de vértices"""
         try:
-            # Contar vértices totales
-            total_vertices = 0
-            total_length = 0.0
-            
-            for geom in gdf.geometry:
-                if geom is None:
-                    continue
-                
-                if isinstance(geom, Point):
-                    total_vertices += 1
-                elif isinstance(geom, LineString):
-                    coords = list(geom.coords)
-                    total_vertices += len(coords)
-                    total_length += geom.length
-                elif isinstance(geom, Polygon):
-                    coords = list(geom.exterior.coords)
-                    total_vertices += len(coords)
-                    # Agregar interiores
-                    for interior in geom.interiors:
-                        total_vertices += len(list(interior.coords))
-                    total_length += geom.exterior.length
+            # Contar vértices totales y longitud de todos los segmentos
+            coords = self.context.sample.coordinates(gdf)
+            segment_lengths = coords.segment_lengths()
+            total_vertices = len(coords)
+            total_length = float(segment_lengths.sum())
             
             if total_vertices == 0:
                 return {'escala_estimada': None, 'confidence': 0.0}
@@ -160,12 +132,23 @@ class ScaleEstimator:
             # Ajustar a escala estándar más cercana
             estimated_scale = self._round_to_standard_scale(estimated_scale)
             
-            return {
+            result = {
                 'escala_estimada': estimated_scale,
                 'confidence': confidence,
                 'method': 'vertex_density',
                 'explicacion': f'Densidad de vértices: {vertex_density:.2f} vértices/m sugiere escala 1:{estimated_scale}'
             }
+            if self.context.is_sampled and total_length > 0:
+                per_feature = np.column_stack([
+                    coords.counts,
+                    coords.sum_by_geometry(segment_lengths, coords.segment_geometry_index())
+                ])
+                result['intervalos'] = {
+                    'densidad_vertices': self.context.sample_statistics.from_sums(
+                        per_feature, lambda s: s[..., 0] / s[..., 1]
+                    )
+                }
+            return result
         except Exception as e:
             return {
                 'escala_estimada': None,
@@ -177,30 +160,12 @@ class ScaleEstimator:
     def _estimate_from_spatial_resolution(self, gdf: gpd.GeoDataFrame) -> Dict[str, Any]:
         """Estima escala basándose en la resolución espacial (distancia mínima entre vértices)"""
         try:
-            min_distance = float('inf')
-            
-            # Calcular distancia mínima entre vértices
-            for geom in gdf.geometry:
-                if geom is None:
-                    continue
-                
-                if isinstance(geom, Point):
-                    # Para puntos, calcular distancia mínima entre todos los puntos
-                    coords = [(geom.x, geom.y)]
-                elif isinstance(geom, LineString):
-                    coords = list(geom.coords)
-                elif isinstance(geom, Polygon):
-                    coords = list(geom.exterior.coords)
-                else:
-                    continue
-                
-                # Calcular distancias entre vértices consecutivos
-                for i in range(len(coords) - 1):
-                    p1 = np.array(coords[i])
-                    p2 = np.array(coords[i + 1])
-                    dist = np.linalg.norm(p2 - p1)
-                    if dist > 0 and dist < min_distance:
-                        min_distance = dist
+            # Distancia mínima (no nula) entre vértices consecutivos
+            coords = self.context.sample.coordinates(gdf)
+            segment_lengths = coords.segment_lengths()
+            positive = segment_lengths > 0
+            segment_lengths = segment_lengths[positive]
+            min_distance = float(segment_lengths.min()) if len(segment_lengths) else float('inf')
             
             if min_distance == float('inf') or min_distance == 0:
                 return {'escala_estimada': None, 'confidence': 0.0}
@@ -228,12 +193,20 @@ class ScaleEstimator:
             
             estimated_scale = self._round_to_standard_scale(estimated_scale)
             
-            return {
+            result = {
                 'escala_estimada': estimated_scale,
                 'confidence': confidence,
                 'method': 'spatial_resolution',
                 'explicacion': f'Resolución espacial mínima: {min_distance:.2f}m sugiere escala 1:{estimated_scale}'
             }
+            if self.context.is_sampled:
+                # Mínimo por entidad; el mínimo muestral es una cota superior del real
+                per_feature_min = np.full(coords.num_geometries, np.inf)
+                np.minimum.at(per_feature_min, coords.segment_geometry_index()[positive], segment_lengths)
+                result['intervalos'] = {
+                    'resolucion_minima': self.context.sample_statistics.from_minimum(per_feature_min)
+                }
+            return result
         except Exception as e:
             return {
                 'escala_estimada': None,
@@ -245,7 +218,8 @@ class ScaleEstimator:
     def _estimate_from_area(self, gdf: gpd.GeoDataFrame) -> Dict[str, Any]:
         """Estima escala basándose en el área y extensión del dataset"""
         try:
-            bounds = gdf.total_bounds
+            # Extensión de la capa completa (aunque se trabaje sobre una muestra)
+            bounds = self.context.projected_bounds
             minx, miny, maxx, maxy = bounds
             
             # Calcular extensión en metros
@@ -253,9 +227,6 @@ class ScaleEstimator:
             height = abs(maxy - miny)
             max_extent = max(width, height)
             
-            # Calcular área total
-            total_area = gdf.geometry.area.sum()
-            
             if max_extent == 0:
                 return {'escala_estimada': None, 'confidence': 0.0}
             
@@ -4,21 +4,29 @@ Extractor de features para modelos de Machine Learning
 import geopandas as gpd
 import numpy as np
 from typing import Dict, Any, List, Optional
-from shapely.geometry import Point, LineString, Polygon
+from shapely.geometry import LineString, Polygon
+from app.services.spatial.analysis_context import AnalysisContext
+from app.services.validation.geometric_validator import count_errors
 
 
 class FeatureExtractor:
     """Extrae features de datos espaciales para modelos ML"""
     
-    def extract_features(self, gdf: gpd.GeoDataFrame, analysis_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    def extract_features(
+        self,
+        gdf: gpd.GeoDataFrame,
+        analysis_data: Optional[Dict[str, Any]] = None,
+        context: Optional[AnalysisContext] = None
+    ) -> Dict[str, Any]:
         """Extrae features para modelos ML"""
         features = {}
+        context = context if context is not None else AnalysisContext(gdf)
         
         # Features geométricas
-        features.update(self._extract_geometric_features(gdf))
+        features.update(self._extract_geometric_features(gdf, context))
         
         # Features de coordenadas
-        features.update(self._extract_coordinate_features(gdf))
+        features.update(self._extract_coordinate_features(gdf, context))
         
         # Features de análisis (si están disponibles)
         if analysis_data:
@@ -26,7 +34,7 @@ class FeatureExtractor:
         
         return features
     
-    def _extract_geometric_features(self, gdf: gpd.GeoDataFrame) -> Dict[str, Any]:
+    def _extract_geometric_features(self, gdf: gpd.GeoDataFrame, context: AnalysisContext) -> Dict[str, Any]:
         """Extrae features geométricas"""
         features = {}
         
@@ -45,20 +53,14 @@ class FeatureExtractor:
         features['num_multilinestrings'] = geom_types.get('MultiLineString', 0)
         features['num_multipolygons'] = geom_types.get('MultiPolygon', 0)
         
-        # Estadísticas de área (si aplica)
+        # Estadísticas de área (si aplica), sobre la vista proyectada compartida
         try:
-            if gdf.crs and not gdf.crs.is_geographic:
-                areas = gdf.geometry.area
-                features['total_area'] = float(areas.sum())
-                features['mean_area'] = float(areas.mean()) if len(areas) > 0 else 0.0
-                features['std_area'] = float(areas.std()) if len(areas) > 0 else 0.0
-            else:
-                # Convertir a proyectado para calcular área
-                gdf_proj = gdf.to_crs('EPSG:3116')
-                areas = gdf_proj.geometry.area
-                features['total_area'] = float(areas.sum())
-                features['mean_area'] = float(areas.mean()) if len(areas) > 0 else 0.0
-                features['std_area'] = float(areas.std()) if len(areas) > 0 else 0.0
+            if not context.is_metric:
+                raise ValueError("Sin CRS proyectado para calcular áreas")
+            areas = context.projected.geometry.area
+            features['total_area'] = float(areas.sum())
+            features['mean_area'] = float(areas.mean()) if len(areas) > 0 else 0.0
+            features['std_area'] = float(areas.std()) if len(areas) > 0 else 0.0
         except Exception:
             features['total_area'] = 0.0
             features['mean_area'] = 0.0
@@ -85,29 +87,21 @@ class FeatureExtractor:
             features['std_length'] = 0.0
         
         # Densidad de vértices
-        total_vertices = 0
-        for geom in gdf.geometry:
-            if geom is not None:
-                if isinstance(geom, Point):
-                    total_vertices += 1
-                elif isinstance(geom, LineString):
-                    total_vertices += len(list(geom.coords))
-                elif isinstance(geom, Polygon):
-                    total_vertices += len(list(geom.exterior.coords))
+        total_vertices = len(context.coordinates(gdf))
         
         features['total_vertices'] = total_vertices
         features['vertices_per_feature'] = total_vertices / len(gdf) if len(gdf) > 0 else 0.0
         
         return features
     
-    def _extract_coordinate_features(self, gdf: gpd.GeoDataFrame) -> Dict[str, Any]:
+    def _extract_coordinate_features(self, gdf: gpd.GeoDataFrame, context: AnalysisContext) -> Dict[str, Any]:
         """Extrae features de coordenadas"""
         features = {}
         
         if len(gdf) == 0:
             return features
         
-        bounds = gdf.total_bounds
+        bounds = context.bounds
         minx, miny, maxx, maxy = bounds
         
         features['min_x'] = float(minx)
@@ -120,18 +114,9 @@ class FeatureExtractor:
         features['center_y'] = float((miny + maxy) / 2)
         
         # Extraer coordenadas para análisis estadístico
-        coords = []
-        for geom in gdf.geometry:
-            if geom is not None:
-                if isinstance(geom, Point):
-                    coords.append([geom.x, geom.y])
-                elif isinstance(geom, LineString):
-                    coords.extend(list(geom.coords))
-                elif isinstance(geom, Polygon):
-                    coords.extend(list(geom.exterior.coords))
-        
-        if coords:
-            coords_array = np.array(coords)
+        coords_array = context.coordinates(gdf).xy
+        
+        if len(coords_array):
             features['mean_x'] = float(np.mean(coords_array[:, 0]))
             features['mean_y'] = float(np.mean(coords_array[:, 1]))
             features['std_x'] = float(np.std(coords_array[:, 0]))
@@ -174,7 +159,7 @@ class FeatureExtractor:
         
         # Validación
         validation = analysis_data.get('validation', {})
-        features['num_validation_errors'] = len(validation.get('errors', []))
+        features['num_validation_errors'] = count_errors(validation)
         features['num_outliers'] = len(validation.get('outliers', []))
         features['is_valid'] = 1 if validation.get('is_valid', False) else 0
         
@@ -1,4 +1,5 @@
 from app.services.spatial.file_loader import FileLoader
 from app.services.spatial.format_detector import FormatDetector
+from app.services.spatial.analysis_context import AnalysisContext
 
-__all__ = ["FileLoader", "FormatDetector"]
+__all__ = ["FileLoader", "FormatDetector", "AnalysisContext"]
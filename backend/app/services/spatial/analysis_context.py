@@ -0,0 +1,259 @@
+"""
+Contexto compartido de análisis: un único GeoDataFrame y sus vistas derivadas
+"""
+import geopandas as gpd
+import numpy as np
+import shapely
+from typing import Optional, List, Tuple, Dict, Any
+from app.services.spatial.coordinates import CoordinateArrays, extract_coordinates, has_z
+from app.services.spatial.sampling import SampleStatistics, stratified_sample
+from app.services.spatial.crs_pool import get_crs, get_transformer, to_crs
+
+METERS_PER_DEGREE = 111320.0
+
+
+class AnalysisContext:
+    """Mantiene el GeoDataFrame cargado y calcula sus vistas WGS84 y proyectada una sola vez
+
+    Con ``sample_size``, las capas con más entidades se analizan en modo
+    muestreo: ``sample`` es un contexto sobre una muestra estratificada
+    reproducible (``seed``) y las extensiones se obtienen reproyectando solo el
+    bounding box, de modo que el costo no depende del tamaño de la capa.
+    """
+
+    WGS84_CRS = 'EPSG:4326'
+    PROJECTED_CRS = 'EPSG:3116'  # MAGNA-SIRGAS Bogotá
+    FALLBACK_PROJECTED_CRS = 'EPSG:32618'  # UTM 18N
+
+    # Puntos de densificación por borde al reproyectar un bounding box
+    BOUNDS_DENSIFY_POINTS = 21
+    
+    def __init__(self, gdf: gpd.GeoDataFrame, sample_size: Optional[int] = None, seed: int = 0):
+        self.gdf = gdf
+        self.sample_size = sample_size
+        self.seed = seed
+        self._bounds: Optional[np.ndarray] = None
+        self._wgs84: Optional[gpd.GeoDataFrame] = None
+        self._wgs84_bounds: Optional[np.ndarray] = None
+        self._projected: Optional[gpd.GeoDataFrame] = None
+        self._projected_bounds: Optional[np.ndarray] = None
+        self._coordinates: List[Tuple[gpd.GeoDataFrame, CoordinateArrays]] = []
+        self._sample_positions: Optional[np.ndarray] = None
+        self._sample: Optional['AnalysisContext'] = None
+        self._sample_statistics: Optional[SampleStatistics] = None
+        self._tree: Optional[shapely.STRtree] = None
+        self._sample_neighbors: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    @property
+    def crs(self):
+        return self.gdf.crs
+
+    @property
+    def bounds(self) -> np.ndarray:
+        """Bounding box del GeoDataFrame original (calculado una vez)"""
+        if self._bounds is None:
+            self._bounds = self.gdf.total_bounds
+        return self._bounds
+
+    @property
+    def wgs84(self) -> gpd.GeoDataFrame:
+        """Vista en coordenadas geográficas
+
+        Sin CRS declarado se asume que las coordenadas ya son geográficas y se
+        reutiliza el mismo GeoDataFrame, sin copiarlo.
+        """
+        if self._wgs84 is None:
+            if self.gdf.crs is None or self.gdf.crs.is_geographic:
+                self._wgs84 = self.gdf
+            else:
+                self._wgs84 = to_crs(self.gdf, self.WGS84_CRS)
+        return self._wgs84
+
+    @property
+    def wgs84_bounds(self) -> np.ndarray:
+        """Bounding box de la vista WGS84 (calculado una vez)"""
+        if self._wgs84_bounds is None:
+            if self.gdf.crs is None or self.gdf.crs.is_geographic:
+                self._wgs84_bounds = self.bounds
+            elif self.is_sampled:
+                self._wgs84_bounds = self._transform_bounds(self.WGS84_CRS)
+            else:
+                self._wgs84_bounds = self.wgs84.total_bounds
+        return self._wgs84_bounds
+
+    @property
+    def projected(self) -> gpd.GeoDataFrame:
+        """Vista en CRS proyectado (metros) para cálculos de distancia y área
+
+        Los datos geográficos se reproyectan a MAGNA-SIRGAS Bogotá (o UTM 18N si
+        falla). Los datos ya proyectados, o sin CRS, se reutilizan tal cual.
+        """
+        if self._projected is None:
+            self._projected = self._build_projected()
+        return self._projected
+
+    @property
+    def projected_bounds(self) -> np.ndarray:
+        """Bounding box de la capa completa en el CRS de la vista proyectada
+
+        En modo muestreo se reproyecta solo el bounding box (densificado) al
+        CRS de la vista proyectada de la muestra.
+        """
+        if self._projected_bounds is None:
+            if self.is_sampled:
+                self._projected_bounds = self._transform_bounds(self.sample.projected.crs)
+            else:
+                projected = self.projected
+                self._projected_bounds = self.bounds if projected is self.gdf else projected.total_bounds
+        return self._projected_bounds
+    
+    @property
+    def is_metric(self) -> bool:
+        """Indica si la vista proyectada está realmente en un CRS proyectado"""
+        crs = self.sample.projected.crs
+        return crs is not None and not crs.is_geographic
+    
+    @property
+    def is_sampled(self) -> bool:
+        """Indica si la capa supera el tamaño de muestra y se analiza por muestreo"""
+        return bool(self.sample_size) and len(self.gdf) > self.sample_size
+    
+    @property
+    def sample_positions(self) -> np.ndarray:
+        """Posiciones (en el GeoDataFrame original) de las entidades muestreadas"""
+        if self._sample_positions is None:
+            if self.is_sampled:
+                self._sample_positions = stratified_sample(
+                    self.gdf.geometry, self.sample_size, self.bounds, seed=self.seed
+                )
+            else:
+                self._sample_positions = np.arange(len(self.gdf))
+        return self._sample_positions
+    
+    @property
+    def sample(self) -> 'AnalysisContext':
+        """Contexto sobre la muestra (el propio contexto si no hay muestreo)"""
+        if not self.is_sampled:
+            return self
+        if self._sample is None:
+            self._sample = AnalysisContext(self.gdf.iloc[self.sample_positions])
+        return self._sample
+    
+    @property
+    def sample_statistics(self) -> SampleStatistics:
+        """Intervalos de confianza bootstrap sobre las entidades de la muestra"""
+        if self._sample_statistics is None:
+            self._sample_statistics = SampleStatistics(len(self.sample.gdf), seed=self.seed)
+        return self._sample_statistics
+    
+    @property
+    def expansion_factor(self) -> float:
+        """Entidades de la capa por entidad muestreada (1.0 sin muestreo)"""
+        sampled = len(self.sample.gdf)
+        return len(self.gdf) / sampled if sampled else 1.0
+    
+    def sampling_summary(self) -> Optional[Dict[str, Any]]:
+        """Descripción del muestreo aplicado, o None si se analizó la capa completa"""
+        if not self.is_sampled:
+            return None
+        return {
+            'metodo': 'estratificado_rejilla',
+            'tamaño_muestra': int(len(self.sample_positions)),
+            'total_entidades': int(len(self.gdf)),
+            'semilla': self.seed,
+            'confianza': self.sample_statistics.confidence
+        }
+    
+    @property
+    def tree(self) -> shapely.STRtree:
+        """STRtree sobre las geometrías originales (en el CRS de la capa), construido una vez
+
+        Construirlo solo carga los bounding boxes; en modo muestreo se consulta
+        únicamente con las entidades de la muestra.
+        """
+        if self._tree is None:
+            self._tree = shapely.STRtree(np.asarray(self.gdf.geometry.values, dtype=object))
+        return self._tree
+    
+    def sample_neighbors(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Pares (entidad muestreada, otra entidad que la interseca), en posiciones del original
+
+        Son las ventanas alrededor de la muestra en las que se evalúan la
+        topología y la consistencia sin recorrer la capa completa.
+        """
+        if self._sample_neighbors is None:
+            positions = self.sample_positions
+            geoms = np.asarray(self.gdf.geometry.values, dtype=object)
+            source, neighbors = self.tree.query(geoms[positions], predicate='intersects')
+            source = positions[source]
+            others = source != neighbors
+            self._sample_neighbors = (source[others], neighbors[others])
+        return self._sample_neighbors
+    
+    def sample_window(self, margin: float = 0.0) -> np.ndarray:
+        """Posiciones de la muestra y de las entidades a menos de ``margin`` metros de ella
+
+        La cercanía se evalúa entre bounding boxes en el CRS de la capa (el margen
+        se convierte a grados en capas geográficas), así que la ventana incluye a
+        todas las vecinas que intersecan y a las separadas por huecos angostos.
+        """
+        positions = self.sample_positions
+        geoms = np.asarray(self.gdf.geometry.values, dtype=object)[positions]
+        present = ~shapely.is_missing(geoms)
+        bounds = shapely.bounds(geoms[present])
+        pad = self._margin_units(margin)
+        boxes = shapely.box(bounds[:, 0] - pad, bounds[:, 1] - pad, bounds[:, 2] + pad, bounds[:, 3] + pad)
+        _, around = self.tree.query(boxes)
+        return np.union1d(positions, around)
+    
+    def subset(self, positions: np.ndarray) -> 'AnalysisContext':
+        """Contexto sobre un subconjunto de entidades (por posición)"""
+        return AnalysisContext(self.gdf.iloc[positions])
+
+    def coordinates(self, gdf: Optional[gpd.GeoDataFrame] = None) -> CoordinateArrays:
+        """Coordenadas vectorizadas de una vista (por defecto el original), extraídas una vez
+
+        Las vistas que comparten objeto (p. ej. datos ya proyectados) comparten
+        también el mismo buffer de coordenadas.
+        """
+        if gdf is None:
+            gdf = self.gdf
+        for view, coords in self._coordinates:
+            if view is gdf:
+                return coords
+
+        coords = extract_coordinates(gdf.geometry, include_z=has_z(gdf.geometry))
+        self._coordinates.append((gdf, coords))
+        return coords
+
+    def _margin_units(self, meters: float) -> float:
+        """Distancia en metros expresada en unidades del CRS de la capa"""
+        if meters <= 0:
+            return 0.0
+        if self.gdf.crs is None:
+            return meters
+        crs = get_crs(self.gdf.crs)
+        if not crs.is_geographic:
+            return meters / (crs.axis_info[0].unit_conversion_factor if crs.axis_info else 1.0)
+        # Un grado de longitud se acorta con la latitud: se usa la más alejada del ecuador
+        latitude = float(np.clip(np.nan_to_num(np.max(np.abs(self.bounds[[1, 3]]))), 0.0, 89.0))
+        return meters / (METERS_PER_DEGREE * np.cos(np.radians(latitude)))
+    
+    def _transform_bounds(self, target_crs) -> np.ndarray:
+        """Reproyecta el bounding box (densificado) del CRS de la capa a ``target_crs``"""
+        if self.gdf.crs is None or target_crs is None or get_crs(target_crs) == self.gdf.crs:
+            return self.bounds
+        transformer = get_transformer(self.gdf.crs, target_crs)
+        return np.array(transformer.transform_bounds(*self.bounds, densify_pts=self.BOUNDS_DENSIFY_POINTS))
+    
+    def _build_projected(self) -> gpd.GeoDataFrame:
+        if self.gdf.crs is None or not self.gdf.crs.is_geographic:
+            return self.gdf
+
+        try:
+            return to_crs(self.gdf, self.PROJECTED_CRS)
+        except Exception:
+            try:
+                return to_crs(self.gdf, self.FALLBACK_PROJECTED_CRS)
+            except Exception:
+                return self.gdf
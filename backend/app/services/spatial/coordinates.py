@@ -0,0 +1,150 @@
+"""
+Extracción vectorizada de coordenadas (shapely 2) compartida por los analizadores
+"""
+import numpy as np
+import shapely
+from typing import Any, Optional
+
+# Tipos de shapely que contienen otras geometrías (Multi* y GeometryCollection)
+_MULTI_TYPE_IDS = (4, 5, 6, 7)
+_POLYGON_TYPE_ID = 3
+
+
+class CoordinateArrays:
+    """Coordenadas contiguas en float64 de un arreglo de geometrías
+
+    - ``xy``: arreglo (N, 2) con todos los vértices, en el orden de shapely
+    - ``z``: arreglo (N,) con la coordenada Z (NaN donde no existe) o None
+    - ``geometry_offsets``: vértices de la geometría ``i`` en
+      ``xy[geometry_offsets[i]:geometry_offsets[i + 1]]``
+    - ``path_offsets``: igual, pero por trayectoria (punto, línea o anillo de
+      polígono, incluidos huecos y partes de geometrías Multi*)
+    """
+
+    def __init__(
+        self,
+        xy: np.ndarray,
+        z: Optional[np.ndarray],
+        geometry_offsets: np.ndarray,
+        path_offsets: np.ndarray
+    ):
+        self.xy = xy
+        self.z = z
+        self.geometry_offsets = geometry_offsets
+        self.path_offsets = path_offsets
+
+    def __len__(self) -> int:
+        return len(self.xy)
+
+    @property
+    def num_geometries(self) -> int:
+        return len(self.geometry_offsets) - 1
+
+    @property
+    def counts(self) -> np.ndarray:
+        """Número de vértices por geometría"""
+        return np.diff(self.geometry_offsets)
+
+    @property
+    def geometry_index(self) -> np.ndarray:
+        """Índice (posicional) de la geometría a la que pertenece cada vértice"""
+        return np.repeat(np.arange(self.num_geometries), self.counts)
+
+    @property
+    def z_values(self) -> np.ndarray:
+        """Valores Z finitos (vacío si las geometrías son 2D)"""
+        if self.z is None:
+            return np.empty(0, dtype=np.float64)
+        return self.z[np.isfinite(self.z)]
+
+    def sum_by_geometry(self, values: np.ndarray, index: Optional[np.ndarray] = None) -> np.ndarray:
+        """Suma ``values`` por geometría (por defecto un valor por vértice)"""
+        if index is None:
+            index = self.geometry_index
+        return np.bincount(index, weights=values, minlength=self.num_geometries)
+
+    def segment_geometry_index(self) -> np.ndarray:
+        """Índice de la geometría a la que pertenece cada segmento real"""
+        if len(self.xy) < 2:
+            return np.empty(0, dtype=np.int64)
+        return self.geometry_index[:-1][self.segment_mask()]
+
+    def segment_mask(self) -> np.ndarray:
+        """Máscara de pares de vértices consecutivos que forman un segmento real
+
+        Excluye los pares que saltan de una trayectoria a la siguiente (entre
+        geometrías, partes de Multi* o anillos de un polígono).
+        """
+        if len(self.xy) < 2:
+            return np.zeros(0, dtype=bool)
+        mask = np.ones(len(self.xy) - 1, dtype=bool)
+        path_starts = self.path_offsets[1:-1]
+        path_starts = path_starts[(path_starts > 0) & (path_starts < len(self.xy))]
+        mask[path_starts - 1] = False
+        return mask
+
+    def segment_lengths(self) -> np.ndarray:
+        """Longitud de cada segmento real (ver ``segment_mask``)"""
+        if len(self.xy) < 2:
+            return np.empty(0, dtype=np.float64)
+        deltas = np.diff(self.xy, axis=0)
+        lengths = np.hypot(deltas[:, 0], deltas[:, 1])
+        return lengths[self.segment_mask()]
+
+
+def _as_geometry_array(geometries: Any) -> np.ndarray:
+    """Convierte GeoSeries/GeometryArray/listas en un arreglo numpy de geometrías"""
+    values = getattr(geometries, 'values', geometries)
+    return np.asarray(values, dtype=object)
+
+
+def _path_offsets(geoms: np.ndarray) -> np.ndarray:
+    """Offsets de cada trayectoria (punto, línea o anillo) en el orden de get_coordinates"""
+    parts = shapely.get_parts(geoms)
+    # get_parts solo desanida un nivel (p. ej. GeometryCollection de MultiPolygon)
+    while len(parts) and np.isin(shapely.get_type_id(parts), _MULTI_TYPE_IDS).any():
+        parts = shapely.get_parts(parts)
+
+    if len(parts) == 0:
+        return np.zeros(1, dtype=np.int64)
+
+    non_empty = ~shapely.is_empty(parts)
+    is_polygon = (shapely.get_type_id(parts) == _POLYGON_TYPE_ID) & non_empty
+
+    path_counts = np.where(
+        is_polygon,
+        shapely.get_num_interior_rings(parts) + 1,
+        non_empty.astype(np.int64)
+    )
+    lengths = np.zeros(int(path_counts.sum()), dtype=np.int64)
+    ring_mask = np.repeat(is_polygon, path_counts)
+    lengths[ring_mask] = shapely.get_num_coordinates(shapely.get_rings(parts[is_polygon]))
+    lengths[~ring_mask] = shapely.get_num_coordinates(parts[~is_polygon & non_empty])
+
+    return np.concatenate(([0], np.cumsum(lengths)))
+
+
+def extract_coordinates(geometries: Any, include_z: bool = False) -> CoordinateArrays:
+    """Extrae todos los vértices (incluidos huecos y partes Multi*) como arreglos contiguos"""
+    geoms = _as_geometry_array(geometries)
+
+    coords = shapely.get_coordinates(geoms, include_z=include_z)
+    coords = np.ascontiguousarray(coords, dtype=np.float64)
+    xy = np.ascontiguousarray(coords[:, :2])
+    z = np.ascontiguousarray(coords[:, 2]) if include_z else None
+
+    counts = shapely.get_num_coordinates(geoms)
+    geometry_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+    return CoordinateArrays(
+        xy=xy,
+        z=z,
+        geometry_offsets=geometry_offsets,
+        path_offsets=_path_offsets(geoms)
+    )
+
+
+def has_z(geometries: Any) -> bool:
+    """Indica si alguna geometría tiene coordenada Z"""
+    geoms = _as_geometry_array(geometries)
+    return bool(len(geoms)) and bool(shapely.has_z(geoms).any())
@@ -0,0 +1,107 @@
+"""
+Pool de objetos CRS y Transformer de pyproj compartido por todo el proceso
+
+Interpretar un CRS y crear un pipeline de PROJ cuesta milisegundos cada vez;
+con el pool se construyen una vez por clave y se reutilizan entre servicios y
+peticiones (pyproj permite usar un mismo Transformer desde varios hilos).
+"""
+import numpy as np
+import shapely
+import geopandas as gpd
+from geopandas.array import GeometryArray
+from pyproj import CRS, Transformer
+from pyproj.transformer import AreaOfInterest, TransformerGroup
+from typing import Any, Dict, Hashable, Optional, Tuple
+from app.core.config import settings
+from app.core.lru_cache import LRUCache
+from app.services.transformation.parallel_reprojection import parallel_reprojector
+
+crs_cache = LRUCache(settings.CRS_CACHE_SIZE)
+transformer_cache = LRUCache(settings.TRANSFORMER_CACHE_SIZE)
+
+
+def _crs_key(value: Any) -> Hashable:
+    """Clave de un CRS sin interpretarlo (el texto de entrada o el de un CRS ya construido)"""
+    if isinstance(value, CRS):
+        return value.srs
+    if isinstance(value, dict):
+        return tuple(sorted(value.items()))
+    return value
+
+
+def get_crs(value: Any) -> CRS:
+    """CRS interpretado desde texto (EPSG, WKT, PROJ), código o CRS existente"""
+    if isinstance(value, CRS):
+        return value
+    return crs_cache.get_or_create(_crs_key(value), lambda: CRS.from_user_input(value))
+
+
+def get_transformer(
+    crs_source: Any,
+    crs_target: Any,
+    always_xy: bool = True,
+    area_of_interest: Optional[Tuple[float, float, float, float]] = None
+) -> Transformer:
+    """Transformer por (origen, destino, always_xy, área de interés en grados oeste/sur/este/norte)"""
+    aoi = tuple(float(v) for v in area_of_interest) if area_of_interest is not None else None
+    key = (_crs_key(crs_source), _crs_key(crs_target), always_xy, aoi)
+
+    def create() -> Transformer:
+        return Transformer.from_crs(
+            get_crs(crs_source), get_crs(crs_target), always_xy=always_xy,
+            area_of_interest=AreaOfInterest(*aoi) if aoi is not None else None
+        )
+
+    return transformer_cache.get_or_create(key, create)
+
+
+def get_transformer_group(
+    crs_source: Any,
+    crs_target: Any,
+    always_xy: bool = True,
+    area_of_interest: Optional[Tuple[float, float, float, float]] = None
+) -> TransformerGroup:
+    """Operaciones candidatas de PROJ para el par de CRS (mismo pool y clave que ``get_transformer``)"""
+    aoi = tuple(float(v) for v in area_of_interest) if area_of_interest is not None else None
+    key = ('grupo', _crs_key(crs_source), _crs_key(crs_target), always_xy, aoi)
+
+    def create() -> TransformerGroup:
+        return TransformerGroup(
+            get_crs(crs_source), get_crs(crs_target), always_xy=always_xy,
+            area_of_interest=AreaOfInterest(*aoi) if aoi is not None else None
+        )
+
+    return transformer_cache.get_or_create(key, create)
+
+
+def to_crs(gdf: gpd.GeoDataFrame, crs_target: Any, transformer: Optional[Transformer] = None) -> gpd.GeoDataFrame:
+    """Equivalente a ``gdf.to_crs(crs_target)`` usando el Transformer del pool (o ``transformer``)"""
+    if gdf.crs is None:
+        raise ValueError("No se puede transformar: GDF no tiene CRS definido")
+    target = get_crs(crs_target)
+    if gdf.crs == target:
+        return gdf.set_crs(target, allow_override=True)
+
+    if transformer is None:
+        transformer = get_transformer(gdf.crs, target)
+
+    geoms = np.asarray(gdf.geometry.values, dtype=object)
+    transformed = geoms.copy()
+    has_z = shapely.has_z(geoms)
+    for selected, include_z in ((~has_z, False), (has_z, True)):
+        if selected.any():
+            # Las capas con muchos vértices se transforman por bloques en paralelo
+            transformed[selected] = parallel_reprojector.transform_geometries(geoms[selected], transformer, include_z)
+
+    # GeometryArray evita revalidar cada geometría al construir la serie
+    result = gdf.copy()
+    result[gdf.geometry.name] = gpd.GeoSeries(GeometryArray(transformed, crs=target), index=gdf.index)
+    return result.set_crs(target, allow_override=True)
+
+
+def pool_stats() -> Dict[str, Dict[str, int]]:
+    """Entradas y aciertos/fallos de los cachés de CRS y Transformer"""
+    return {
+        'crs': crs_cache.stats(),
+        'transformadores': transformer_cache.stats()
+    }
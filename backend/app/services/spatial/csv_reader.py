@@ -0,0 +1,149 @@
+"""
+Lectura por bloques de CSV con coordenadas (memoria acotada por bloque)
+"""
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+from typing import Any, Iterator, List, Optional, Sequence, Tuple, Union
+from app.core.config import settings
+from app.services.spatial.coordinates import CoordinateArrays
+
+
+def read_csv_header(path: str) -> List[str]:
+    """Nombres de columnas del CSV (solo lee el encabezado)"""
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def row_range(rows: Optional[Union[int, slice]]) -> Tuple[Optional[range], Optional[int]]:
+    """Traduce ``rows`` a (skiprows, nrows) de pandas, conservando el encabezado"""
+    if rows is None:
+        return None, None
+    if isinstance(rows, int):
+        return None, rows
+    if isinstance(rows, slice):
+        if rows.step is not None:
+            raise ValueError("rows no admite slice con paso")
+        start = rows.start or 0
+        skiprows = range(1, start + 1) if start else None
+        nrows = rows.stop - start if rows.stop is not None else None
+        return skiprows, nrows
+    raise TypeError("rows debe ser un entero o un slice")
+
+
+def iter_csv_chunks(
+    path: str,
+    lon_col: str,
+    lat_col: str,
+    columns: Optional[Sequence[str]] = None,
+    rows: Optional[Union[int, slice]] = None,
+    chunk_rows: Optional[int] = None
+) -> Iterator[pd.DataFrame]:
+    """Itera el CSV por bloques de filas con las coordenadas como float64
+
+    Con ``columns`` solo se leen esas columnas además de las coordenadas.
+    """
+    usecols = None
+    if columns is not None:
+        usecols = list(dict.fromkeys([lon_col, lat_col, *columns]))
+    skiprows, nrows = row_range(rows)
+
+    reader = pd.read_csv(
+        path,
+        usecols=usecols,
+        dtype={lon_col: np.float64, lat_col: np.float64},
+        skiprows=skiprows,
+        nrows=nrows,
+        chunksize=chunk_rows or settings.CSV_CHUNK_ROWS
+    )
+    with reader:
+        for chunk in reader:
+            yield chunk
+
+
+def _extent_mask(x: np.ndarray, y: np.ndarray, bbox: Optional[Tuple[float, float, float, float]], mask: Optional[Any]) -> Optional[np.ndarray]:
+    """Filas del bloque dentro de ``bbox`` y que intersectan ``mask`` (None si no hay filtro)"""
+    keep = None
+    if bbox is not None:
+        minx, miny, maxx, maxy = bbox
+        keep = (x >= minx) & (x <= maxx) & (y >= miny) & (y <= maxy)
+    if mask is not None:
+        inside = shapely.intersects_xy(mask, x, y)
+        keep = inside if keep is None else keep & inside
+    return keep
+
+
+def read_csv_points(
+    path: str,
+    lon_col: str,
+    lat_col: str,
+    columns: Optional[Sequence[str]] = None,
+    bbox: Optional[Tuple[float, float, float, float]] = None,
+    mask: Optional[Any] = None,
+    rows: Optional[Union[int, slice]] = None,
+    chunk_rows: Optional[int] = None
+) -> gpd.GeoDataFrame:
+    """Construye un GeoDataFrame de puntos leyendo el CSV por bloques
+
+    La geometría se crea bloque a bloque y el filtro espacial se aplica antes
+    de acumular, de modo que las filas descartadas nunca se retienen.
+    ``columns`` limita los atributos (``[]`` para solo geometría).
+    """
+    frames = []
+    geometries = []
+    for chunk in iter_csv_chunks(path, lon_col, lat_col, columns=columns, rows=rows, chunk_rows=chunk_rows):
+        x = chunk[lon_col].to_numpy()
+        y = chunk[lat_col].to_numpy()
+        keep = _extent_mask(x, y, bbox, mask)
+        if keep is not None:
+            chunk, x, y = chunk[keep], x[keep], y[keep]
+
+        geometries.append(shapely.points(x, y))
+        frames.append(chunk if columns is None else chunk[list(columns)])
+
+    if not frames:
+        return gpd.GeoDataFrame(geometry=gpd.GeoSeries([]))
+
+    df = pd.concat(frames, ignore_index=True)
+    return gpd.GeoDataFrame(df, geometry=gpd.GeoSeries(np.concatenate(geometries)))
+
+
+def read_csv_coordinates(
+    path: str,
+    lon_col: str,
+    lat_col: str,
+    bbox: Optional[Tuple[float, float, float, float]] = None,
+    mask: Optional[Any] = None,
+    rows: Optional[Union[int, slice]] = None,
+    chunk_rows: Optional[int] = None
+) -> CoordinateArrays:
+    """Lee solo las columnas de coordenadas por bloques, sin crear geometrías ni atributos
+
+    El pico de memoria es ~2x el arreglo final de coordenadas: los bloques
+    acumulados más el arreglo contiguo resultante.
+    """
+    xs = []
+    ys = []
+    for chunk in iter_csv_chunks(path, lon_col, lat_col, columns=[], rows=rows, chunk_rows=chunk_rows):
+        x = chunk[lon_col].to_numpy()
+        y = chunk[lat_col].to_numpy()
+        keep = _extent_mask(x, y, bbox, mask)
+        if keep is not None:
+            x, y = x[keep], y[keep]
+        xs.append(x)
+        ys.append(y)
+
+    count = sum(len(x) for x in xs)
+    xy = np.empty((count, 2), dtype=np.float64)
+    offset = 0
+    while xs:
+        # Liberar cada bloque en cuanto se copia al arreglo final
+        x = xs.pop(0)
+        y = ys.pop(0)
+        xy[offset:offset + len(x), 0] = x
+        xy[offset:offset + len(x), 1] = y
+        offset += len(x)
+
+    # Cada punto es una geometría con una única trayectoria
+    offsets = np.arange(count + 1, dtype=np.int64)
+    return CoordinateArrays(xy=xy, z=None, geometry_offsets=offsets, path_offsets=offsets)
@@ -0,0 +1,209 @@
+"""
+Estadísticas de banda y error altimétrico de modelos digitales de elevación
+"""
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+from typing import Optional, Dict, Any, Tuple
+from app.core.config import settings
+from app.services.spatial.raster_reader import RasterReader
+
+
+class DEMStatistics:
+    """Mínimo, máximo, desviación estándar, pendiente, rugosidad y nodata de un DEM
+
+    - Modo aproximado (por defecto): una lectura reducida de la banda, servida
+      desde las overviews internas cuando existen.
+    - Modo exacto: recorre la banda a resolución completa por bloques y
+      acumula sumas, así que la memoria queda acotada por ventana.
+
+    El error vertical combina el efecto de la pendiente sobre medio píxel de
+    incertidumbre horizontal con la rugosidad local (variación que la rejilla
+    no representa): ``sqrt((pixel / 2 * tan(pendiente))² + rugosidad²)``,
+    ambos como valores cuadráticos medios.
+    """
+
+    def __init__(self, reader: RasterReader, band: int = 1, crs: Optional[str] = None):
+        self.reader = reader
+        self.band = band
+        self.pixel_size = reader.pixel_size_meters(crs)
+
+    def compute(self, exact: Optional[bool] = None, max_size: Optional[int] = None) -> Dict[str, Any]:
+        """Estadísticas del DEM (``exact`` por defecto según settings.DEM_STATS_EXACT)"""
+        if exact is None:
+            exact = settings.DEM_STATS_EXACT
+
+        with rasterio.open(self.reader.file_path) as src:
+            if exact:
+                accumulator = self._accumulate_blocks(src)
+                source = 'exacto'
+            else:
+                out_shape = RasterReader.decimated_shape(src, self.band, max_size)
+                data = src.read(self.band, out_shape=out_shape, masked=True)
+                # Tamaño de píxel de la lectura reducida (en metros)
+                scale = (src.width / out_shape[1], src.height / out_shape[0])
+                pixel = (self.pixel_size[0] * scale[0], self.pixel_size[1] * scale[1])
+                accumulator = _Accumulator()
+                accumulator.add(*self._terrain(self._as_float(data), pixel))
+                if scale == (1.0, 1.0):
+                    source = 'exacto'
+                elif src.overviews(self.band):
+                    source = 'overview'
+                else:
+                    source = 'lectura_reducida'
+
+        return self._result(accumulator, source)
+
+    def _accumulate_blocks(self, src) -> '_Accumulator':
+        """Recorre la banda a resolución completa por ventanas de bloque
+
+        Cada ventana se lee con un píxel de borde para que las diferencias
+        finitas en los límites usen los vecinos reales.
+        """
+        accumulator = _Accumulator()
+        for window in self.reader.iter_windows(src, self.band):
+            row0 = max(0, window.row_off - 1)
+            col0 = max(0, window.col_off - 1)
+            row1 = min(src.height, window.row_off + window.height + 1)
+            col1 = min(src.width, window.col_off + window.width + 1)
+            padded = Window(col0, row0, col1 - col0, row1 - row0)
+            data = self._as_float(src.read(self.band, window=padded, masked=True))
+
+            inner = (
+                slice(window.row_off - row0, window.row_off - row0 + window.height),
+                slice(window.col_off - col0, window.col_off - col0 + window.width)
+            )
+            accumulator.add(*self._terrain(data, self.pixel_size, inner))
+        return accumulator
+
+    @staticmethod
+    def _as_float(data: np.ma.MaskedArray) -> np.ndarray:
+        """Arreglo float64 con NaN en nodata y valores no finitos"""
+        return np.ma.filled(data.astype(np.float64), np.nan)
+
+    @staticmethod
+    def _terrain(
+        data: np.ndarray,
+        pixel: Tuple[float, float],
+        inner: Optional[Tuple[slice, slice]] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Elevaciones, tangente de la pendiente y residuo de rugosidad (NaN donde no aplica)
+
+        La rugosidad es la diferencia entre la celda y el promedio de sus 4
+        vecinos; con ``inner`` se descarta el borde añadido a la ventana.
+        """
+        dz_dy, dz_dx = (np.full(data.shape, np.nan), np.full(data.shape, np.nan))
+        if data.shape[0] > 1:
+            dz_dy = np.gradient(data, axis=0) / pixel[1]
+        if data.shape[1] > 1:
+            dz_dx = np.gradient(data, axis=1) / pixel[0]
+        slope = np.hypot(dz_dx, dz_dy)
+
+        roughness = np.full(data.shape, np.nan)
+        if data.shape[0] > 2 and data.shape[1] > 2:
+            neighbors = (
+                data[:-2, 1:-1] + data[2:, 1:-1] + data[1:-1, :-2] + data[1:-1, 2:]
+            ) / 4
+            roughness[1:-1, 1:-1] = data[1:-1, 1:-1] - neighbors
+
+        if inner is not None:
+            data, slope, roughness = data[inner], slope[inner], roughness[inner]
+        return data, slope, roughness
+
+    def _result(self, acc: '_Accumulator', source: str) -> Dict[str, Any]:
+        pixel = max(self.pixel_size)
+        result = {
+            'minimo': None,
+            'maximo': None,
+            'media': None,
+            'desviacion_estandar': None,
+            'pendiente_media_grados': None,
+            'rugosidad': None,
+            'error_altimetrico': None,
+            'proporcion_nodata': acc.nodata_ratio,
+            'pixeles_leidos': acc.total,
+            'fuente': source
+        }
+        if acc.count == 0:
+            return result
+
+        result.update({
+            'minimo': acc.minimum,
+            'maximo': acc.maximum,
+            'media': acc.mean,
+            'desviacion_estandar': acc.std
+        })
+
+        slope_rms = acc.slope_rms
+        roughness_rms = acc.roughness_rms
+        if slope_rms is not None:
+            result['pendiente_media_grados'] = float(np.degrees(np.arctan(acc.slope_mean)))
+        if roughness_rms is not None:
+            result['rugosidad'] = roughness_rms
+        if slope_rms is not None or roughness_rms is not None:
+            result['error_altimetrico'] = float(np.hypot(pixel / 2 * (slope_rms or 0.0), roughness_rms or 0.0))
+        return result
+
+
+class _Accumulator:
+    """Sumas acumuladas por ventana para estadísticas sin retener la banda"""
+
+    def __init__(self):
+        self.total = 0
+        self.count = 0
+        self.minimum = None
+        self.maximum = None
+        self.shift = None
+        self.sum = 0.0
+        self.sum_sq = 0.0
+        self.slope = [0, 0.0, 0.0]
+        self.roughness = [0, 0.0]
+
+    def add(self, values: np.ndarray, slope: np.ndarray, roughness: np.ndarray) -> None:
+        self.total += values.size
+        valid = values[np.isfinite(values)]
+        if len(valid):
+            if self.shift is None:
+                # Desplazar por el primer promedio evita perder precisión en la varianza
+                self.shift = float(valid.mean())
+            centered = valid - self.shift
+            self.count += len(valid)
+            self.sum += float(centered.sum())
+            self.sum_sq += float((centered ** 2).sum())
+            low, high = float(valid.min()), float(valid.max())
+            self.minimum = low if self.minimum is None else min(self.minimum, low)
+            self.maximum = high if self.maximum is None else max(self.maximum, high)
+
+        slope = slope[np.isfinite(slope)]
+        self.slope[0] += len(slope)
+        self.slope[1] += float(slope.sum())
+        self.slope[2] += float((slope ** 2).sum())
+
+        roughness = roughness[np.isfinite(roughness)]
+        self.roughness[0] += len(roughness)
+        self.roughness[1] += float((roughness ** 2).sum())
+
+    @property
+    def nodata_ratio(self) -> Optional[float]:
+        return 1.0 - self.count / self.total if self.total else None
+
+    @property
+    def mean(self) -> float:
+        return self.shift + self.sum / self.count
+
+    @property
+    def std(self) -> float:
+        variance = self.sum_sq / self.count - (self.sum / self.count) ** 2
+        return float(np.sqrt(max(variance, 0.0)))
+
+    @property
+    def slope_mean(self) -> float:
+        return self.slope[1] / self.slope[0]
+
+    @property
+    def slope_rms(self) -> Optional[float]:
+        return float(np.sqrt(self.slope[2] / self.slope[0])) if self.slope[0] else None
+
+    @property
+    def roughness_rms(self) -> Optional[float]:
+        return float(np.sqrt(self.roughness[1] / self.roughness[0])) if self.roughness[0] else None
@@ -1,15 +1,22 @@
 import os
+import time
+import logging
 import geopandas as gpd
-import pandas as pd
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Sequence, Tuple, Union
 from pathlib import Path
+from app.core.config import settings
 from app.services.spatial.format_detector import FormatDetector
 from app.services.spatial.raster_reader import RasterReader
+from app.services.spatial.vector_reader import read_vector
+from app.services.spatial.csv_reader import read_csv_header, read_csv_points, read_csv_coordinates
+from app.services.spatial.coordinates import CoordinateArrays, extract_coordinates
+
+logger = logging.getLogger(__name__)
 
 class FileLoader:
     """Carga archivos espaciales en diferentes formatos"""
     
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, engine: Optional[str] = None, optimized_path: Optional[str] = None):
         # Normalizar la ruta: convertir a absoluta si es relativa
         if not os.path.isabs(file_path):
             # Si es relativa, intentar resolverla desde diferentes ubicaciones
@@ -45,54 +52,153 @@ class FileLoader:
         
         self.format = FormatDetector.detect(self.file_path)
         
-    def load(self) -> Optional[gpd.GeoDataFrame]:
-        """Carga el archivo según su formato"""
+        # Ruta que lee GDAL: el propio archivo o un miembro de un ZIP (/vsizip/)
+        self.read_path = self.file_path
+        self.archive_member = None
+        if self.format == 'ZIP':
+            inner = FormatDetector.inspect_archive(self.file_path)
+            if inner is not None:
+                self.format = inner['format']
+                self.archive_member = inner['member']
+                self.read_path = FormatDetector.vsizip_path(self.file_path, inner['member'])
+        
+        # Copia optimizada (COG) de rasters, preferida por RasterReader
+        self.optimized_path = optimized_path
+        
+        # Motor de lectura vectorial pedido (None: settings.VECTOR_READ_ENGINE),
+        # y el motor y tiempo (segundos) de la última carga
+        self.engine = engine
+        self.engine_used: Optional[str] = None
+        self.load_time: Optional[float] = None
+        
+    def load(
+        self,
+        columns: Optional[Sequence[str]] = None,
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+        mask: Optional[Any] = None,
+        rows: Optional[Union[int, slice]] = None,
+        max_features: Optional[int] = None,
+        geometry_only: bool = False
+    ) -> Optional[gpd.GeoDataFrame]:
+        """Carga el archivo según su formato
+        
+        Opciones de lectura parcial (formatos vectoriales y CSV), aplicadas en
+        el lector y no después de cargar todo el archivo:
+        - ``columns``: atributos a leer (la geometría siempre se incluye)
+        - ``geometry_only``: no leer atributos (equivale a ``columns=[]``)
+        - ``bbox`` / ``mask``: solo entidades que intersectan la caja o geometría,
+          en el CRS del archivo
+        - ``rows`` / ``max_features``: número de entidades o ``slice`` de entidades;
+          en capas vectoriales con ``bbox``/``mask`` se cuentan las que pasan el filtro
+        """
         if not self.format:
             raise ValueError(f"Formato no soportado: {self.file_path}")
         
+        read_options = {
+            'columns': [] if geometry_only else columns,
+            'bbox': bbox,
+            'mask': mask,
+            'rows': rows if rows is not None else max_features
+        }
+        
+        start = time.perf_counter()
+        gdf = self._load(read_options)
+        self.load_time = time.perf_counter() - start
+        logger.info(
+            f"Cargado {os.path.basename(self.file_path)} ({self.format}) con {self.engine_used} "
+            f"en {self.load_time:.3f}s"
+        )
+        return gdf
+    
+    def _load(self, read_options: Dict[str, Any]) -> Optional[gpd.GeoDataFrame]:
         if self.format == 'SHP':
-            return self._load_shp()
+            return self._load_shp(**read_options)
         elif self.format == 'GeoJSON':
-            return self._load_geojson()
+            return self._load_geojson(**read_options)
+        elif self.format == 'GeoPackage':
+            return self._load_gpkg(**read_options)
         elif self.format == 'CSV':
-            return self._load_csv()
-        elif self.format in ['GeoTIFF', 'DEM']:
+            return self._load_csv(**read_options)
+        elif self.format in FormatDetector.RASTER_FORMATS:
             return self._load_raster()
+        elif self.format == 'ZIP':
+            raise ValueError(
+                "El ZIP no contiene un Shapefile completo (.shp, .shx, .dbf), un GeoPackage ni un GeoJSON"
+            )
         else:
             raise ValueError(f"Formato {self.format} no implementado aún")
     
-    def _load_shp(self) -> gpd.GeoDataFrame:
+    def _load_shp(self, **read_options) -> gpd.GeoDataFrame:
         """Carga archivo Shapefile"""
-        return gpd.read_file(self.file_path)
+        return self._read_vector(**read_options)
     
-    def _load_geojson(self) -> gpd.GeoDataFrame:
+    def _load_geojson(self, **read_options) -> gpd.GeoDataFrame:
         """Carga archivo GeoJSON"""
-        return gpd.read_file(self.file_path)
+        return self._read_vector(**read_options)
+    
+    def _load_gpkg(self, **read_options) -> gpd.GeoDataFrame:
+        """Carga la primera capa de un GeoPackage"""
+        return self._read_vector(**read_options)
     
-    def _load_csv(self) -> Optional[gpd.GeoDataFrame]:
-        """Carga CSV con coordenadas y crea GeoDataFrame"""
-        df = pd.read_csv(self.file_path)
+    def _read_vector(self, **read_options) -> gpd.GeoDataFrame:
+        """Lee la capa con pyogrio (Arrow) o fiona y registra el motor usado"""
+        gdf, self.engine_used = read_vector(self.read_path, engine=self.engine, **read_options)
+        return gdf
+    
+    def _load_csv(
+        self,
+        columns: Optional[Sequence[str]] = None,
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+        mask: Optional[Any] = None,
+        rows: Optional[Union[int, slice]] = None
+    ) -> Optional[gpd.GeoDataFrame]:
+        """Carga CSV con coordenadas por bloques y crea GeoDataFrame"""
+        self.engine_used = 'pandas'
+        lon_col, lat_col = self._csv_coordinate_columns()
+        return read_csv_points(
+            self.file_path, lon_col, lat_col,
+            columns=columns, bbox=bbox, mask=mask, rows=rows
+        )
+    
+    def load_coordinates(
+        self,
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+        mask: Optional[Any] = None,
+        rows: Optional[Union[int, slice]] = None
+    ) -> CoordinateArrays:
+        """Carga solo las coordenadas (sin atributos), como arreglos contiguos float64
         
-        # Buscar columnas de coordenadas comunes
-        coord_cols = self._find_coordinate_columns(df)
+        Para CSV no se crean geometrías: las columnas de coordenadas se leen por
+        bloques directamente a un arreglo. Para el resto de formatos se lee solo
+        la geometría y se extraen sus vértices.
+        """
+        if self.format == 'CSV':
+            start = time.perf_counter()
+            self.engine_used = 'pandas'
+            lon_col, lat_col = self._csv_coordinate_columns()
+            coords = read_csv_coordinates(self.file_path, lon_col, lat_col, bbox=bbox, mask=mask, rows=rows)
+            self.load_time = time.perf_counter() - start
+            return coords
+        
+        gdf = self.load(bbox=bbox, mask=mask, rows=rows, geometry_only=True)
+        return extract_coordinates(gdf.geometry)
+    
+    def _csv_coordinate_columns(self) -> Tuple[str, str]:
+        """Ubica las columnas de coordenadas leyendo solo el encabezado"""
+        coord_cols = self._find_coordinate_columns(read_csv_header(self.file_path))
         if not coord_cols:
             raise ValueError("No se encontraron columnas de coordenadas en el CSV")
-        
-        lon_col, lat_col = coord_cols
-        geometry = gpd.points_from_xy(df[lon_col], df[lat_col])
-        gdf = gpd.GeoDataFrame(df, geometry=geometry)
-        
-        return gdf
+        return coord_cols
     
-    def _find_coordinate_columns(self, df: pd.DataFrame) -> Optional[tuple]:
-        """Encuentra columnas de coordenadas en el DataFrame"""
+    def _find_coordinate_columns(self, columns: Sequence[str]) -> Optional[tuple]:
+        """Encuentra columnas de coordenadas entre los nombres de columna"""
         possible_lon = ['lon', 'long', 'longitude', 'x', 'lng', 'longitud']
         possible_lat = ['lat', 'latitude', 'y', 'latitud']
         
         lon_col = None
         lat_col = None
         
-        for col in df.columns:
+        for col in columns:
             col_lower = col.lower()
             if col_lower in possible_lon and lon_col is None:
                 lon_col = col
@@ -103,17 +209,26 @@ class FileLoader:
             return (lon_col, lat_col)
         return None
     
+    def raster_reader(self) -> RasterReader:
+        """Lector del raster, sobre la copia optimizada si existe"""
+        return RasterReader(self.read_path, optimized_path=self.optimized_path)
+    
     def _load_raster(self) -> Optional[gpd.GeoDataFrame]:
         """Carga archivo raster (GeoTIFF/DEM) y convierte a vector"""
-        raster_reader = RasterReader(self.file_path)
+        raster_reader = self.raster_reader()
+        self.engine_used = 'rasterio'
         
-        # Intentar convertir a vector
+        # Intentar convertir a vector (por ventanas, cuantizando rasters continuos)
         try:
-            gdf = raster_reader.to_vector()
+            gdf = raster_reader.to_vector(
+                quantize_levels=settings.RASTER_QUANTIZE_LEVELS,
+                sieve_size=settings.RASTER_SIEVE_SIZE,
+                max_features=settings.RASTER_MAX_FEATURES
+            )
             if gdf is not None and len(gdf) > 0:
                 return gdf
-        except Exception:
-            pass
+        except Exception as e:
+            logger.warning(f"No se pudo vectorizar {os.path.basename(self.file_path)}: {e}")
         
         # Si no se puede convertir a vector, crear bounding box
         return raster_reader.get_bounds_gdf()
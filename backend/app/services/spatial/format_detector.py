@@ -1,5 +1,7 @@
 import os
-from typing import Optional
+import zipfile
+from pathlib import PurePosixPath
+from typing import Optional, Dict
 
 class FormatDetector:
     """Detecta el formato de archivos espaciales"""
@@ -14,14 +16,97 @@ class FormatDetector:
         '.tif': 'GeoTIFF',
         '.tiff': 'GeoTIFF',
         '.dem': 'DEM',
+        '.zip': 'ZIP',
     }
     
+    # Formatos que se leen directamente desde un ZIP (/vsizip/), en orden de preferencia
+    ARCHIVE_FORMATS = {
+        '.shp': 'SHP',
+        '.gpkg': 'GeoPackage',
+        '.geojson': 'GeoJSON',
+        '.json': 'GeoJSON',
+    }
+    
+    # Formatos raster (se analizan sin vectorizar)
+    RASTER_FORMATS = {'GeoTIFF', 'DEM'}
+    
+    # Archivos auxiliares obligatorios de un Shapefile
+    SHP_SIDECARS = ('.shx', '.dbf')
+    
     @classmethod
     def detect(cls, filename: str) -> Optional[str]:
         """Detecta el formato basado en la extensión del archivo"""
         ext = os.path.splitext(filename)[1].lower()
         return cls.FORMATS.get(ext)
     
+    # Formatos binarios reconocibles por sus primeros bytes
+    BINARY_FORMATS = {'SHP', 'GeoTIFF', 'ZIP'}
+    
+    @classmethod
+    def sniff(cls, header: bytes) -> Optional[str]:
+        """Detecta el formato a partir de los primeros bytes del contenido
+
+        Retorna None cuando el contenido parece texto sin estructura reconocible
+        (p. ej. CSV o rejillas ASCII).
+        """
+        if header[:4] == b'\x00\x00\x27\x0a':  # File code 9994 (big endian)
+            return 'SHP'
+        if header[:4] in (b'II*\x00', b'MM\x00*', b'II+\x00', b'MM\x00+'):  # TIFF / BigTIFF
+            return 'GeoTIFF'
+        if header[:4] == b'PK\x03\x04':
+            return 'ZIP'
+        text = header.lstrip(b'\xef\xbb\xbf').lstrip()
+        if text[:1] in (b'{', b'['):
+            return 'GeoJSON'
+        return None
+    
+    @classmethod
+    def content_matches(cls, filename: str, header: bytes) -> bool:
+        """Verifica que el contenido no contradiga el formato indicado por la extensión"""
+        expected = cls.detect(filename)
+        sniffed = cls.sniff(header)
+        if expected == 'DEM':
+            # Un DEM puede ser GeoTIFF o una rejilla ASCII
+            return sniffed in (None, 'GeoTIFF')
+        if expected in cls.BINARY_FORMATS:
+            return sniffed == expected
+        # Formatos de texto: el contenido no debe ser un binario conocido
+        return sniffed not in cls.BINARY_FORMATS
+    
+    @classmethod
+    def inspect_archive(cls, archive_path: str) -> Optional[Dict[str, str]]:
+        """Detecta el formato espacial contenido en un ZIP sin descomprimirlo
+
+        Retorna ``{'format': ..., 'member': ...}`` con el formato interno y la
+        ruta del miembro a leer, o None si el ZIP no contiene un Shapefile
+        completo (.shp, .shx, .dbf), un GeoPackage ni un GeoJSON.
+        """
+        try:
+            with zipfile.ZipFile(archive_path) as archive:
+                names = [
+                    info.filename for info in archive.infolist()
+                    if not info.is_dir() and not info.filename.startswith('__MACOSX/')
+                ]
+        except (zipfile.BadZipFile, OSError):
+            return None
+        
+        lowered = {name.lower() for name in names}
+        for ext, fmt in cls.ARCHIVE_FORMATS.items():
+            for name in sorted(names):
+                if PurePosixPath(name).suffix.lower() != ext:
+                    continue
+                if fmt == 'SHP':
+                    stem = name[:-len(ext)].lower()
+                    if not all(f"{stem}{sidecar}" in lowered for sidecar in cls.SHP_SIDECARS):
+                        continue
+                return {'format': fmt, 'member': name}
+        return None
+    
+    @staticmethod
+    def vsizip_path(archive_path: str, member: str) -> str:
+        """Ruta GDAL para leer un miembro del ZIP sin extraerlo"""
+        return f"/vsizip/{os.path.abspath(archive_path)}/{member}"
+    
     @classmethod
     def is_supported(cls, filename: str) -> bool:
         """Verifica si el formato está soportado"""
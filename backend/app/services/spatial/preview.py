@@ -0,0 +1,144 @@
+"""
+Vistas previas livianas: simplificación, cuantización de coordenadas y GeoJSON por bloques
+"""
+import json
+import math
+import numpy as np
+import shapely
+import geopandas as gpd
+from typing import Optional, Iterator, List
+from app.core.config import settings
+from app.services.spatial.crs_pool import get_crs
+
+# Metros por píxel en el zoom 0 de una teselación web de 256 px (en el ecuador)
+ZOOM0_METERS_PER_PIXEL = 156543.03392804097
+METERS_PER_DEGREE = 111320.0
+# Máximo de decimales emitidos (sub-milímetro en metros)
+MAX_PRECISION = 10
+
+
+class PreviewBuilder:
+    """Prepara una capa para visualizar en el mapa con un presupuesto de vértices
+
+    - La tolerancia de simplificación es el tamaño de píxel del ``zoom`` pedido,
+      una ``tolerance`` explícita (en unidades del CRS) o, por defecto, la
+      extensión de la capa repartida en ``settings.PREVIEW_PIXELS`` píxeles.
+    - La simplificación preserva la topología de cada geometría; si aún se
+      supera ``max_vertices``, la tolerancia se duplica hasta cumplirlo (o
+      hasta que ya no reduzca vértices).
+    - Las coordenadas se redondean a un decimal más fino que la tolerancia.
+    """
+
+    # Veces que se duplica la tolerancia para cumplir el presupuesto de vértices
+    MAX_TOLERANCE_STEPS = 8
+
+    def __init__(
+        self,
+        gdf: gpd.GeoDataFrame,
+        zoom: Optional[int] = None,
+        tolerance: Optional[float] = None,
+        max_vertices: Optional[int] = None
+    ):
+        self.gdf = gdf
+        self.max_vertices = max_vertices or settings.PREVIEW_MAX_VERTICES
+        self.tolerance = tolerance if tolerance is not None else self._default_tolerance(zoom)
+        self.geometries = None
+
+    def _unit_meters(self) -> Optional[float]:
+        """Metros por unidad del CRS (None si es geográfico o sin CRS con coordenadas en grados)"""
+        if self.gdf.crs is not None:
+            crs = get_crs(self.gdf.crs)
+            if crs.is_geographic:
+                return None
+            return crs.axis_info[0].unit_conversion_factor if crs.axis_info else 1.0
+        minx, miny, maxx, maxy = self.gdf.total_bounds
+        looks_geographic = -180 <= minx <= maxx <= 180 and -90 <= miny <= maxy <= 90
+        return None if looks_geographic else 1.0
+
+    def _default_tolerance(self, zoom: Optional[int]) -> float:
+        if zoom is not None:
+            meters = ZOOM0_METERS_PER_PIXEL / (2 ** zoom)
+            unit = self._unit_meters()
+            return meters / METERS_PER_DEGREE if unit is None else meters / unit
+
+        if len(self.gdf) == 0:
+            return 0.0
+        minx, miny, maxx, maxy = self.gdf.total_bounds
+        extent = max(maxx - minx, maxy - miny)
+        return float(extent / settings.PREVIEW_PIXELS) if np.isfinite(extent) else 0.0
+
+    @property
+    def precision(self) -> int:
+        """Decimales de las coordenadas emitidas"""
+        if self.tolerance <= 0:
+            return MAX_PRECISION
+        return int(min(MAX_PRECISION, max(0, math.ceil(-math.log10(self.tolerance)) + 1)))
+
+    def build(self) -> 'PreviewBuilder':
+        """Simplifica y redondea las geometrías (vectorizado)"""
+        geoms = np.asarray(self.gdf.geometry.values, dtype=object)
+
+        tolerance = self.tolerance
+        simplified = shapely.simplify(geoms, tolerance, preserve_topology=True) if tolerance > 0 else geoms
+        vertices = int(shapely.get_num_coordinates(simplified).sum())
+        for _ in range(self.MAX_TOLERANCE_STEPS):
+            if vertices <= self.max_vertices or tolerance <= 0:
+                break
+            # Se resimplifica el resultado anterior; se detiene si ya no reduce
+            # (p. ej. polígonos en su mínimo de vértices)
+            tolerance *= 2
+            candidate = shapely.simplify(simplified, tolerance, preserve_topology=True)
+            candidate_vertices = int(shapely.get_num_coordinates(candidate).sum())
+            if candidate_vertices >= vertices:
+                break
+            simplified, vertices = candidate, candidate_vertices
+        self.tolerance = tolerance
+
+        decimals = self.precision
+        self.geometries = shapely.transform(simplified, lambda coords: np.round(coords, decimals))
+        return self
+
+    @property
+    def num_vertices(self) -> int:
+        return int(shapely.get_num_coordinates(self.geometries).sum())
+
+    def iter_features(self, batch_size: Optional[int] = None) -> Iterator[str]:
+        """Features GeoJSON serializados, en bloques de texto separados por comas"""
+        if self.geometries is None:
+            self.build()
+        batch_size = batch_size or settings.PREVIEW_BATCH_SIZE
+        columns: List[str] = [c for c in self.gdf.columns if c != self.gdf.geometry.name]
+
+        for start in range(0, len(self.geometries), batch_size):
+            stop = start + batch_size
+            geometry_json = shapely.to_geojson(self.geometries[start:stop])
+            if columns:
+                records = self.gdf.iloc[start:stop][columns].to_dict('records')
+            else:
+                records = [{}] * len(geometry_json)
+
+            features = []
+            for geometry, properties in zip(geometry_json, records):
+                features.append(
+                    '{"type":"Feature","properties":'
+                    + _dumps_properties(properties)
+                    + ',"geometry":' + (geometry if geometry is not None else 'null') + '}'
+                )
+            yield (',' if start else '') + ','.join(features)
+
+    def iter_geojson(self, crs_aplicado: str, bounds: List[Optional[float]]) -> Iterator[str]:
+        """Respuesta completa de vista previa (mismo formato que AnalysisPreview) por bloques"""
+        yield '{"crs_aplicado":' + json.dumps(crs_aplicado) + ',"bounds":' + json.dumps(bounds)
+        yield ',"geojson":{"type":"FeatureCollection","features":['
+        for chunk in self.iter_features():
+            yield chunk
+        yield ']}}'
+
+
+def _dumps_properties(properties: dict) -> str:
+    """Atributos a JSON; NaN/inf se emiten como null y los tipos no serializables como texto"""
+    clean = {
+        key: None if isinstance(value, float) and not math.isfinite(value) else value
+        for key, value in properties.items()
+    }
+    return json.dumps(clean, default=str)
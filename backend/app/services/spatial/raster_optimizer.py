@@ -0,0 +1,100 @@
+"""
+Conversión de rasters cargados a Cloud Optimized GeoTIFF (teselado, comprimido y con overviews)
+"""
+import os
+import logging
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.shutil import copy as raster_copy
+from typing import Optional
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Sufijo de la copia optimizada junto al archivo original
+COG_SUFFIX = '.cog.tif'
+
+
+def optimized_path_for(path: str) -> str:
+    """Ruta de la copia optimizada de ``path`` (mismo directorio, conserva la extensión original)"""
+    return path + COG_SUFFIX
+
+
+def is_cloud_optimized(path: str) -> bool:
+    """Indica si el raster ya es teselado y tiene overviews internas en todas sus bandas"""
+    with rasterio.open(path) as src:
+        if src.driver != 'GTiff' or not src.profile.get('tiled', False):
+            return False
+        needs_overviews = max(src.width, src.height) > settings.RASTER_COG_BLOCKSIZE
+        return not needs_overviews or all(src.overviews(band) for band in src.indexes)
+
+
+def optimize_raster(path: str, output_path: Optional[str] = None) -> Optional[str]:
+    """Escribe una copia COG de ``path`` y retorna su ruta
+
+    Retorna None si el archivo ya está optimizado (se lee el original). Usa
+    el driver COG de GDAL cuando está disponible y, si no, un GeoTIFF teselado
+    con overviews construidas localmente y copiadas con COPY_SRC_OVERVIEWS.
+    """
+    if is_cloud_optimized(path):
+        return None
+
+    output_path = output_path or optimized_path_for(path)
+    tmp_path = output_path + '.tmp'
+    blocksize = settings.RASTER_COG_BLOCKSIZE
+    compress = settings.RASTER_COG_COMPRESSION
+
+    with rasterio.open(path) as src:
+        is_float = np.issubdtype(np.dtype(src.dtypes[0]), np.floating)
+        # Las overviews de un DEM o una imagen continua se promedian; las categóricas no
+        resampling = 'AVERAGE' if is_float else 'NEAREST'
+        predictor = 3 if is_float else 2
+
+    try:
+        with rasterio.Env() as env:
+            has_cog_driver = 'COG' in env.drivers()
+
+        if has_cog_driver:
+            raster_copy(
+                path, tmp_path, driver='COG',
+                blocksize=blocksize, compress=compress, predictor='YES',
+                overview_resampling=resampling, bigtiff='IF_SAFER'
+            )
+        else:
+            _write_tiled_with_overviews(path, tmp_path, blocksize, compress, predictor, resampling)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    logger.info(f"Raster optimizado: {os.path.basename(path)} -> {os.path.basename(output_path)}")
+    return output_path
+
+
+def _write_tiled_with_overviews(path: str, output_path: str, blocksize: int, compress: str, predictor: int, resampling: str) -> None:
+    """Alternativa sin driver COG: GeoTIFF teselado con overviews internas"""
+    staging_path = output_path + '.staging'
+    try:
+        raster_copy(
+            path, staging_path, driver='GTiff',
+            tiled=True, blockxsize=blocksize, blockysize=blocksize,
+            compress=compress, predictor=predictor, bigtiff='IF_SAFER'
+        )
+        with rasterio.open(staging_path, 'r+') as dst:
+            factors = []
+            factor = 2
+            while max(dst.width, dst.height) / factor >= blocksize / 2:
+                factors.append(factor)
+                factor *= 2
+            if factors:
+                dst.build_overviews(factors, Resampling[resampling.lower()])
+        raster_copy(
+            staging_path, output_path, driver='GTiff',
+            tiled=True, blockxsize=blocksize, blockysize=blocksize,
+            compress=compress, predictor=predictor, copy_src_overviews=True, bigtiff='IF_SAFER'
+        )
+    finally:
+        if os.path.exists(staging_path):
+            os.remove(staging_path)
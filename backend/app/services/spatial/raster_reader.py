@@ -1,19 +1,37 @@
 """
 Lector de archivos raster (GeoTIFF, DEM)
 """
+import os
 import rasterio
-from rasterio.features import shapes
+from rasterio.features import shapes, sieve
+from rasterio.windows import Window
 import geopandas as gpd
 import numpy as np
-from typing import Optional, Dict, Any
+import pandas as pd
+from shapely.geometry import shape
+from typing import Optional, Dict, Any, Iterator, Tuple
 from pathlib import Path
+from app.core.config import settings
+from app.services.spatial.crs_pool import get_crs
+
+# Metros por grado de latitud (aproximación esférica, suficiente para resolución)
+METERS_PER_DEGREE = 111320.0
+
+# Tipos de dato que aceptan rasterio.features.shapes y sieve
+_SHAPES_DTYPES = ('int16', 'int32', 'uint8', 'uint16', 'float32')
 
 
 class RasterReader:
     """Lee archivos raster y extrae información espacial"""
     
-    def __init__(self, file_path: str):
-        self.file_path = file_path
+    # Alto mínimo (filas) de las ventanas en rasters sin teselas (por franjas)
+    MIN_WINDOW_ROWS = 256
+    
+    def __init__(self, file_path: str, optimized_path: Optional[str] = None):
+        # Se lee la copia optimizada (COG) cuando existe; el original queda como respaldo
+        self.source_path = file_path
+        self.optimized = bool(optimized_path) and os.path.exists(optimized_path)
+        self.file_path = optimized_path if self.optimized else file_path
         
     def read_metadata(self) -> Dict[str, Any]:
         """Lee metadatos del archivo raster"""
@@ -31,38 +49,211 @@ class RasterReader:
                 'driver': src.driver
             }
     
-    def to_vector(self, band: int = 1, mask_nodata: bool = True) -> Optional[gpd.GeoDataFrame]:
-        """Convierte raster a vector (polígonos)"""
+    def pixel_size_meters(self, crs: Optional[str] = None) -> Tuple[float, float]:
+        """Tamaño de píxel (x, y) en metros según las unidades del CRS
+        
+        ``crs`` se usa cuando el archivo no declara uno; sin ninguno se asumen grados.
+        """
+        metadata = self.read_metadata()
+        res_x, res_y = metadata['resolution']
+        crs_value = metadata['crs'] or crs
+        crs_obj = get_crs(crs_value) if crs_value else None
+        
+        if crs_obj is None or crs_obj.is_geographic:
+            # Grados: la longitud se acorta con el coseno de la latitud central
+            bounds = metadata['bounds']
+            lat = (bounds[1] + bounds[3]) / 2
+            return (
+                res_x * METERS_PER_DEGREE * np.cos(np.radians(lat)),
+                res_y * METERS_PER_DEGREE
+            )
+        
+        factor = crs_obj.axis_info[0].unit_conversion_factor if crs_obj.axis_info else 1.0
+        return res_x * factor, res_y * factor
+    
+    def to_vector(
+        self,
+        band: int = 1,
+        mask_nodata: bool = True,
+        quantize: Optional[float] = None,
+        quantize_levels: Optional[int] = None,
+        sieve_size: int = 0,
+        max_features: Optional[int] = None
+    ) -> Optional[gpd.GeoDataFrame]:
+        """Convierte raster a vector (polígonos)
+        
+        Acumula los lotes de ``iter_vector_batches``; ver allí las opciones.
+        """
         try:
-            with rasterio.open(self.file_path) as src:
-                # Leer banda
-                data = src.read(band)
-                
-                # Crear máscara si hay nodata
-                if mask_nodata and src.nodata is not None:
-                    mask = data != src.nodata
-                else:
-                    mask = None
-                
-                # Extraer formas (shapes)
-                shapes_gen = shapes(data, mask=mask, transform=src.transform)
-                
-                # Convertir a GeoDataFrame
-                features = []
-                for geom, value in shapes_gen:
-                    features.append({
-                        'geometry': geom,
-                        'value': value
-                    })
-                
-                if not features:
-                    return None
-                
-                gdf = gpd.GeoDataFrame(features, crs=src.crs)
-                return gdf
+            batches = list(self.iter_vector_batches(
+                band=band,
+                mask_nodata=mask_nodata,
+                quantize=quantize,
+                quantize_levels=quantize_levels,
+                sieve_size=sieve_size,
+                max_features=max_features
+            ))
+            if not batches:
+                return None
+            
+            gdf = pd.concat(batches, ignore_index=True)
+            return gdf
         except Exception as e:
             raise ValueError(f"Error al convertir raster a vector: {str(e)}")
     
+    def iter_vector_batches(
+        self,
+        band: int = 1,
+        mask_nodata: bool = True,
+        quantize: Optional[float] = None,
+        quantize_levels: Optional[int] = None,
+        sieve_size: int = 0,
+        max_features: Optional[int] = None,
+        batch_size: Optional[int] = None
+    ) -> Iterator[gpd.GeoDataFrame]:
+        """Vectoriza el raster por ventanas de bloque y produce lotes de polígonos
+        
+        - Se recorre la teselación interna del archivo (o franjas de al menos
+          ``MIN_WINDOW_ROWS`` filas si no tiene teselas), así que la memoria
+          queda acotada por ventana; los polígonos que cruzan el borde de una
+          ventana se parten en ella.
+        - ``quantize`` agrupa valores en intervalos de ese tamaño (p. ej. 10 m
+          de altura) y ``quantize_levels`` en ese número de niveles entre el
+          mínimo y máximo de la banda (solo bandas float), para que un DEM
+          continuo no genere un polígono por píxel.
+        - ``sieve_size`` elimina regiones de menos píxeles (fusionándolas con
+          su vecina más grande); en bandas float requiere cuantizar.
+        - ``max_features`` limita el total de polígonos (None: settings.RASTER_MAX_FEATURES,
+          0: sin límite).
+        """
+        if max_features is None:
+            max_features = settings.RASTER_MAX_FEATURES
+        batch_size = batch_size or settings.RASTER_VECTOR_BATCH_SIZE
+        
+        with rasterio.open(self.file_path) as src:
+            is_float = np.issubdtype(np.dtype(src.dtypes[band - 1]), np.floating)
+            if quantize is None and quantize_levels and is_float:
+                quantize = self._quantize_step(src, band, quantize_levels)
+            
+            emitted = 0
+            geometries = []
+            values = []
+            for window in self.iter_windows(src, band):
+                data, mask = self._read_window(src, band, window, mask_nodata, quantize, sieve_size)
+                if mask is not None and not mask.any():
+                    continue
+                
+                for geom, value in shapes(data, mask=mask, transform=src.window_transform(window)):
+                    geometries.append(shape(geom))
+                    values.append(value)
+                    emitted += 1
+                    
+                    if len(geometries) >= batch_size:
+                        yield self._batch(geometries, values, src.crs)
+                        geometries, values = [], []
+                    if max_features and emitted >= max_features:
+                        break
+                
+                if max_features and emitted >= max_features:
+                    break
+            
+            if geometries:
+                yield self._batch(geometries, values, src.crs)
+    
+    def iter_windows(self, src, band: int) -> Iterator[Window]:
+        """Ventanas de lectura alineadas con los bloques internos del archivo"""
+        block_height, block_width = src.block_shapes[band - 1]
+        if block_width >= src.width and block_height < self.MIN_WINDOW_ROWS:
+            # Raster por franjas: agrupar franjas consecutivas en ventanas más altas
+            rows = max(block_height, (self.MIN_WINDOW_ROWS // block_height) * block_height)
+            for row_off in range(0, src.height, rows):
+                yield Window(0, row_off, src.width, min(rows, src.height - row_off))
+        else:
+            for _, window in src.block_windows(band):
+                yield window
+    
+    @staticmethod
+    def _read_window(src, band: int, window: Window, mask_nodata: bool, quantize: Optional[float], sieve_size: int):
+        """Lee una ventana y la prepara para vectorizar (máscara, cuantización, sieve)"""
+        data = src.read(band, window=window)
+        
+        mask = None
+        if mask_nodata:
+            # read_masks contempla nodata (incluido NaN) y máscaras internas
+            mask = src.read_masks(band, window=window) != 0
+            if np.issubdtype(data.dtype, np.floating):
+                mask &= np.isfinite(data)
+        
+        # Cuantizar a índices de clase enteros (sieve solo acepta enteros)
+        step = None
+        if quantize:
+            step = quantize
+            if np.issubdtype(data.dtype, np.floating):
+                # NaN/inf no tienen clase: sin máscara llegarían a int32 como INT32_MIN
+                finite = np.isfinite(data)
+                if mask is None and not finite.all():
+                    mask = finite
+            data = np.floor(np.where(mask, data, 0) / step if mask is not None else data / step).astype(np.int32)
+        elif data.dtype.name not in _SHAPES_DTYPES:
+            data = data.astype(np.float32 if np.issubdtype(data.dtype, np.floating) else np.int32)
+        
+        if sieve_size and sieve_size > 1 and np.issubdtype(data.dtype, np.integer):
+            data = sieve(data, size=sieve_size, mask=mask)
+        
+        if step is not None:
+            data = (data * step).astype(np.float32)
+        
+        return data, mask
+    
+    def _quantize_step(self, src, band: int, levels: int) -> Optional[float]:
+        """Tamaño de intervalo para ``levels`` niveles, con el rango de una lectura reducida"""
+        valid = self.valid_values(self._read_decimated(src, band))
+        if len(valid) == 0:
+            return None
+        value_range = float(valid.max() - valid.min())
+        return value_range / levels if value_range > 0 else None
+    
+    def read_band_sample(self, band: int = 1, max_size: Optional[int] = None) -> np.ma.MaskedArray:
+        """Lectura reducida de la banda (lado mayor <= ``max_size`` píxeles)
+        
+        GDAL resuelve las lecturas reducidas desde las overviews internas cuando
+        existen, así que el costo no depende del tamaño del raster.
+        """
+        with rasterio.open(self.file_path) as src:
+            return self._read_decimated(src, band, max_size)
+    
+    @staticmethod
+    def _read_decimated(src, band: int, max_size: Optional[int] = None) -> np.ma.MaskedArray:
+        out_shape = RasterReader.decimated_shape(src, band, max_size)
+        return src.read(band, out_shape=out_shape, masked=True)
+    
+    @staticmethod
+    def decimated_shape(src, band: int, max_size: Optional[int] = None) -> Tuple[int, int]:
+        """Forma (filas, columnas) de la lectura reducida
+        
+        Si el archivo tiene overviews se ajusta al nivel más cercano que cumpla
+        ``max_size``, para leer sus píxeles tal cual en vez de remuestrear.
+        """
+        max_size = max_size or settings.RASTER_SAMPLE_SIZE
+        factor = max(1.0, max(src.width, src.height) / max_size)
+        if factor > 1:
+            levels = [level for level in src.overviews(band) if level >= factor]
+            if levels:
+                factor = float(min(levels))
+        return (max(1, int(src.height / factor)), max(1, int(src.width / factor)))
+    
+    @staticmethod
+    def valid_values(sample: np.ma.MaskedArray) -> np.ndarray:
+        """Valores válidos (no nodata y finitos) de una lectura enmascarada"""
+        valid = sample.compressed()
+        if np.issubdtype(valid.dtype, np.floating):
+            valid = valid[np.isfinite(valid)]
+        return valid
+    
+    @staticmethod
+    def _batch(geometries: list, values: list, crs) -> gpd.GeoDataFrame:
+        return gpd.GeoDataFrame({'value': values}, geometry=geometries, crs=crs)
+    
     def get_bounds_gdf(self) -> gpd.GeoDataFrame:
         """Crea un GeoDataFrame con el bounding box del raster"""
         metadata = self.read_metadata()
@@ -74,13 +265,18 @@ class RasterReader:
         gdf = gpd.GeoDataFrame([{'geometry': bbox}], crs=metadata['crs'])
         return gdf
     
-    def estimate_scale_from_resolution(self) -> Optional[float]:
-        """Estima escala basándose en la resolución espacial"""
-        metadata = self.read_metadata()
-        resolution = metadata['resolution']
+    def estimate_scale_from_resolution(self, avg_resolution: Optional[float] = None) -> Optional[float]:
+        """Estima escala basándose en la resolución espacial
         
-        # Resolución promedio en metros
-        avg_resolution = (resolution[0] + resolution[1]) / 2
+        ``avg_resolution`` es el tamaño de píxel en metros; por defecto se usa
+        la resolución del archivo en las unidades de su CRS.
+        """
+        if avg_resolution is None:
+            metadata = self.read_metadata()
+            resolution = metadata['resolution']
+            
+            # Resolución promedio en metros
+            avg_resolution = (resolution[0] + resolution[1]) / 2
         
         # Mapear resolución a escala
         # Resolución pequeña (<0.5m) -> escala grande (1:500-1:1000)
@@ -3,19 +3,23 @@ Servicio de lectura de archivos espaciales
 """
 import os
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List
 import geopandas as gpd
-import pandas as pd
 # from osgeo import gdal, ogr  # No se usa actualmente, comentado para evitar dependencias
 import json
+from app.services.spatial.vector_reader import read_vector
+from app.services.spatial.csv_reader import read_csv_header, read_csv_points
 
 
 class SpatialFileReader:
     """Lee archivos espaciales en múltiples formatos"""
 
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, engine: Optional[str] = None):
         self.file_path = Path(file_path)
         self.format = self._detect_format()
+        # Motor de lectura vectorial (None: settings.VECTOR_READ_ENGINE) y el usado en la última lectura
+        self.engine = engine
+        self.engine_used: Optional[str] = None
 
     def _detect_format(self) -> str:
         """Detecta el formato del archivo"""
@@ -32,36 +36,30 @@ class SpatialFileReader:
 
     def read(self) -> gpd.GeoDataFrame:
         """Lee el archivo y retorna un GeoDataFrame"""
-        if self.format == "shapefile":
-            return gpd.read_file(self.file_path)
-        elif self.format == "geojson":
-            return gpd.read_file(self.file_path)
+        if self.format in ("shapefile", "geojson"):
+            gdf, self.engine_used = read_vector(str(self.file_path), engine=self.engine)
+            return gdf
         elif self.format == "csv":
             return self._read_csv()
         else:
             raise ValueError(f"Formato no implementado: {self.format}")
 
     def _read_csv(self) -> gpd.GeoDataFrame:
-        """Lee CSV y convierte a GeoDataFrame"""
-        df = pd.read_csv(self.file_path)
+        """Lee CSV por bloques y convierte a GeoDataFrame"""
+        self.engine_used = "pandas"
         
-        # Buscar columnas de coordenadas comunes
-        coord_cols = self._find_coordinate_columns(df)
+        # Buscar columnas de coordenadas comunes (solo en el encabezado)
+        coord_cols = self._find_coordinate_columns(read_csv_header(str(self.file_path)))
         
         if not coord_cols:
             raise ValueError("No se encontraron columnas de coordenadas en el CSV")
         
-        # Crear geometría
-        geometry = gpd.points_from_xy(
-            df[coord_cols["lon"]], 
-            df[coord_cols["lat"]]
-        )
-        
-        return gpd.GeoDataFrame(df, geometry=geometry)
+        # Crear geometría bloque a bloque
+        return read_csv_points(str(self.file_path), coord_cols["lon"], coord_cols["lat"])
 
-    def _find_coordinate_columns(self, df: pd.DataFrame) -> Optional[Dict[str, str]]:
-        """Encuentra columnas de coordenadas en el DataFrame"""
-        cols_lower = {col.lower(): col for col in df.columns}
+    def _find_coordinate_columns(self, columns: List[str]) -> Optional[Dict[str, str]]:
+        """Encuentra columnas de coordenadas entre los nombres de columna"""
+        cols_lower = {col.lower(): col for col in columns}
         
         # Buscar patrones comunes
         patterns = {
@@ -84,6 +82,7 @@ class SpatialFileReader:
         
         metadata = {
             "format": self.format,
+            "engine": self.engine_used,
             "crs": str(gdf.crs) if gdf.crs else None,
             "bounds": {
                 "minx": float(gdf.total_bounds[0]),
@@ -0,0 +1,116 @@
+"""
+Muestreo espacial estratificado e intervalos de confianza para métricas muestrales
+"""
+import numpy as np
+import shapely
+from typing import Any, Callable, Dict, Optional
+
+# Réplicas bootstrap y nivel de confianza por defecto de los intervalos
+BOOTSTRAP_REPLICAS = 200
+CONFIDENCE_LEVEL = 0.95
+
+
+def stratified_sample(geometries: Any, sample_size: int, bounds: np.ndarray, seed: int = 0) -> np.ndarray:
+    """Posiciones de una muestra reproducible estratificada en rejilla sobre ``bounds``
+
+    La extensión se divide en una rejilla de ~``sample_size`` celdas y cada
+    celda aporta entidades en proporción a las que contiene (asignación
+    proporcional), de modo que todas tienen la misma probabilidad de inclusión.
+    Cada entidad se ubica por el centro de su bounding box. Las posiciones se
+    retornan ordenadas, conservando el orden del archivo.
+    """
+    geoms = np.asarray(getattr(geometries, 'values', geometries), dtype=object)
+    rng = np.random.default_rng(seed)
+
+    geom_bounds = shapely.bounds(geoms)
+    centers_x = (geom_bounds[:, 0] + geom_bounds[:, 2]) / 2
+    centers_y = (geom_bounds[:, 1] + geom_bounds[:, 3]) / 2
+    candidates = np.flatnonzero(np.isfinite(centers_x) & np.isfinite(centers_y))
+
+    if len(candidates) <= sample_size:
+        return candidates
+
+    # Celda de la rejilla de cada entidad
+    side = max(1, int(np.ceil(np.sqrt(sample_size))))
+    minx, miny, maxx, maxy = bounds
+    width = (maxx - minx) or 1.0
+    height = (maxy - miny) or 1.0
+    col = np.clip(((centers_x[candidates] - minx) / width * side).astype(np.int64), 0, side - 1)
+    row = np.clip(((centers_y[candidates] - miny) / height * side).astype(np.int64), 0, side - 1)
+    cell = row * side + col
+
+    # Asignación proporcional con el método del mayor residuo (suma exactamente sample_size)
+    counts = np.bincount(cell, minlength=side * side)
+    quotas = counts * (sample_size / len(candidates))
+    allocation = np.floor(quotas).astype(np.int64)
+    remaining = sample_size - int(allocation.sum())
+    if remaining > 0:
+        allocation[np.argsort(-(quotas - allocation), kind='stable')[:remaining]] += 1
+
+    # Orden aleatorio dentro de cada celda y se toman las primeras ``allocation[celda]``
+    order = np.lexsort((rng.random(len(candidates)), cell))
+    sorted_cells = cell[order]
+    cell_starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    rank = np.arange(len(order)) - cell_starts[sorted_cells]
+    chosen = order[rank < allocation[sorted_cells]]
+
+    return np.sort(candidates[chosen])
+
+
+class SampleStatistics:
+    """Intervalos de confianza bootstrap sobre entidades muestreadas
+
+    Las métricas se expresan como funciones de sumas por entidad (p. ej.
+    número de vértices, suma de X, longitud de segmentos). Cada réplica
+    bootstrap remuestrea entidades con reemplazo mediante pesos multinomiales,
+    por lo que todas las réplicas se evalúan de forma vectorizada. Las
+    réplicas son reproducibles para una misma semilla.
+    """
+
+    def __init__(
+        self,
+        num_features: int,
+        seed: int = 0,
+        replicas: int = BOOTSTRAP_REPLICAS,
+        confidence: float = CONFIDENCE_LEVEL
+    ):
+        self.num_features = num_features
+        self.confidence = confidence
+        rng = np.random.default_rng(seed)
+        if num_features > 0:
+            self.weights = rng.multinomial(
+                num_features, np.full(num_features, 1.0 / num_features), size=replicas
+            ).astype(np.float64)
+        else:
+            self.weights = np.zeros((replicas, 0))
+
+    def _interval(self, estimate: float, replicas: np.ndarray) -> Dict[str, Optional[float]]:
+        replicas = replicas[np.isfinite(replicas)]
+        if not np.isfinite(estimate) or len(replicas) == 0:
+            return {'valor': None, 'ic_inferior': None, 'ic_superior': None, 'confianza': self.confidence}
+        alpha = (1.0 - self.confidence) / 2
+        low, high = np.quantile(replicas, [alpha, 1.0 - alpha])
+        return {
+            'valor': float(estimate),
+            'ic_inferior': float(low),
+            'ic_superior': float(high),
+            'confianza': self.confidence
+        }
+
+    def from_sums(self, per_feature: np.ndarray, statistic: Callable[[np.ndarray], np.ndarray]) -> Dict[str, Optional[float]]:
+        """Intervalo de una métrica calculada a partir de sumas por entidad
+
+        ``per_feature`` es un arreglo (entidades, k) y ``statistic`` recibe las
+        sumas totales con forma (..., k) y retorna la métrica con forma (...).
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            estimate = float(statistic(per_feature.sum(axis=0)))
+            replicas = statistic(self.weights @ per_feature)
+        return self._interval(estimate, replicas)
+
+    def from_minimum(self, per_feature_min: np.ndarray) -> Dict[str, Optional[float]]:
+        """Intervalo del mínimo (el mínimo muestral es una cota superior del mínimo real)"""
+        if len(per_feature_min) == 0:
+            return self._interval(float('nan'), np.empty(0))
+        masked = np.where(self.weights > 0, per_feature_min, np.inf)
+        return self._interval(float(per_feature_min.min()), masked.min(axis=1))
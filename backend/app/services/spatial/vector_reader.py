@@ -0,0 +1,74 @@
+"""
+Lectura de capas vectoriales con pyogrio (interfaz Arrow) y respaldo en fiona
+"""
+import logging
+import geopandas as gpd
+from typing import Optional, Tuple, Sequence, Union, Any
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Motores de lectura soportados, en orden de preferencia
+VECTOR_ENGINES = ('pyogrio', 'fiona')
+
+
+def read_vector(
+    path: str,
+    engine: Optional[str] = None,
+    columns: Optional[Sequence[str]] = None,
+    bbox: Optional[Tuple[float, float, float, float]] = None,
+    mask: Optional[Any] = None,
+    rows: Optional[Union[int, slice]] = None
+) -> Tuple[gpd.GeoDataFrame, str]:
+    """Lee una capa vectorial y retorna el GeoDataFrame y el motor que la leyó
+
+    Con ``pyogrio`` la lectura es vectorizada (``use_arrow=True``); si pyogrio
+    o pyarrow no están instalados, o la lectura falla, se reintenta con fiona.
+
+    Las opciones se aplican en el lector OGR: ``columns`` (atributos a leer,
+    ``[]`` para solo geometría), ``bbox`` (tupla) o ``mask`` (geometría
+    shapely), ambos en el CRS de la capa, y ``rows`` (número de entidades o
+    ``slice``). Con ``mask``, ``rows`` cuenta solo las entidades que la
+    intersecan, con ambos motores.
+    """
+    engine = engine or settings.VECTOR_READ_ENGINE
+    if engine not in VECTOR_ENGINES:
+        raise ValueError(f"Motor de lectura no soportado: {engine}")
+
+    if engine == 'pyogrio':
+        try:
+            return _read_pyogrio(path, columns, bbox, mask, rows), 'pyogrio'
+        except Exception as e:
+            logger.warning(f"Lectura con pyogrio falló para {path} ({e}); se usa fiona")
+
+    return _read_fiona(path, columns, bbox, mask, rows), 'fiona'
+
+
+def _read_fiona(path, columns, bbox, mask, rows) -> gpd.GeoDataFrame:
+    from fiona.errors import DriverError
+
+    kwargs = {'bbox': bbox, 'mask': mask, 'rows': rows}
+    if columns is None:
+        return gpd.read_file(path, engine='fiona', **kwargs)
+    try:
+        return gpd.read_file(path, engine='fiona', include_fields=list(columns), **kwargs)
+    except DriverError:
+        # Algunos drivers (p. ej. GeoJSON) no permiten omitir campos: se leen todos y se seleccionan después
+        gdf = gpd.read_file(path, engine='fiona', **kwargs)
+        return gdf[[*columns, gdf.geometry.name]]
+
+
+def _read_pyogrio(path, columns, bbox, mask, rows) -> gpd.GeoDataFrame:
+    kwargs = {}
+    if columns is not None:
+        kwargs['columns'] = list(columns)
+    if mask is None:
+        return gpd.read_file(path, engine='pyogrio', use_arrow=True, bbox=bbox, rows=rows, **kwargs)
+
+    # geopandas no pasa ``mask`` a pyogrio: se filtra en OGR por su bbox y luego por intersección.
+    # ``rows`` se aplica después del filtro, como en fiona
+    gdf = gpd.read_file(path, engine='pyogrio', use_arrow=True, bbox=bbox or tuple(mask.bounds), **kwargs)
+    gdf = gdf[gdf.intersects(mask)]
+    if rows is not None:
+        gdf = gdf.iloc[rows] if isinstance(rows, slice) else gdf.iloc[:rows]
+    return gdf
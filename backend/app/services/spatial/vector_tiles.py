@@ -0,0 +1,334 @@
+"""
+Teselas vectoriales (Mapbox Vector Tile, MVT v2) generadas localmente
+
+Las geometrías de una capa se reproyectan una vez a Web Mercator y se indexan
+con un STRtree; cada tesela consulta el índice, recorta, cuantiza a la rejilla
+de la tesela y se codifica en protobuf sin dependencias adicionales. Los
+comandos de geometría se calculan sobre los arreglos de coordenadas de todas
+las entidades a la vez; solo el empaquetado final recorre las entidades.
+"""
+import numpy as np
+import shapely
+import geopandas as gpd
+from shapely.geometry import box
+from typing import Callable, Hashable, List, Tuple
+from app.core.config import settings
+from app.core.lru_cache import LRUCache
+from app.services.spatial.crs_pool import to_crs
+
+# Semiperímetro de la proyección Web Mercator (EPSG:3857) en metros
+WEB_MERCATOR_HALF = 20037508.342789244
+WEB_MERCATOR_CRS = "EPSG:3857"
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+
+# Tipo de geometría MVT por dimensión de shapely (punto, línea, polígono)
+_MVT_TYPES = {0: 1, 1: 2, 2: 3}
+# Comandos de geometría MVT
+_MOVE_TO, _LINE_TO, _CLOSE_PATH = 1, 2, 7
+# Tipos de shapely que contienen otras geometrías (Multi* y GeometryCollection)
+_COLLECTION_TYPE_IDS = (4, 5, 6, 7)
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """Extensión (minx, miny, maxx, maxy) en EPSG:3857 de la tesela z/x/y (esquema XYZ)"""
+    span = 2 * WEB_MERCATOR_HALF / (2 ** z)
+    minx = -WEB_MERCATOR_HALF + x * span
+    maxy = WEB_MERCATOR_HALF - y * span
+    return minx, maxy - span, minx + span, maxy
+
+
+def is_valid_tile(z: int, x: int, y: int) -> bool:
+    return 0 <= z <= settings.TILE_MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+class TileLayer:
+    """Capa en Web Mercator con índice espacial, lista para generar teselas"""
+
+    def __init__(self, gdf: gpd.GeoDataFrame, name: str = 'datos'):
+        if gdf.crs is None:
+            raise ValueError("La capa no tiene CRS; no se puede teselar")
+        self.name = name
+        self.extent = settings.TILE_EXTENT
+        self.buffer = settings.TILE_BUFFER
+
+        geoms = np.asarray(to_crs(gdf, WEB_MERCATOR_CRS).geometry.values, dtype=object)
+        # Descartar geometrías vacías o fuera del dominio de Web Mercator (p. ej. polos)
+        bounds = shapely.bounds(geoms)
+        keep = ~shapely.is_missing(geoms) & ~shapely.is_empty(geoms) & np.isfinite(bounds).all(axis=1)
+        self.ids = np.flatnonzero(keep)
+        self.geometries = geoms[keep]
+        self.dimensions = shapely.get_dimensions(self.geometries)
+        self.tree = shapely.STRtree(self.geometries)
+
+    def render(self, z: int, x: int, y: int) -> bytes:
+        """Tesela MVT codificada (vacía si ninguna geometría la intersecta)"""
+        minx, miny, maxx, maxy = tile_bounds(z, x, y)
+        span = maxx - minx
+        pad = span * self.buffer / self.extent
+        positions = self.tree.query(box(minx - pad, miny - pad, maxx + pad, maxy + pad))
+        if len(positions) == 0:
+            return b''
+        positions = np.sort(positions)
+
+        scale = self.extent / span
+
+        def to_tile(coords: np.ndarray) -> np.ndarray:
+            # Eje Y de la tesela hacia abajo
+            return np.round(np.column_stack((
+                (coords[:, 0] - minx) * scale,
+                (maxy - coords[:, 1]) * scale
+            )))
+
+        geoms = self.geometries[positions]
+        dims = self.dimensions[positions]
+        geom_bounds = shapely.bounds(geoms)
+        pixel = span / self.extent
+        tiny = (
+            (geom_bounds[:, 2] - geom_bounds[:, 0] < pixel)
+            & (geom_bounds[:, 3] - geom_bounds[:, 1] < pixel)
+        )
+
+        # Las líneas diminutas no se dibujan; el resto se recorta con el margen
+        tile_geoms = shapely.transform(
+            shapely.clip_by_rect(geoms[~tiny], minx - pad, miny - pad, maxx + pad, maxy + pad),
+            to_tile
+        )
+        ids = self.ids[positions[~tiny]]
+        tile_dims = dims[~tiny]
+
+        # Puntos y polígonos de menos de un píxel: un punto o cuadro por píxel ocupado
+        pixel_sized = tiny & (dims != 1)
+        if pixel_sized.any():
+            pixel_geoms, pixel_ids, pixel_dims = self._pixel_geometries(
+                geoms[pixel_sized], self.ids[positions[pixel_sized]], dims[pixel_sized], to_tile
+            )
+            tile_geoms = np.concatenate((tile_geoms, pixel_geoms))
+            ids = np.concatenate((ids, pixel_ids))
+            tile_dims = np.concatenate((tile_dims, pixel_dims))
+
+        features = []
+        for dimension in (0, 1, 2):
+            selected = tile_dims == dimension
+            if selected.any():
+                features.extend(_encode_features(tile_geoms[selected], ids[selected] + 1, dimension))
+        if not features:
+            return b''
+        return _encode_tile(self.name, self.extent, features)
+
+    def _pixel_geometries(self, geoms: np.ndarray, ids: np.ndarray, dims: np.ndarray, to_tile):
+        """Geometrías en coordenadas de tesela para entidades menores a un píxel, una por píxel"""
+        pixels = to_tile(shapely.get_coordinates(shapely.centroid(geoms)))
+        inside = np.flatnonzero(
+            (pixels >= -self.buffer).all(axis=1) & (pixels <= self.extent + self.buffer).all(axis=1)
+        )
+        _, first = np.unique(np.column_stack((dims[inside], pixels[inside])), axis=0, return_index=True)
+        chosen = inside[np.sort(first)]
+        px, py = pixels[chosen, 0], pixels[chosen, 1]
+        pixel_geoms = np.where(dims[chosen] == 0, shapely.points(px, py), shapely.box(px, py, px + 1, py + 1))
+        return pixel_geoms, ids[chosen], dims[chosen]
+
+
+def _simple_parts(geoms: np.ndarray, dimension: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Partes simples de la dimensión dada y la posición de su geometría, en orden de geometría
+
+    El recorte puede generar colecciones mixtas; solo se conservan las partes
+    de la dimensión original de la entidad.
+    """
+    parts, index = shapely.get_parts(geoms, return_index=True)
+    collection = np.isin(shapely.get_type_id(parts), _COLLECTION_TYPE_IDS)
+    while collection.any():
+        sub_parts, sub_index = shapely.get_parts(parts[collection], return_index=True)
+        parts = np.concatenate((parts[~collection], sub_parts))
+        index = np.concatenate((index[~collection], index[collection][sub_index]))
+        collection = np.isin(shapely.get_type_id(parts), _COLLECTION_TYPE_IDS)
+    keep = ~shapely.is_empty(parts) & (shapely.get_dimensions(parts) == dimension)
+    order = np.argsort(index[keep], kind='stable')
+    return parts[keep][order], index[keep][order]
+
+
+def _encode_features(geoms: np.ndarray, feature_ids: np.ndarray, dimension: int) -> List[Tuple[int, int, bytes]]:
+    """(id, tipo MVT, comandos codificados) de geometrías ya cuantizadas en coordenadas de tesela
+
+    Cada trayectoria (anillo, línea o conjunto de puntos de una entidad) se
+    deduplica, se orienta (exterior con área positiva en coordenadas de tesela,
+    interiores negativa) y se descarta si degeneró al cuantizar.
+    """
+    parts, part_feature = _simple_parts(geoms, dimension)
+    if len(parts) == 0:
+        return []
+
+    if dimension == 2:
+        paths, path_part = shapely.get_rings(parts, return_index=True)
+        path_feature = part_feature[path_part]
+        exterior = np.ones(len(paths), dtype=bool)
+        exterior[1:] = path_part[1:] != path_part[:-1]
+        coords, point_path = shapely.get_coordinates(paths, return_index=True)
+    elif dimension == 1:
+        path_feature = part_feature
+        coords, point_path = shapely.get_coordinates(parts, return_index=True)
+    else:
+        path_feature = np.unique(part_feature)
+        coords, point_part = shapely.get_coordinates(parts, return_index=True)
+        point_path = np.searchsorted(path_feature, part_feature[point_part])
+
+    xy = coords.astype(np.int64)
+    num_paths = len(path_feature)
+
+    # Vértices consecutivos repetidos tras cuantizar
+    keep = np.ones(len(xy), dtype=bool)
+    keep[1:] = (point_path[1:] != point_path[:-1]) | np.any(xy[1:] != xy[:-1], axis=1)
+    xy, point_path = xy[keep], point_path[keep]
+    counts = np.bincount(point_path, minlength=num_paths)
+
+    if dimension == 2:
+        # Los anillos se codifican sin el vértice de cierre
+        starts = np.cumsum(counts) - counts
+        last = starts + counts - 1
+        closed = np.zeros(num_paths, dtype=bool)
+        several = counts >= 2
+        closed[several] = np.all(xy[last[several]] == xy[starts[several]], axis=1)
+        drop = np.zeros(len(xy), dtype=bool)
+        drop[last[closed]] = True
+        xy, point_path = xy[~drop], point_path[~drop]
+        counts = np.bincount(point_path, minlength=num_paths)
+        starts = np.cumsum(counts) - counts
+        ends = starts + counts
+
+        # Área con signo (fórmula del agrimensor) por anillo
+        following = np.arange(1, len(xy) + 1)
+        wraps = following == ends[point_path]
+        following[wraps] = starts[point_path[wraps]]
+        cross = xy[:, 0] * xy[following, 1] - xy[following, 0] * xy[:, 1]
+        area = np.bincount(point_path, weights=cross.astype(np.float64), minlength=num_paths)
+
+        valid = (counts >= 3) & (area != 0)
+        # Un hueco solo se conserva si el exterior de su polígono es válido
+        polygon = np.cumsum(exterior) - 1
+        polygon_valid = np.zeros(len(exterior), dtype=bool)
+        polygon_valid[polygon[exterior & valid]] = True
+        valid &= polygon_valid[polygon]
+
+        reverse = valid & ((area > 0) != exterior)
+        if reverse.any():
+            position = np.arange(len(xy))
+            flip = reverse[point_path]
+            position[flip] = (starts + ends - 1)[point_path[flip]] - position[flip]
+            xy = xy[position]
+    elif dimension == 1:
+        valid = counts >= 2
+    else:
+        valid = counts >= 1
+
+    kept = valid[point_path]
+    xy = xy[kept]
+    point_path = (np.cumsum(valid) - 1)[point_path[kept]]
+    path_feature = path_feature[valid]
+    counts = counts[valid]
+    if len(counts) == 0:
+        return []
+
+    # Desplazamientos en zigzag; el cursor vuelve a (0, 0) en cada entidad
+    point_feature = path_feature[point_path]
+    previous = np.zeros_like(xy)
+    previous[1:] = xy[:-1]
+    previous[np.r_[True, point_feature[1:] != point_feature[:-1]]] = 0
+    delta = xy - previous
+    params = ((delta << 1) ^ (delta >> 63)).astype(np.uint64)
+
+    # Flujo de comandos: MoveTo(n) para puntos; MoveTo(1), LineTo(n-1) [y ClosePath] para el resto
+    if dimension == 0:
+        lengths = 1 + 2 * counts
+    else:
+        lengths = 2 + 2 * counts + (1 if dimension == 2 else 0)
+    path_start = np.cumsum(lengths) - lengths
+    stream = np.empty(int(lengths.sum()), dtype=np.uint64)
+
+    rank = np.arange(len(xy)) - (np.cumsum(counts) - counts)[point_path]
+    if dimension == 0:
+        stream[path_start] = (counts << 3) | _MOVE_TO
+        slot = path_start[point_path] + 1 + 2 * rank
+    else:
+        stream[path_start] = (1 << 3) | _MOVE_TO
+        stream[path_start + 3] = ((counts - 1) << 3) | _LINE_TO
+        slot = path_start[point_path] + np.where(rank == 0, 1, 2 * rank + 2)
+        if dimension == 2:
+            stream[path_start + lengths - 1] = (1 << 3) | _CLOSE_PATH
+    stream[slot] = params[:, 0]
+    stream[slot + 1] = params[:, 1]
+
+    # Porción del flujo codificado que corresponde a cada entidad
+    encoded, offsets = _varints(stream)
+    first_path = np.flatnonzero(np.r_[True, path_feature[1:] != path_feature[:-1]])
+    byte_start = offsets[path_start[first_path]]
+    byte_end = offsets[np.r_[path_start[first_path[1:]], len(stream)]]
+
+    geometry_type = _MVT_TYPES[dimension]
+    return [
+        (int(feature_ids[feature]), geometry_type, encoded[start:end])
+        for feature, start, end in zip(path_feature[first_path], byte_start, byte_end)
+    ]
+
+
+# Codificación protobuf mínima (varint y campos delimitados por longitud)
+
+def _varints(values: np.ndarray) -> Tuple[bytes, np.ndarray]:
+    """Varints concatenados de un arreglo de enteros sin signo y el offset en bytes de cada valor"""
+    sizes = np.ones(len(values), dtype=np.int64)
+    rest = values >> np.uint64(7)
+    while rest.any():
+        sizes += rest > 0
+        rest >>= np.uint64(7)
+    offsets = np.concatenate(([0], np.cumsum(sizes)))
+    out = np.empty(int(offsets[-1]), dtype=np.uint8)
+    for k in range(int(sizes.max()) if len(sizes) else 0):
+        has = sizes > k
+        byte = (values[has] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        byte |= np.where(sizes[has] > k + 1, np.uint64(0x80), np.uint64(0))
+        out[offsets[:-1][has] + k] = byte
+    return out.tobytes(), offsets
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _field_varint(field: int, value: int) -> bytes:
+    return _varint(field << 3) + _varint(value)
+
+
+def _field_bytes(field: int, payload: bytes) -> bytes:
+    return _varint((field << 3) | 2) + _varint(len(payload)) + payload
+
+
+def _encode_tile(name: str, extent: int, features: List[Tuple[int, int, bytes]]) -> bytes:
+    layer = [_field_varint(15, 2), _field_bytes(1, name.encode('utf-8'))]  # versión y nombre
+    for feature_id, geometry_type, geometry in features:
+        layer.append(_field_bytes(
+            2, _field_varint(1, feature_id) + _field_varint(3, geometry_type) + _field_bytes(4, geometry)
+        ))
+    layer.append(_field_varint(5, extent))
+    return _field_bytes(3, b''.join(layer))
+
+
+# Capas indexadas y teselas codificadas, compartidas por todas las peticiones
+layer_cache = LRUCache(settings.TILE_LAYER_CACHE_SIZE)
+tile_cache = LRUCache(settings.TILE_CACHE_SIZE)
+
+
+def render_tile(layer_key: Hashable, build_layer: Callable[[], TileLayer], z: int, x: int, y: int) -> bytes:
+    """Tesela desde la caché; la capa se construye (carga, reproyección e índice) solo si no está en memoria"""
+    tile_key = (layer_key, z, x, y)
+    tile = tile_cache.get(tile_key)
+    if tile is None:
+        layer = layer_cache.get_or_create(layer_key, build_layer)
+        tile = layer.render(z, x, y)
+        tile_cache.put(tile_key, tile)
+    return tile
@@ -0,0 +1,142 @@
+"""
+Reproyección por lotes: varias capas a un mismo CRS destino en un pool de procesos
+"""
+import os
+import math
+import logging
+import multiprocessing
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Dict, Any, List
+from app.core.config import settings
+from app.services.spatial.file_loader import FileLoader
+from app.services.transformation.geometry_cache import ReprojectedLayerCache
+from app.services.transformation.reprojection_service import ReprojectionService
+from app.services.transformation.parallel_reprojection import mark_pool_worker
+
+logger = logging.getLogger(__name__)
+
+
+def reproject_group(items: List[Dict[str, Any]], crs_target: str) -> List[Dict[str, Any]]:
+    """Reproyecta capas que comparten CRS origen (en un proceso del pool o en línea)
+
+    Cada item trae ``analisis_id``, ``ruta``, ``ruta_optimizada``, ``hash`` y
+    ``crs_origen`` (None: el CRS del archivo). La capa transformada queda en
+    la caché en disco; el resultado solo lleva estadísticas y su ruta.
+    """
+    service = ReprojectionService()
+    cache = ReprojectedLayerCache()
+    results = []
+    for item in items:
+        result = {'analisis_id': item['analisis_id'], 'crs_origen': item['crs_origen'], 'success': False}
+        try:
+            gdf = FileLoader(item['ruta'], optimized_path=item['ruta_optimizada']).load()
+            if gdf is None:
+                raise ValueError("No se pudo cargar el archivo")
+            crs_origen = item['crs_origen'] or (str(gdf.crs) if gdf.crs else None)
+            if not crs_origen:
+                raise ValueError("CRS origen no disponible")
+            gdf = gdf.set_crs(crs_origen, allow_override=True)
+            # Las operaciones candidatas del grupo se construyen una vez por proceso (ver crs_pool)
+            transform_result = service.transform(gdf=gdf, crs_target=crs_target, crs_source=crs_origen)
+            if not transform_result['success']:
+                raise ValueError(transform_result.get('error', 'Unknown error'))
+
+            ruta_geometria = None
+            try:
+                ruta_geometria = cache.path_for(item['hash'], crs_origen, crs_target)
+                if not os.path.exists(ruta_geometria):
+                    cache.write(transform_result['gdf_transformed'], ruta_geometria)
+            except Exception as e:
+                ruta_geometria = None
+                logger.warning(f"No se pudo guardar la capa transformada del análisis {item['analisis_id']}: {e}")
+
+            result.update({
+                'success': True,
+                'crs_origen': crs_origen,
+                'method': transform_result.get('method'),
+                'operation': transform_result.get('operation'),
+                'statistics': transform_result.get('statistics', {}),
+                'ruta_geometria': ruta_geometria
+            })
+        except Exception as e:
+            result['error'] = str(e)
+        results.append(result)
+    return results
+
+
+class BatchReprojectionService:
+    """Agrupa las capas por CRS origen y reparte cada grupo en tareas del pool
+
+    Modos (settings.REPROJECTION_EXECUTOR), como la cola de diagnóstico:
+    - ``process``: pool de procesos (por defecto)
+    - ``inline``: ejecución en el mismo proceso, pensado para pruebas
+    """
+
+    def __init__(self, mode: Optional[str] = None, max_workers: Optional[int] = None):
+        self.mode = mode or settings.REPROJECTION_EXECUTOR
+        self.max_workers = max_workers or settings.REPROJECTION_MAX_WORKERS
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            # spawn: los workers no heredan conexiones del pool de SQLAlchemy ni hilos de uvicorn
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=mark_pool_worker
+            )
+        return self._executor
+
+    def _tasks(self, items: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Grupos por CRS origen, partidos en a lo sumo ``max_workers`` tareas cada uno"""
+        groups: Dict[Optional[str], List[Dict[str, Any]]] = {}
+        for item in items:
+            groups.setdefault(item['crs_origen'], []).append(item)
+
+        tasks = []
+        for group in groups.values():
+            size = math.ceil(len(group) / min(self.max_workers, len(group)))
+            tasks.extend(group[start:start + size] for start in range(0, len(group), size))
+        return tasks
+
+    def run(self, items: List[Dict[str, Any]], crs_target: str) -> List[Dict[str, Any]]:
+        """Resultados por item, en el mismo orden de ``items``"""
+        tasks = self._tasks(items)
+        if self.mode == 'inline' or len(tasks) <= 1:
+            task_results = [reproject_group(task, crs_target) for task in tasks]
+        else:
+            executor = self._get_executor()
+            futures = [executor.submit(reproject_group, task, crs_target) for task in tasks]
+            task_results = [self._task_result(future, task, executor) for future, task in zip(futures, tasks)]
+
+        by_id = {result['analisis_id']: result for results in task_results for result in results}
+        return [by_id[item['analisis_id']] for item in items]
+
+    def _task_result(self, future: Future, task: List[Dict[str, Any]], executor: Executor) -> List[Dict[str, Any]]:
+        """Resultado de una tarea; si su proceso murió, sus items se reportan como fallidos"""
+        try:
+            return future.result()
+        except BrokenProcessPool as e:
+            logger.error(f"Proceso de reproyección terminó inesperadamente: {e}")
+            if self._executor is executor:
+                # Un pool roto rechaza todo envío posterior: el siguiente lote crea otro
+                self._executor = None
+                executor.shutdown(wait=False, cancel_futures=True)
+            return [
+                {
+                    'analisis_id': item['analisis_id'],
+                    'crs_origen': item['crs_origen'],
+                    'success': False,
+                    'error': 'El proceso de reproyección terminó inesperadamente'
+                }
+                for item in task
+            ]
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+batch_reprojection = BatchReprojectionService()
@@ -0,0 +1,149 @@
+"""
+Caché en disco de capas reproyectadas por (hash del archivo, CRS origen, CRS destino)
+"""
+import os
+import hashlib
+import logging
+import tempfile
+import geopandas as gpd
+from typing import Callable, Optional, Sequence, Tuple
+from app.core.config import settings
+from app.models.data_file import DataFile
+from app.services.diagnosis.diagnosis_cache import sha256_file
+from app.services.spatial.file_loader import FileLoader
+from app.services.spatial.crs_pool import to_crs
+
+logger = logging.getLogger(__name__)
+
+CACHE_SUFFIX = '.parquet'
+
+
+def file_hash(file: DataFile) -> str:
+    """Hash del contenido del archivo; se calcula desde disco para archivos cargados sin hash"""
+    if not file.hash_sha256:
+        file.hash_sha256 = sha256_file(file.ruta_almacenamiento)
+    return file.hash_sha256
+
+
+class ReprojectedLayerCache:
+    """Capas transformadas (atributos y geometría) guardadas como GeoParquet
+
+    El nombre de cada archivo se deriva de la clave, así que toda petición con
+    el mismo archivo y par de CRS lo encuentra aunque la fila de Transformation
+    aún no lo referencie. Si el directorio supera ``max_bytes`` se eliminan
+    los archivos usados hace más tiempo (cada lectura actualiza su fecha de
+    modificación).
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.cache_dir = cache_dir or os.path.join(settings.get_upload_dir(), 'reprojected')
+        self.max_bytes = settings.REPROJECTION_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def path_for(self, content_hash: str, crs_source: str, crs_target: str) -> str:
+        key = f"{content_hash}|{crs_source.strip()}|{crs_target.strip()}"
+        return os.path.join(self.cache_dir, hashlib.sha256(key.encode('utf-8')).hexdigest() + CACHE_SUFFIX)
+
+    def read(self, path: Optional[str], columns: Optional[Sequence[str]] = None) -> Optional[gpd.GeoDataFrame]:
+        """Capa cacheada (la geometría siempre se incluye), o None si no existe o no se puede leer"""
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            gdf = gpd.read_parquet(path, columns=None if columns is None else [*columns, 'geometry'])
+        except Exception as e:
+            logger.warning(f"Caché de reproyección ilegible ({os.path.basename(path)}): {e}")
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return gdf
+
+    def write(self, gdf: gpd.GeoDataFrame, path: str) -> str:
+        """Guarda la capa de forma atómica y aplica el límite de tamaño del directorio"""
+        if gdf.geometry.name != 'geometry':
+            gdf = gdf.rename_geometry('geometry')
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        os.close(fd)
+        try:
+            gdf.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict(keep=path)
+        return path
+
+    def get_or_create(
+        self,
+        content_hash: str,
+        crs_source: str,
+        crs_target: str,
+        load: Callable[[], gpd.GeoDataFrame],
+        columns: Optional[Sequence[str]] = None
+    ) -> Tuple[gpd.GeoDataFrame, str]:
+        """Capa en ``crs_target`` y su ruta en caché
+
+        ``load`` retorna la capa original completa; solo se invoca (y se
+        reproyecta) si la entrada no existe.
+        """
+        path = self.path_for(content_hash, crs_source, crs_target)
+        gdf = self.read(path, columns)
+        if gdf is not None:
+            return gdf, path
+
+        source = load()
+        if source.crs is None:
+            source = source.set_crs(crs_source)
+        transformed = to_crs(source, crs_target)
+        self.write(transformed, path)
+        if columns is not None:
+            transformed = transformed[[*columns, transformed.geometry.name]]
+        return transformed, path
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """Elimina las entradas menos usadas hasta cumplir ``max_bytes`` (0: sin límite); retorna los bytes liberados"""
+        if self.max_bytes <= 0:
+            return 0
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith(CACHE_SUFFIX):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        freed = 0
+        for _, size, path in sorted(entries):
+            if total - freed <= self.max_bytes:
+                break
+            if keep is not None and os.path.abspath(path) == os.path.abspath(keep):
+                continue
+            try:
+                os.remove(path)
+                freed += size
+            except OSError:
+                pass
+        return freed
+
+
+def load_transformed(
+    ruta: str,
+    ruta_optimizada: Optional[str],
+    content_hash: Optional[str],
+    crs_origen: str,
+    crs_destino: str,
+    columns: Optional[Sequence[str]] = None
+) -> Tuple[gpd.GeoDataFrame, str]:
+    """Capa transformada y su ruta en la caché en disco; si no está, se reproyecta el original y se guarda
+
+    Todo el que escribe una clave debe partir de la misma capa: el archivo
+    original con ``crs_origen`` asignado.
+    """
+    def load_source():
+        gdf = FileLoader(ruta, optimized_path=ruta_optimizada).load()
+        if gdf is None:
+            raise ValueError("No se pudo cargar el archivo")
+        return gdf.set_crs(crs_origen, allow_override=True)
+
+    return ReprojectedLayerCache().get_or_create(content_hash or sha256_file(ruta), crs_origen, crs_destino, load_source, columns=columns)
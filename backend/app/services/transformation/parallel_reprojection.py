@@ -0,0 +1,131 @@
+"""
+Reproyección particionada de capas grandes
+
+Las coordenadas de la capa se copian una vez a un buffer en memoria compartida
+(una fila por eje) y cada proceso del pool transforma en sitio un bloque de
+columnas con su propio Transformer; las geometrías se reconstruyen desde ese
+mismo buffer con una sola llamada a ``shapely.set_coordinates``.
+"""
+import math
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Optional
+import numpy as np
+import shapely
+from pyproj import Transformer
+from app.core.config import settings
+from app.core.lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Transformers de cada worker, por definición del pipeline de PROJ
+pipeline_cache = LRUCache(settings.TRANSFORMER_CACHE_SIZE)
+
+# True en los workers de los pools de diagnóstico y de lotes (ver mark_pool_worker)
+_in_pool_worker = False
+
+
+def mark_pool_worker() -> None:
+    """``initializer`` de los pools cuyos workers no deben abrir otro pool de reproyección"""
+    global _in_pool_worker
+    _in_pool_worker = True
+
+
+def _pipeline_transformer(definition: str) -> Transformer:
+    return pipeline_cache.get_or_create(definition, lambda: Transformer.from_pipeline(definition))
+
+
+def transform_block(shm_name: str, shape: tuple, start: int, stop: int, definition: str) -> int:
+    """Transforma en sitio las columnas ``[start, stop)`` del buffer compartido (en un proceso del pool)"""
+    # Los workers (spawn) comparten el resource tracker del proceso principal, que es quien libera el segmento
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        buffer = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        _pipeline_transformer(definition).transform(*buffer[:, start:stop], inplace=True)
+        del buffer
+    finally:
+        shm.close()
+    return stop - start
+
+
+class ParallelReprojector:
+    """Reparte la transformación de coordenadas en bloques sobre un pool de procesos
+
+    Solo se particionan las capas con al menos ``min_coordinates`` vértices;
+    el resto, los modos ``inline`` y los procesos que ya son workers (lotes,
+    diagnóstico) transforman en serie, igual que ``shapely.transform``.
+    """
+
+    def __init__(
+        self,
+        mode: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        min_coordinates: Optional[int] = None
+    ):
+        self.mode = mode or settings.REPROJECTION_EXECUTOR
+        self.max_workers = max_workers or settings.REPROJECTION_PARALLEL_WORKERS or os.cpu_count() or 1
+        self.chunk_size = chunk_size or settings.REPROJECTION_CHUNK_SIZE
+        self.min_coordinates = settings.REPROJECTION_PARALLEL_MIN_COORDINATES if min_coordinates is None else min_coordinates
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+
+    def _parallel(self, count: int, transformer: Transformer) -> bool:
+        return (
+            self.mode != 'inline'
+            and self.max_workers > 1
+            and 0 < self.min_coordinates <= count
+            and not _in_pool_worker
+            and bool(transformer.definition)
+        )
+
+    def transform_geometries(self, geoms: np.ndarray, transformer: Transformer, include_z: bool = False) -> np.ndarray:
+        """Copia de ``geoms`` con sus coordenadas transformadas"""
+        coords = shapely.get_coordinates(geoms, include_z=include_z)
+        if not self._parallel(len(coords), transformer):
+            return shapely.set_coordinates(geoms.copy(), np.column_stack(transformer.transform(*coords.T)))
+
+        shape = (coords.shape[1], coords.shape[0])
+        shm = shared_memory.SharedMemory(create=True, size=coords.nbytes)
+        try:
+            buffer = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+            buffer[:] = coords.T
+            del coords
+            blocks = max(self.max_workers, math.ceil(shape[1] / self.chunk_size))
+            edges = np.linspace(0, shape[1], blocks + 1).astype(int)
+            try:
+                futures = [
+                    self._get_executor().submit(transform_block, shm.name, shape, int(start), int(stop), transformer.definition)
+                    for start, stop in zip(edges[:-1], edges[1:])
+                ]
+                for future in futures:
+                    future.result()
+            except Exception as e:
+                # Un bloque pudo quedar transformado a medias: se parte otra vez de las coordenadas originales
+                logger.warning(f"Reproyección en paralelo falló, se transforma en serie: {e}")
+                buffer[:] = shapely.get_coordinates(geoms, include_z=include_z).T
+                transformer.transform(*buffer, inplace=True)
+            result = shapely.set_coordinates(geoms.copy(), buffer.T)
+            del buffer
+            return result
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+parallel_reprojector = ParallelReprojector()
@@ -1,15 +1,31 @@
 """
 Servicio de transformación/reproyección de datos espaciales
 """
+import math
+import numpy as np
+import shapely
 import geopandas as gpd
 from pyproj import CRS, Transformer
-from typing import Dict, Any, Optional
+from pyproj.enums import TransformDirection
+from typing import Dict, Any, Optional, Tuple
+from app.services.spatial.crs_pool import get_crs, get_transformer, get_transformer_group, to_crs
 import json
 
+# Metros por grado (aproximación esférica, suficiente para residuos)
+METERS_PER_DEGREE = 111320.0
+
 
 class ReprojectionService:
     """Servicio para transformar datos espaciales entre sistemas de coordenadas"""
     
+    # Paso (grados) al que se redondea hacia afuera el área de interés; así
+    # capas vecinas comparten el mismo grupo de operaciones en el pool
+    AOI_STEP = 0.1
+    # Entidades con mayor residuo reportadas en los parámetros
+    WORST_FEATURES = 10
+    # Residuo (m) por debajo del cual la ida y vuelta se considera exacta (ruido de punto flotante)
+    RESIDUAL_TOLERANCE_M = 1e-6
+    
     def __init__(self):
         pass
     
@@ -20,17 +36,9 @@ class ReprojectionService:
     ) -> Dict[str, Any]:
         """Valida si la transformación es posible y segura"""
         try:
-            # Validar CRS origen
-            try:
-                crs_src = CRS.from_string(crs_source)
-            except Exception:
-                crs_src = CRS(crs_source)
-            
-            # Validar CRS destino
-            try:
-                crs_tgt = CRS.from_string(crs_target)
-            except Exception:
-                crs_tgt = CRS(crs_target)
+            # Validar CRS origen y destino (interpretados una vez por proceso, ver crs_pool)
+            crs_src = get_crs(crs_source)
+            crs_tgt = get_crs(crs_target)
             
             # Verificar si son iguales
             if crs_src == crs_tgt:
@@ -42,7 +50,7 @@ class ReprojectionService:
             
             # Intentar crear transformer para validar
             try:
-                transformer = Transformer.from_crs(crs_src, crs_tgt, always_xy=True)
+                transformer = get_transformer(crs_source, crs_target)
                 # Probar con un punto de prueba
                 test_point = (0.0, 0.0)
                 try:
@@ -102,11 +110,17 @@ class ReprojectionService:
             if not validation['valid']:
                 raise ValueError(f"Transformación no válida: {validation.get('error', 'Unknown error')}")
             
-            # Aplicar transformación
-            gdf_transformed = gdf.to_crs(crs_target)
+            if gdf.crs is None:
+                gdf = gdf.set_crs(crs_source)
+            
+            # Aplicar la operación más precisa disponible
+            transformer, operation = self.select_operation(crs_source, crs_target, gdf.total_bounds)
+            gdf_transformed = to_crs(gdf, crs_target, transformer=transformer)
             
-            # Calcular estadísticas de transformación
+            # Calcular estadísticas de transformación (extensión y residuo ida y vuelta)
             stats = self._calculate_transformation_stats(gdf, gdf_transformed)
+            residuals = self._round_trip_residuals(gdf, gdf_transformed, transformer)
+            stats.update(self._residual_stats(residuals, operation['accuracy_m']))
             
             return {
                 'success': True,
@@ -114,7 +128,9 @@ class ReprojectionService:
                 'crs_source': crs_source,
                 'crs_target': crs_target,
                 'method': validation['method'],
-                'statistics': stats
+                'operation': operation,
+                'statistics': stats,
+                'residuals': residuals
             }
         except Exception as e:
             return {
@@ -123,6 +139,142 @@ class ReprojectionService:
                 'gdf_transformed': None
             }
     
+    def select_operation(
+        self,
+        crs_source: str,
+        crs_target: str,
+        bounds: Optional[np.ndarray] = None
+    ) -> Tuple[Transformer, Dict[str, Any]]:
+        """Operación más precisa entre las candidatas de PROJ disponibles localmente
+        
+        Las candidatas se enumeran con TransformerGroup para el área de interés
+        de los datos; solo se consideran las que tienen sus mallas instaladas
+        (las que faltan se reportan). Las de precisión desconocida quedan al
+        final y, a igual precisión, se respeta el orden de PROJ.
+        """
+        aoi = self._area_of_interest(crs_source, bounds)
+        group = get_transformer_group(crs_source, crs_target, area_of_interest=aoi)
+        if not group.transformers:
+            raise ValueError("No hay operaciones de transformación disponibles localmente")
+        
+        def rank(candidate):
+            position, transformer = candidate
+            accuracy = transformer.accuracy
+            return (accuracy if accuracy is not None and accuracy >= 0 else math.inf, position)
+        
+        _, transformer = min(enumerate(group.transformers), key=rank)
+        accuracy = transformer.accuracy if transformer.accuracy is not None and transformer.accuracy >= 0 else None
+        grids = sorted({
+            grid.short_name
+            for operation in (transformer.operations or [])
+            for grid in operation.grids
+        })
+        missing_grids = sorted({
+            grid.short_name
+            for operation in group.unavailable_operations
+            for grid in operation.grids
+            if not grid.available
+        })
+        return transformer, {
+            'description': transformer.description,
+            'accuracy_m': accuracy,
+            'grids': grids,
+            'candidates': len(group.transformers),
+            'best_available': bool(group.best_available),
+            'missing_grids': missing_grids,
+            'area_of_interest': list(aoi) if aoi is not None else None
+        }
+    
+    def _area_of_interest(self, crs_source: str, bounds: Optional[np.ndarray]) -> Optional[Tuple[float, float, float, float]]:
+        """Extensión de los datos en grados (oeste, sur, este, norte), redondeada hacia afuera"""
+        if bounds is None or not np.all(np.isfinite(bounds)):
+            return None
+        try:
+            src = get_crs(crs_source)
+            if src.is_geographic:
+                west, south, east, north = bounds
+            else:
+                west, south, east, north = get_transformer(src, 'EPSG:4326').transform_bounds(*bounds)
+        except Exception:
+            return None
+        if not all(math.isfinite(v) for v in (west, south, east, north)):
+            return None
+        step = self.AOI_STEP
+        return (
+            max(-180.0, round(math.floor(west / step) * step, 6)),
+            max(-90.0, round(math.floor(south / step) * step, 6)),
+            min(180.0, round(math.ceil(east / step) * step, 6)),
+            min(90.0, round(math.ceil(north / step) * step, 6))
+        )
+    
+    def _round_trip_residuals(
+        self,
+        gdf_original: gpd.GeoDataFrame,
+        gdf_transformed: gpd.GeoDataFrame,
+        transformer: Transformer
+    ) -> np.ndarray:
+        """Residuo ida y vuelta por entidad (metros): máximo sobre sus vértices
+        
+        Las coordenadas transformadas se devuelven con la operación inversa y se
+        comparan con las originales, todo sobre arreglos. NaN en entidades
+        vacías; infinito si algún vértice no se pudo transformar.
+        """
+        residuals = np.full(len(gdf_original), np.nan)
+        original, index = shapely.get_coordinates(np.asarray(gdf_original.geometry.values), return_index=True)
+        if len(original) == 0:
+            return residuals
+        transformed = shapely.get_coordinates(np.asarray(gdf_transformed.geometry.values))
+        
+        with np.errstate(invalid='ignore'):
+            back_x, back_y = transformer.transform(
+                transformed[:, 0], transformed[:, 1], direction=TransformDirection.INVERSE
+            )
+            dx = np.asarray(back_x) - original[:, 0]
+            dy = np.asarray(back_y) - original[:, 1]
+            
+            crs = gdf_original.crs
+            if crs is not None and crs.is_geographic:
+                dx = dx * METERS_PER_DEGREE * np.cos(np.radians(original[:, 1]))
+                dy = dy * METERS_PER_DEGREE
+            elif crs is not None and crs.axis_info:
+                unit = crs.axis_info[0].unit_conversion_factor
+                dx, dy = dx * unit, dy * unit
+            vertex_residuals = np.hypot(dx, dy)
+        vertex_residuals[~np.isfinite(vertex_residuals)] = np.inf
+        
+        # Coordenadas agrupadas por entidad (en orden): máximo por bloque
+        starts = np.flatnonzero(np.r_[True, index[1:] != index[:-1]])
+        residuals[index[starts]] = np.maximum.reduceat(vertex_residuals, starts)
+        return residuals
+    
+    def _residual_stats(self, residuals: np.ndarray, accuracy: Optional[float]) -> Dict[str, Any]:
+        """Resumen de residuos y cota de error (precisión declarada + residuo máximo)"""
+        finite = residuals[np.isfinite(residuals)]
+        failed = int(np.isinf(residuals).sum())
+        summary: Dict[str, Any] = {
+            'max_m': None,
+            'mean_m': None,
+            'p95_m': None,
+            'failed_features': failed,
+            'worst_features': []
+        }
+        if len(finite):
+            summary.update({
+                'max_m': float(finite.max()),
+                'mean_m': float(finite.mean()),
+                'p95_m': float(np.percentile(finite, 95))
+            })
+            ranked = np.where(np.isfinite(residuals), residuals, -1.0)
+            worst = np.argsort(ranked)[::-1][:self.WORST_FEATURES]
+            summary['worst_features'] = [
+                {'index': int(i), 'residual_m': float(residuals[i])} for i in worst if ranked[i] > self.RESIDUAL_TOLERANCE_M
+            ]
+        
+        error_bound = None
+        if accuracy is not None and summary['max_m'] is not None and failed == 0:
+            error_bound = accuracy + summary['max_m']
+        return {'round_trip_residual': summary, 'error_bound_m': error_bound}
+    
     def _determine_transformation_method(self, crs_source: CRS, crs_target: CRS) -> str:
         """Determina el método de transformación utilizado"""
         # Si ambos son geográficos o ambos son proyectados
@@ -3,15 +3,18 @@ Calculador de errores planimétricos y altimétricos
 """
 import geopandas as gpd
 import numpy as np
-from typing import Optional, Dict, Any, List
-from shapely.geometry import Point, LineString, Polygon
+import shapely
+from scipy.spatial import cKDTree
+from typing import Optional, Dict, Any, List, Tuple
+from app.services.spatial.analysis_context import AnalysisContext
 
 
 class ErrorCalculator:
     """Calcula errores planimétricos y altimétricos de datos espaciales"""
     
-    def __init__(self, gdf: gpd.GeoDataFrame):
+    def __init__(self, gdf: gpd.GeoDataFrame, context: Optional[AnalysisContext] = None):
         self.gdf = gdf
+        self.context = context if context is not None else AnalysisContext(gdf)
         
     def calculate_errors(self, crs_detectado: Optional[str] = None, escala_estimada: Optional[float] = None) -> Dict[str, Any]:
         """Calcula errores planimétricos y altimétricos"""
@@ -20,6 +23,7 @@ class ErrorCalculator:
             'error_altimetrico': None,
             'method_planimetrico': None,
             'method_altimetrico': None,
+            'consistencia': None,
             'explicacion': None
         }
         
@@ -30,6 +34,7 @@ class ErrorCalculator:
         planimetric_error = self._calculate_planimetric_error(gdf_projected, escala_estimada)
         results['error_planimetrico'] = planimetric_error.get('error')
         results['method_planimetrico'] = planimetric_error.get('method')
+        results['consistencia'] = planimetric_error.get('consistencia')
         
         # Calcular error altimétrico (solo si hay datos Z)
         altimetric_error = self._calculate_altimetric_error(gdf_projected)
@@ -45,26 +50,17 @@ class ErrorCalculator:
         
         results['explicacion'] = ' | '.join(explanations) if explanations else 'No se pudieron calcular errores'
         
+        if self.context.is_sampled:
+            metrics = {}
+            metrics.update(planimetric_error.get('intervalos', {}))
+            metrics.update(altimetric_error.get('intervalos', {}))
+            results['muestreo'] = {**self.context.sampling_summary(), 'metricas': metrics}
+        
         return results
     
     def _ensure_projected(self) -> gpd.GeoDataFrame:
-        """Convierte a CRS proyectado si es geográfico"""
-        if self.gdf.crs is None:
-            gdf_copy = self.gdf.copy()
-            gdf_copy.set_crs('EPSG:4326', allow_override=True)
-        else:
-            gdf_copy = self.gdf.copy()
-        
-        if gdf_copy.crs and gdf_copy.crs.is_geographic:
-            try:
-                gdf_copy = gdf_copy.to_crs('EPSG:3116')  # MAGNA-SIRGAS Bogotá
-            except:
-                try:
-                    gdf_copy = gdf_copy.to_crs('EPSG:32618')  # UTM 18N
-                except Exception:
-                    pass
-        
-        return gdf_copy
+        """Vista proyectada compartida (de la muestra en capas grandes)"""
+        return self.context.sample.projected
     
     def _calculate_planimetric_error(self, gdf: gpd.GeoDataFrame, escala_estimada: Optional[float] = None) -> Dict[str, Any]:
         """Calcula error planimétrico usando desviación estándar y análisis de precisión"""
@@ -74,14 +70,16 @@ class ErrorCalculator:
             
             # Método 1: Desviación estándar de coordenadas (precisión interna)
             std_error = self._calculate_std_error(gdf)
+            intervals = self._std_error_intervals(gdf) if self.context.is_sampled else {}
             
             # Método 2: Error basado en escala (si está disponible)
             scale_error = None
             if escala_estimada:
                 scale_error = self._calculate_scale_based_error(escala_estimada)
             
-            # Método 3: Análisis de consistencia geométrica
-            consistency_error = self._calculate_consistency_error(gdf)
+            # Método 3: Consistencia geométrica (vecino más cercano en la capa completa)
+            consistency = self._calculate_consistency_error()
+            consistency_error = consistency['error'] if consistency else None
             
             # Combinar métodos (usar el más conservador o promedio)
             errors = []
@@ -107,7 +105,9 @@ class ErrorCalculator:
             return {
                 'error': final_error,
                 'method': method,
-                'explicacion': f'Error calculado mediante {method}'
+                'explicacion': f'Error calculado mediante {method}',
+                'intervalos': intervals,
+                'consistencia': consistency
             }
         except Exception as e:
             return {
@@ -119,22 +119,11 @@ class ErrorCalculator:
     def _calculate_std_error(self, gdf: gpd.GeoDataFrame) -> Optional[float]:
         """Calcula error basado en desviación estándar de coordenadas"""
         try:
-            coords = []
-            for geom in gdf.geometry:
-                if geom is None:
-                    continue
-                if isinstance(geom, Point):
-                    coords.append([geom.x, geom.y])
-                elif isinstance(geom, LineString):
-                    coords.extend(list(geom.coords))
-                elif isinstance(geom, Polygon):
-                    coords.extend(list(geom.exterior.coords))
+            coords_array = self.context.sample.coordinates(gdf).xy
             
-            if len(coords) < 2:
+            if len(coords_array) < 2:
                 return None
             
-            coords_array = np.array(coords)
-            
             # Calcular desviación estándar en X e Y
             std_x = np.std(coords_array[:, 0])
             std_y = np.std(coords_array[:, 1])
@@ -145,8 +134,7 @@ class ErrorCalculator:
             
             # Normalizar: si el error es muy grande comparado con la extensión, 
             # puede ser que los datos estén en diferentes zonas
-            bounds = gdf.total_bounds
-            extent = max(abs(bounds[2] - bounds[0]), abs(bounds[3] - bounds[1]))
+            extent = self._projected_extent()
             
             if error > extent * 0.1:  # Si el error es >10% de la extensión, es sospechoso
                 # Usar un error más conservador basado en la extensión
@@ -156,6 +144,37 @@ class ErrorCalculator:
         except Exception:
             return None
     
+    def _projected_extent(self) -> float:
+        """Extensión máxima de la capa completa en la vista proyectada"""
+        bounds = self.context.projected_bounds
+        return max(abs(bounds[2] - bounds[0]), abs(bounds[3] - bounds[1]))
+    
+    def _std_error_intervals(self, gdf: gpd.GeoDataFrame) -> Dict[str, Any]:
+        """Intervalo de confianza del error por desviación estándar a partir de sumas por entidad"""
+        coords = self.context.sample.coordinates(gdf)
+        if len(coords) < 2:
+            return {}
+        
+        # Centrar antes de elevar al cuadrado para no perder precisión con coordenadas proyectadas
+        centered = coords.xy - coords.xy.mean(axis=0)
+        per_feature = np.column_stack([
+            coords.counts,
+            coords.sum_by_geometry(centered[:, 0]),
+            coords.sum_by_geometry(centered[:, 1]),
+            coords.sum_by_geometry(centered[:, 0] ** 2),
+            coords.sum_by_geometry(centered[:, 1] ** 2)
+        ])
+        extent = self._projected_extent()
+        
+        def std_error(sums: np.ndarray) -> np.ndarray:
+            n = sums[..., 0]
+            var_x = sums[..., 3] / n - (sums[..., 1] / n) ** 2
+            var_y = sums[..., 4] / n - (sums[..., 2] / n) ** 2
+            error = np.sqrt(np.maximum(var_x, 0) + np.maximum(var_y, 0))
+            return np.where(error > extent * 0.1, extent * 0.01, error)
+        
+        return {'error_desviacion_estandar': self.context.sample_statistics.from_sums(per_feature, std_error)}
+    
     def _calculate_scale_based_error(self, escala: float) -> Optional[float]:
         """Calcula error esperado basado en la escala"""
         # Error típico en metros = escala / 2000 (regla general)
@@ -163,72 +182,123 @@ class ErrorCalculator:
         error = escala / 2000.0
         return float(error)
     
-    def _calculate_consistency_error(self, gdf: gpd.GeoDataFrame) -> Optional[float]:
-        """Calcula error basado en consistencia geométrica (duplicados, solapamientos)"""
+    def _calculate_consistency_error(self) -> Optional[Dict[str, Any]]:
+        """Calcula error basado en consistencia geométrica (distancia al vecino más cercano y duplicados)
+        
+        Cada entidad se compara con la más cercana de toda la capa: un KD-tree
+        sobre las coordenadas en capas de puntos o el STRtree de shapely en
+        cualquier otro caso. En capas muestreadas la distribución sale de las
+        entidades de la muestra (ver ``_sampled_nearest``). Las distancias
+        nulas (contacto o duplicado) no entran en la distribución.
+        """
         try:
-            if len(gdf) < 2:
+            if self.context.is_sampled:
+                found = self._sampled_nearest()
+            else:
+                found = self._nearest(self.context.projected)
+            if found is None:
                 return None
+            nearest, duplicates, total, method = found
             
-            # Analizar distancias mínimas entre geometrías
-            min_distances = []
-            
-            for i in range(min(100, len(gdf))):  # Limitar a 100 para rendimiento
-                geom1 = gdf.iloc[i].geometry
-                if geom1 is None:
-                    continue
+            positive = nearest[np.isfinite(nearest) & (nearest > 0)]
+            if len(positive) == 0:
+                min_dist = median_dist = None
+                error = None
+            else:
+                # Si hay muchas distancias muy pequeñas, puede indicar duplicados o baja precisión
+                min_dist = float(positive.min())
+                median_dist = float(np.median(positive))
                 
-                for j in range(i + 1, min(i + 10, len(gdf))):  # Comparar con siguientes 10
-                    geom2 = gdf.iloc[j].geometry
-                    if geom2 is None:
-                        continue
-                    
-                    try:
-                        dist = geom1.distance(geom2)
-                        if dist > 0:
-                            min_distances.append(dist)
-                    except Exception:
-                        continue
+                # Si la distancia mínima es muy pequeña (< 0.1m), puede indicar error de precisión
+                if min_dist < 0.1:
+                    error = min_dist * 10  # Estimación conservadora
+                elif median_dist < 1.0:
+                    error = median_dist * 0.5
+                else:
+                    error = None
             
-            if not min_distances:
-                return None
-            
-            # Si hay muchas distancias muy pequeñas, puede indicar duplicados o baja precisión
-            min_dist = min(min_distances)
-            median_dist = np.median(min_distances)
-            
-            # Si la distancia mínima es muy pequeña (< 0.1m), puede indicar error de precisión
-            if min_dist < 0.1:
-                return float(min_dist * 10)  # Estimación conservadora
-            elif median_dist < 1.0:
-                return float(median_dist * 0.5)
-            else:
-                return None
+            return {
+                'error': error,
+                'distancia_minima': min_dist,
+                'distancia_mediana': median_dist,
+                'duplicados': duplicates,
+                'entidades': total,
+                'entidades_consultadas': int(len(nearest)),
+                'metodo': method
+            }
         except Exception:
             return None
     
+    def _nearest(self, gdf: gpd.GeoDataFrame) -> Optional[Tuple[np.ndarray, int, int, str]]:
+        """Distancia de cada entidad a la más cercana, duplicados, entidades y método"""
+        all_geoms = np.asarray(gdf.geometry.values, dtype=object)
+        geoms = all_geoms[~shapely.is_missing(all_geoms) & ~shapely.is_empty(all_geoms)]
+        if len(geoms) < 2:
+            return None
+        
+        if (shapely.get_type_id(geoms) == 0).all():
+            # Puntos: vecino más cercano exacto sobre las coordenadas (k=2 incluye el propio punto)
+            coords = shapely.get_coordinates(geoms)
+            distances, _ = cKDTree(coords).query(coords, k=2)
+            nearest = distances[:, 1]
+            return nearest, int((nearest == 0).sum()), len(geoms), 'kdtree'
+        
+        # Las entidades que tocan a otra tienen distancia nula; solo las aisladas
+        # necesitan la búsqueda del vecino más cercano
+        tree = shapely.STRtree(geoms)
+        left, right = tree.query(geoms, predicate='intersects')
+        others = left != right
+        left, right = left[others], right[others]
+        duplicates = int(len(np.unique(left[shapely.equals(geoms[left], geoms[right])])))
+        nearest = np.zeros(len(geoms))
+        isolated = np.setdiff1d(np.arange(len(geoms)), left)
+        if len(isolated):
+            (source, _), pair_distances = tree.query_nearest(
+                geoms[isolated], return_distance=True, exclusive=True
+            )
+            nearest[isolated] = np.inf
+            np.minimum.at(nearest, isolated[source], pair_distances)
+        return nearest, duplicates, len(geoms), 'strtree'
+    
+    def _sampled_nearest(self) -> Optional[Tuple[np.ndarray, int, int, str]]:
+        """Como ``_nearest`` para las entidades de la muestra, buscando en ventanas a su alrededor
+
+        El árbol de la capa (en su CRS original) da las entidades que tocan a
+        cada una de la muestra y el vecino más cercano de las aisladas; solo
+        ese subconjunto se reproyecta para medir las distancias en metros. Los
+        duplicados de la muestra se expanden a la capa.
+        """
+        context = self.context
+        all_geoms = np.asarray(context.gdf.geometry.values, dtype=object)
+        present = ~shapely.is_missing(all_geoms) & ~shapely.is_empty(all_geoms)
+        sample = context.sample_positions[present[context.sample_positions]]
+        if len(sample) < 2:
+            return None
+        
+        source, neighbors = context.sample_neighbors()
+        duplicated = np.unique(source[shapely.equals(all_geoms[source], all_geoms[neighbors])])
+        duplicates = int(round(len(duplicated) * context.expansion_factor))
+        
+        nearest = np.zeros(len(sample))
+        isolated = np.flatnonzero(~np.isin(sample, source))
+        if len(isolated):
+            nearest[isolated] = np.inf
+            pair_source, candidate = context.tree.query_nearest(all_geoms[sample[isolated]], exclusive=True)
+            window = np.union1d(sample[isolated], candidate)
+            view = np.asarray(context.subset(window).projected.geometry.values, dtype=object)
+            distances = shapely.distance(
+                view[np.searchsorted(window, sample[isolated][pair_source])],
+                view[np.searchsorted(window, candidate)]
+            )
+            np.minimum.at(nearest, isolated[pair_source], distances)
+        return nearest, duplicates, int(present.sum()), 'strtree_ventanas'
+    
     def _calculate_altimetric_error(self, gdf: gpd.GeoDataFrame) -> Dict[str, Any]:
         """Calcula error altimétrico si hay datos Z"""
         try:
-            # Extraer coordenadas Z
-            z_values = []
-            
-            for geom in gdf.geometry:
-                if geom is None:
-                    continue
-                
-                if isinstance(geom, Point):
-                    if hasattr(geom, 'z') and geom.z is not None:
-                        z_values.append(geom.z)
-                elif isinstance(geom, LineString):
-                    coords = list(geom.coords)
-                    for coord in coords:
-                        if len(coord) > 2 and coord[2] is not None:
-                            z_values.append(coord[2])
-                elif isinstance(geom, Polygon):
-                    coords = list(geom.exterior.coords)
-                    for coord in coords:
-                        if len(coord) > 2 and coord[2] is not None:
-                            z_values.append(coord[2])
+            # Extraer coordenadas Z (solo valores finitos)
+            coords = self.context.sample.coordinates(gdf)
+            z_values = coords.z_values
             
             if len(z_values) < 2:
                 return {
@@ -237,7 +307,7 @@ class ErrorCalculator:
                     'explicacion': 'No hay datos altimétricos (Z) disponibles'
                 }
             
-            z_array = np.array(z_values)
+            z_array = z_values
             
             # Calcular desviación estándar de Z
             std_z = np.std(z_array)
@@ -254,11 +324,27 @@ class ErrorCalculator:
                 # Error como desviación estándar
                 error = std_z * 0.5  # Mitad de la desviación estándar
             
-            return {
+            result = {
                 'error': float(error),
                 'method': 'std_deviation_z',
                 'explicacion': f'Error calculado a partir de {len(z_values)} puntos con coordenada Z'
             }
+            if self.context.is_sampled:
+                finite = np.isfinite(coords.z)
+                index = coords.geometry_index[finite]
+                z_centered = coords.z[finite] - z_array.mean()
+                per_feature = np.column_stack([
+                    coords.sum_by_geometry(np.ones(len(index)), index),
+                    coords.sum_by_geometry(z_centered, index),
+                    coords.sum_by_geometry(z_centered ** 2, index)
+                ])
+                result['intervalos'] = {
+                    'desviacion_estandar_z': self.context.sample_statistics.from_sums(
+                        per_feature,
+                        lambda s: np.sqrt(np.maximum(s[..., 2] / s[..., 0] - (s[..., 1] / s[..., 0]) ** 2, 0))
+                    )
+                }
+            return result
         except Exception as e:
             return {
                 'error': None,
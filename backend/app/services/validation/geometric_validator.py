@@ -1,14 +1,47 @@
 import geopandas as gpd
-from shapely.geometry import Point, LineString, Polygon
-from shapely.validation import make_valid
 import numpy as np
-from typing import Dict, Any, List
+import shapely
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+from typing import Dict, Any, List, Optional, Sequence
+from app.services.spatial.analysis_context import AnalysisContext
+
+def count_errors(validation: Dict[str, Any], tipos: Optional[Sequence[str]] = None) -> int:
+    """Errores de una validación; los grupos cuentan por su ``cantidad`` (resultados antiguos: textos sueltos)
+
+    Con ``tipos`` solo se cuentan los grupos de esos tipos (los textos sueltos eran geometrías inválidas).
+    """
+    return sum(
+        error.get('cantidad', 1) if isinstance(error, dict) else 1
+        for error in validation.get('errors', [])
+        if tipos is None or not isinstance(error, dict) or error.get('tipo') in tipos
+    )
+
+
+INVALID_GEOMETRY_TYPES = ('geometria_nula', 'geometria_invalida')
+
 
 class GeometricValidator:
     """Valida la calidad geométrica de los datos espaciales"""
     
-    def __init__(self, gdf: gpd.GeoDataFrame):
+    MAX_ERROR_INDICES = 20  # Índices de ejemplo por grupo de error
+    OVERLAP_MIN_AREA = 0.01  # m²; superposiciones menores se toman como ruido de digitalización
+    GAP_MAX_WIDTH = 1.0  # m; huecos con ancho medio (2·área/perímetro) menor se reportan como slivers
+    COVERAGE_MAX_OVERLAP_RATIO = 0.01  # Superposiciones por polígono por encima de las cuales no se buscan huecos
+    GAP_SAMPLE_SIZE = 5_000  # En modo muestreo, polígonos muestreados alrededor de los cuales se unen polígonos para buscar huecos
+    OUTLIER_QUANTILE = 0.999  # Cuantil chi² de la distancia robusta a partir del cual una entidad es candidata
+    OUTLIER_SUBSET = 0.75  # Fracción de entidades que define la covarianza robusta
+    OUTLIER_FIT_SIZE = 100_000  # Entidades usadas para ajustar la covarianza y el núcleo
+    OUTLIER_MAX_ITERATIONS = 10
+    OUTLIER_TOLERANCE = 1e-3  # Mejora relativa mínima del determinante para seguir iterando
+    OUTLIER_SPACING_SAMPLE = 10_000  # Entidades del núcleo con las que se estima la distancia típica entre vecinas
+    LOCAL_OUTLIER_NEIGHBORS = 8
+    LOCAL_OUTLIER_RATIO = 10.0  # Salto máximo hacia el núcleo, en distancias típicas al k-ésimo vecino
+    
+    def __init__(self, gdf: gpd.GeoDataFrame, context: Optional[AnalysisContext] = None):
         self.gdf = gdf
+        self.context = context if context is not None else AnalysisContext(gdf)
         
     def validate(self) -> Dict[str, Any]:
         """Ejecuta validación geométrica completa"""
@@ -26,6 +59,16 @@ class GeometricValidator:
             results['is_valid'] = False
             results['errors'].extend(invalid_geoms)
         
+        # Topología: duplicados, superposiciones y huecos entre polígonos
+        topology = self._check_topology()
+        results['topology'] = topology
+        topology_errors = self._topology_errors(topology)
+        if topology_errors:
+            results['is_valid'] = False
+            results['errors'].extend(topology_errors)
+        if topology['huecos'] and topology['huecos']['cantidad']:
+            results['warnings'].append(f"Se detectaron {topology['huecos']['cantidad']} huecos entre polígonos adyacentes")
+        
         # Detectar outliers espaciales
         outliers = self._detect_outliers()
         if outliers:
@@ -37,89 +80,378 @@ class GeometricValidator:
         
         return results
     
-    def _check_invalid_geometries(self) -> List[str]:
-        """Verifica geometrías inválidas"""
+    def _check_invalid_geometries(self) -> List[Dict[str, Any]]:
+        """Geometrías nulas e inválidas agrupadas por razón, con conteo e índices de ejemplo"""
+        geoms = np.asarray(self.gdf.geometry.values, dtype=object)
+        missing = shapely.is_missing(geoms)
         errors = []
+        if missing.any():
+            errors.append(self._error_group('geometria_nula', 'Geometría nula', np.flatnonzero(missing)))
+        
+        # La razón (GEOS) solo se pide para las inválidas
+        invalid = np.flatnonzero(~missing & ~shapely.is_valid(geoms))
+        if len(invalid) == 0:
+            return errors
+        reasons = shapely.is_valid_reason(geoms[invalid]).astype(str)
+        # "Self-intersection[x y]": se agrupa por el texto sin la ubicación
+        kinds = np.char.strip(np.char.partition(reasons, '[')[:, 0])
+        unique_kinds, inverse, counts = np.unique(kinds, return_inverse=True, return_counts=True)
+        for group in np.argsort(-counts, kind='stable'):
+            members = np.flatnonzero(inverse == group)
+            errors.append(self._error_group(
+                'geometria_invalida', str(unique_kinds[group]), invalid[members], ejemplo=str(reasons[members[0]])
+            ))
+        return errors
+    
+    def _error_group(self, tipo: str, razon: str, indices: np.ndarray, ejemplo: Optional[str] = None) -> Dict[str, Any]:
+        group = {
+            'tipo': tipo,
+            'razon': razon,
+            'cantidad': int(len(indices)),
+            'indices': indices[:self.MAX_ERROR_INDICES].tolist()
+        }
+        if ejemplo is not None:
+            group['ejemplo'] = ejemplo
+        return group
+    
+    def _check_topology(self) -> Dict[str, Any]:
+        """Duplicados, superposiciones y huecos con una consulta en bloque sobre un STRtree
+
+        Se evalúa en la vista proyectada (áreas en m²) y solo sobre geometrías
+        válidas. Los pares candidatos salen de una sola consulta ``intersects``
+        del árbol contra sí mismo, así que el costo crece con n·log(n) más el
+        número de vecinos y no con n². En modo muestreo solo se reproyectan y
+        evalúan las ventanas alrededor de la muestra (las entidades muestreadas
+        y las que quedan a menos de dos anchos de hueco de ellas); cada par o
+        hueco pesa según cuántas de sus entidades están en la muestra y los
+        conteos se expanden a la capa.
+        """
+        view, window, sampled = self._topology_view()
+        metric = view.crs is None or not view.crs.is_geographic
+        all_geoms = np.asarray(view.geometry.values, dtype=object)
+        positions = np.flatnonzero(
+            ~shapely.is_missing(all_geoms) & ~shapely.is_empty(all_geoms) & shapely.is_valid(all_geoms)
+        )
+        geoms = all_geoms[positions]
+        tree = shapely.STRtree(geoms)
+        left, right = tree.query(geoms, predicate='intersects')
+        keep = left < right
+        # Peso de cada entidad en las estimaciones: 1 sin muestreo; en ventanas, el factor de
+        # expansión para las muestreadas y 0 para sus vecinas. Un par pesa el promedio de sus extremos
+        weight = np.ones(len(geoms)) if sampled is None else sampled[positions] * self.context.expansion_factor
+        if sampled is not None:
+            keep &= (weight[left] > 0) | (weight[right] > 0)
+        left, right = left[keep], right[keep]
+        pair_weight = (weight[left] + weight[right]) / 2
+        duplicated = shapely.equals(geoms[left], geoms[right])
+        origin = window[positions]
         
-        for idx, geom in enumerate(self.gdf.geometry):
-            if geom is None:
-                errors.append(f'Geometría nula en índice {idx}')
-            elif not geom.is_valid:
-                # Obtener razón de invalidez si está disponible
-                try:
-                    from shapely.validation import explain_validity
-                    reason = explain_validity(geom)
-                    errors.append(f'Geometría inválida en índice {idx}: {reason}')
-                except Exception:
-                    errors.append(f'Geometría inválida en índice {idx}')
+        # Superposiciones: pares de polígonos cuyos interiores se cruzan. La intersección
+        # de los bounding boxes acota el área y descarta sin GEOS a los vecinos que solo se tocan
+        min_area = self.OVERLAP_MIN_AREA if metric else 0.0
+        polygonal = np.isin(shapely.get_type_id(geoms), [3, 6])
+        bounds = shapely.bounds(geoms)
+        box_overlap = (
+            np.clip(np.minimum(bounds[left, 2], bounds[right, 2]) - np.maximum(bounds[left, 0], bounds[right, 0]), 0, None)
+            * np.clip(np.minimum(bounds[left, 3], bounds[right, 3]) - np.maximum(bounds[left, 1], bounds[right, 1]), 0, None)
+        )
+        candidates = ~duplicated & polygonal[left] & polygonal[right] & (box_overlap > min_area)
+        over_left, over_right, over_weight = left[candidates], right[candidates], pair_weight[candidates]
+        interior = shapely.relate_pattern(geoms[over_left], geoms[over_right], 'T********')
+        over_left, over_right, over_weight = over_left[interior], over_right[interior], over_weight[interior]
+        areas = shapely.area(shapely.intersection(geoms[over_left], geoms[over_right]))
+        significant = areas > min_area
+        over_left, over_right = over_left[significant], over_right[significant]
+        areas, over_weight = areas[significant], over_weight[significant]
         
+        # Los huecos solo tienen sentido si los polígonos forman (casi) una cobertura;
+        # en grados el ancho de un sliver tampoco tiene un umbral razonable
+        coverage = over_weight.sum() <= self.COVERAGE_MAX_OVERLAP_RATIO * weight[polygonal].sum()
+        gaps = self._find_gaps(geoms, origin, polygonal, weight, tree) if metric and coverage else None
+        
+        topology = {
+            'unidades': 'm' if metric and view.crs is not None else None,
+            'duplicadas': {
+                'cantidad': int(round(pair_weight[duplicated].sum())),
+                'pares': self._sample_pairs(origin[left[duplicated]], origin[right[duplicated]])
+            },
+            'superposiciones': {
+                'cantidad': int(round(over_weight.sum())),
+                'area_total': float((areas * over_weight).sum()),
+                'pares': self._sample_pairs(origin[over_left], origin[over_right])
+            },
+            'huecos': gaps
+        }
+        if sampled is not None:
+            topology['muestreo'] = {**self.context.sampling_summary(), 'entidades_ventana': int(len(window))}
+        return topology
+    
+    def _topology_view(self):
+        """Vista proyectada para la topología, posiciones de sus filas en el original y máscara de muestreadas
+
+        Sin muestreo es la vista proyectada compartida de toda la capa (máscara None).
+        La ventana incluye a las vecinas separadas por un hueco angosto, que no
+        intersecan a la muestreada pero son las que lo encierran.
+        """
+        if not self.context.is_sampled:
+            return self.context.projected, np.arange(len(self.gdf)), None
+        window = self.context.sample_window(2 * self.GAP_MAX_WIDTH)
+        sampled = np.isin(window, self.context.sample_positions)
+        return self.context.subset(window).projected, window, sampled
+    
+    def _find_gaps(
+        self,
+        geoms: np.ndarray,
+        origin: np.ndarray,
+        polygonal: np.ndarray,
+        weight: np.ndarray,
+        tree: shapely.STRtree
+    ) -> Dict[str, Any]:
+        """Huecos angostos entre polígonos: anillos interiores de la unión con ancho medio bajo
+
+        Los huecos abiertos hacia el borde de la capa (o de la ventana) no quedan
+        encerrados y no se detectan.
+        """
+        empty = {'cantidad': 0, 'area_total': 0.0, 'indices': []}
+        members = polygonal
+        if not (weight > 0).all():
+            # La unión es la parte costosa: en modo muestreo se acota a los polígonos a menos de
+            # dos anchos de hueco de a lo sumo GAP_SAMPLE_SIZE muestreados (reparto sistemático),
+            # reponderados
+            seeds = np.flatnonzero(polygonal & (weight > 0))
+            step = max(1, int(np.ceil(len(seeds) / self.GAP_SAMPLE_SIZE)))
+            chosen = seeds[::step]
+            weight = np.zeros(len(geoms))
+            if len(chosen):
+                weight[chosen] = self.context.expansion_factor * len(seeds) / len(chosen)
+            _, around = tree.query(geoms[chosen], predicate='dwithin', distance=2 * self.GAP_MAX_WIDTH)
+            members = np.zeros(len(geoms), dtype=bool)
+            members[around] = True
+            members &= polygonal
+        if members.sum() < 2:
+            return empty
+        parts = shapely.get_parts(shapely.union_all(geoms[members]))
+        parts = parts[shapely.get_type_id(parts) == 3]
+        rings, owner = shapely.get_rings(parts, return_index=True)
+        # get_rings entrega primero el anillo exterior de cada polígono
+        interior = np.r_[False, owner[1:] == owner[:-1]] if len(rings) else np.zeros(0, dtype=bool)
+        holes = shapely.polygons(rings[interior])
+        areas = shapely.area(holes)
+        widths = 2 * areas / np.maximum(shapely.length(holes), np.finfo(float).tiny)
+        holes, areas = holes[widths <= self.GAP_MAX_WIDTH], areas[widths <= self.GAP_MAX_WIDTH]
+        if len(holes) == 0:
+            return empty
+        # Cada hueco se atribuye al polígono que comparte más borde con él (desempate por
+        # posición) y pesa lo que pesa ese polígono: en modo muestreo cuenta si su dueño está en
+        # la muestra, cuya ventana sí lo encierra
+        hole, neighbors = tree.query(holes, predicate='intersects')
+        shared = shapely.length(shapely.intersection(shapely.boundary(holes[hole]), shapely.boundary(geoms[neighbors])))
+        order = np.lexsort((origin[neighbors], -shared, hole))
+        owners = order[np.r_[True, hole[order][1:] != hole[order][:-1]]]
+        hole_weight = np.zeros(len(holes))
+        hole_weight[hole[owners]] = weight[neighbors[owners]]
+        counted = hole_weight > 0
+        if not counted.any():
+            return empty
+        return {
+            'cantidad': int(round(hole_weight.sum())),
+            'area_total': float((areas * hole_weight).sum()),
+            'indices': np.unique(origin[neighbors[counted[hole]]])[:self.MAX_ERROR_INDICES].tolist()
+        }
+    
+    def _sample_pairs(self, left: np.ndarray, right: np.ndarray) -> List[List[int]]:
+        return np.column_stack([left, right])[:self.MAX_ERROR_INDICES].tolist()
+    
+    def _topology_errors(self, topology: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Grupos de error para duplicados y superposiciones (los huecos quedan como advertencia)"""
+        errors = []
+        for tipo, razon, section in (
+            ('geometria_duplicada', 'Geometría duplicada', topology['duplicadas']),
+            ('superposicion', 'Superposición entre polígonos', topology['superposiciones'])
+        ):
+            if section['cantidad']:
+                group = self._error_group(tipo, razon, np.unique(section['pares']))
+                group['cantidad'] = section['cantidad']
+                errors.append(group)
         return errors
     
     def _detect_outliers(self) -> List[Dict[str, Any]]:
-        """Detecta outliers espaciales usando IQR"""
+        """Detecta outliers espaciales de los centroides (una entrada por entidad)
+        
+        Candidatas: distancia de Mahalanobis robusta por encima del cuantil chi²
+        ``OUTLIER_QUANTILE``. Se confirman solo las que no se unen al
+        núcleo de la capa con saltos cortos entre vecinos, así que los extremos
+        de una red vial alargada o curva no se marcan y un grupo de entidades
+        desplazado sí.
+        """
         if len(self.gdf) < 4:
             return []
         
-        # Extraer coordenadas
-        coords = []
-        for geom in self.gdf.geometry:
-            if geom is not None:
-                if isinstance(geom, Point):
-                    coords.append([geom.x, geom.y])
-                else:
-                    # Para otras geometrías, usar el centroide
-                    centroid = geom.centroid
-                    coords.append([centroid.x, centroid.y])
-        
-        if len(coords) < 4:
+        # Centroides vectorizados (para puntos, el propio punto)
+        geoms = np.asarray(self.gdf.geometry.values, dtype=object)
+        positions = np.flatnonzero(~shapely.is_missing(geoms) & ~shapely.is_empty(geoms))
+        
+        if len(positions) < 4:
             return []
         
-        coords = np.array(coords)
-        
-        # Calcular IQR para cada dimensión
-        outliers = []
-        for dim in [0, 1]:  # x, y
-            q1 = np.percentile(coords[:, dim], 25)
-            q3 = np.percentile(coords[:, dim], 75)
-            iqr = q3 - q1
-            
-            lower_bound = q1 - 1.5 * iqr
-            upper_bound = q3 + 1.5 * iqr
-            
-            outlier_indices = np.where(
-                (coords[:, dim] < lower_bound) | (coords[:, dim] > upper_bound)
-            )[0]
-            
-            for idx in outlier_indices:
-                outliers.append({
-                    'index': int(idx),
-                    'dimension': 'x' if dim == 0 else 'y',
-                    'value': float(coords[idx, dim]),
-                    'bounds': [float(lower_bound), float(upper_bound)]
-                })
-        
-        return outliers
+        geoms = geoms[positions]
+        if not (shapely.get_type_id(geoms) == 0).all():
+            geoms = shapely.centroid(geoms)
+        coords = shapely.get_coordinates(geoms)
+        distances = self._robust_distances(coords)
+        if distances is None:
+            return []
+        
+        # Umbral chi² con 2 grados de libertad: F⁻¹(p) = -2·ln(1 - p)
+        candidates = np.flatnonzero(distances > -2 * np.log(1 - self.OUTLIER_QUANTILE))
+        isolation = np.empty(0)
+        if len(candidates):
+            detached, isolation = self._detached_from_core(coords, candidates)
+            candidates, isolation = candidates[detached], isolation[detached]
+        
+        order = np.argsort(-distances[candidates], kind='stable')
+        return [
+            {
+                'index': int(positions[i]),
+                'x': float(coords[i, 0]),
+                'y': float(coords[i, 1]),
+                'distancia_robusta': float(np.sqrt(distances[i])),
+                'aislamiento': float(isolation[j])
+            }
+            for j, i in zip(order, candidates[order])
+        ]
+    
+    def _robust_distances(self, coords: np.ndarray) -> Optional[np.ndarray]:
+        """Distancias de Mahalanobis al cuadrado respecto a una covarianza robusta
+        
+        Pasos C del MCD: partiendo de mediana/MAD, la covarianza se reestima con
+        la fracción ``OUTLIER_SUBSET`` de entidades más cercanas hasta que su
+        determinante deja de bajar (``OUTLIER_TOLERANCE``). El ajuste usa a lo sumo ``OUTLIER_FIT_SIZE``
+        entidades; las distancias se calculan para todas.
+        """
+        fit = coords
+        if len(fit) > self.OUTLIER_FIT_SIZE:
+            fit = fit[np.random.default_rng(0).choice(len(fit), self.OUTLIER_FIT_SIZE, replace=False)]
+        
+        # Centrar en la mediana evita perder precisión con coordenadas proyectadas
+        center = np.median(fit, axis=0)
+        fit = fit - center
+        scale = np.median(np.abs(fit), axis=0) * 1.4826
+        scale = np.where(scale > 0, scale, fit.std(axis=0))
+        if not (scale > 0).any():
+            return None
+        scale[scale == 0] = 1.0
+        
+        def mahalanobis(points: np.ndarray, mean: np.ndarray, inverse: np.ndarray) -> np.ndarray:
+            diff = points - mean
+            return ((diff @ inverse) * diff).sum(axis=1)
+        
+        h = max(int(len(fit) * self.OUTLIER_SUBSET), 3)
+        mean, inverse = np.zeros(2), np.diag(1.0 / scale ** 2)
+        determinant = np.inf
+        for _ in range(self.OUTLIER_MAX_ITERATIONS):
+            subset = fit[np.argpartition(mahalanobis(fit, mean, inverse), h - 1)[:h]]
+            covariance = np.cov(subset, rowvar=False)
+            # Regularización mínima para capas colineales
+            covariance += np.eye(2) * np.trace(covariance) * 1e-12
+            new_determinant = np.linalg.det(covariance)
+            if not new_determinant > 0 or new_determinant >= determinant * (1 - self.OUTLIER_TOLERANCE):
+                break
+            mean, inverse, determinant = subset.mean(axis=0), np.linalg.inv(covariance), new_determinant
+        if not np.isfinite(determinant):
+            return None
+        
+        # Corrección de consistencia: la mediana de d² debe ser la de una chi² con 2 g.l. (2·ln 2)
+        median = np.median(mahalanobis(fit, mean, inverse))
+        if not median > 0:
+            return None
+        return mahalanobis(coords - center, mean, inverse) * (2 * np.log(2) / median)
+    
+    def _detached_from_core(self, coords: np.ndarray, candidates: np.ndarray):
+        """Candidatas que no alcanzan el núcleo (no candidatas) con saltos cortos entre ellas
+        
+        El salto máximo es ``LOCAL_OUTLIER_RATIO`` veces la distancia típica al
+        k-ésimo vecino del núcleo (KD-tree). Retorna la máscara de candidatas
+        separadas y su aislamiento: distancia al núcleo dividida por esa distancia típica.
+        """
+        k = self.LOCAL_OUTLIER_NEIGHBORS
+        core = np.ones(len(coords), dtype=bool)
+        core[candidates] = False
+        core = coords[core]
+        rng = np.random.default_rng(0)
+        if len(core) > self.OUTLIER_FIT_SIZE:
+            core = core[rng.choice(len(core), self.OUTLIER_FIT_SIZE, replace=False)]
+        if len(core) <= k:
+            return np.ones(len(candidates), dtype=bool), np.full(len(candidates), np.inf)
+        
+        core_tree = cKDTree(core)
+        probe = core[rng.choice(len(core), min(len(core), self.OUTLIER_SPACING_SAMPLE), replace=False)]
+        spacing = np.median(core_tree.query(probe, k=k + 1)[0][:, -1])
+        if not spacing > 0:
+            spacing = np.finfo(float).eps
+        max_step = self.LOCAL_OUTLIER_RATIO * spacing
+        
+        points = coords[candidates]
+        core_distance = core_tree.query(points, k=1, distance_upper_bound=max_step)[0]
+        near_core = core_distance <= max_step
+        if near_core.all():
+            return np.zeros(len(candidates), dtype=bool), core_distance / spacing
+        
+        # Componentes en una rejilla de lado max_step/2: las candidatas de celdas vecinas
+        # (8-conectividad) quedan unidas; las de celdas cercanas al núcleo arrastran su componente
+        cell_keys = np.floor((points - points.min(axis=0)) / (max_step / 2)).clip(-2 ** 62, 2 ** 62).astype(np.int64)
+        cell_dtype = np.dtype([('i', np.int64), ('j', np.int64)])
+        cells, cell_of = np.unique(cell_keys, axis=0, return_inverse=True)
+        cell_of = cell_of.ravel()
+        records = np.ascontiguousarray(cells).view(cell_dtype).ravel()
+        rows, cols = [], []
+        for di, dj in ((0, 1), (1, -1), (1, 0), (1, 1)):
+            shifted = np.ascontiguousarray(cells + [di, dj]).view(cell_dtype).ravel()
+            found = np.minimum(np.searchsorted(records, shifted), len(records) - 1)
+            hit = records[found] == shifted
+            rows.append(np.flatnonzero(hit))
+            cols.append(found[hit])
+        rows, cols = np.concatenate(rows), np.concatenate(cols)
+        graph = coo_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(cells), len(cells)))
+        _, labels = connected_components(graph, directed=False)
+        labels = labels[cell_of]
+        attached = np.zeros(labels.max() + 1, dtype=bool)
+        attached[labels[near_core]] = True
+        detached = ~attached[labels]
+        
+        # Distancia exacta al núcleo de las separadas (la consulta anterior se cortó en el salto)
+        core_distance[detached] = core_tree.query(points[detached], k=1)[0]
+        return detached, core_distance / spacing
     
     def _calculate_statistics(self) -> Dict[str, Any]:
         """Calcula estadísticas básicas"""
-        bounds = self.gdf.total_bounds
+        bounds = self.context.bounds
         area = None
+        area_interval = None
         
-        # Calcular área si es posible
+        # Calcular área si es posible (sobre la vista proyectada compartida);
+        # en modo muestreo se expande el área de la muestra al total de entidades
         if len(self.gdf) > 0:
             try:
-                # Convertir a CRS proyectado para calcular área
-                if self.gdf.crs and not self.gdf.crs.is_geographic:
-                    area = self.gdf.geometry.area.sum()
-                else:
-                    # Si es geográfico, usar una proyección local
-                    gdf_projected = self.gdf.to_crs('EPSG:3116')  # Bogotá
-                    area = gdf_projected.geometry.area.sum()
+                if self.context.is_metric:
+                    areas = np.nan_to_num(self.context.sample.projected.geometry.area.to_numpy())
+                    area = areas.sum() * self.context.expansion_factor
+                    if self.context.is_sampled:
+                        factor = self.context.expansion_factor
+                        area_interval = self.context.sample_statistics.from_sums(
+                            areas[:, np.newaxis], lambda s: s[..., 0] * factor
+                        )
             except Exception:
                 pass
         
-        return {
+        statistics = {
             'num_features': len(self.gdf),
             'bounds': bounds.tolist(),
             'area_estimated': float(area) if area is not None else None
         }
+        if self.context.is_sampled:
+            statistics['muestreo'] = {
+                **self.context.sampling_summary(),
+                'metricas': {'area_estimada': area_interval} if area_interval else {}
+            }
+        return statistics
@@ -1,5 +1,6 @@
 from typing import Dict, Any
 from app.models.spatial_analysis import ConfiabilidadEnum
+from app.services.validation.geometric_validator import INVALID_GEOMETRY_TYPES, count_errors
 
 class QualityAssessor:
     """Evalúa la calidad general y asigna nivel de confiabilidad"""
@@ -22,11 +23,11 @@ class QualityAssessor:
         
         # Factor 2: Validación geométrica
         validation_results = analysis_results.get('validation', {})
-        if validation_results.get('is_valid', False) and len(validation_results.get('errors', [])) == 0:
+        error_count = count_errors(validation_results)
+        if validation_results.get('is_valid', False) and error_count == 0:
             confidence_score += 0.3
             reasons.append("Geometrías válidas")
         else:
-            error_count = len(validation_results.get('errors', []))
             if error_count > 0:
                 confidence_score -= 0.2 * min(error_count / 10, 1.0)
                 reasons.append(f"Se encontraron {error_count} errores geométricos")
@@ -79,9 +80,18 @@ class QualityAssessor:
             recomendaciones.append("Se recomienda revisar manualmente el CRS y las coordenadas")
             recomendaciones.append("Verificar la fuente de los datos y sus metadatos originales")
         
-        if results.get('validation', {}).get('errors'):
+        validation = results.get('validation', {})
+        if count_errors(validation, INVALID_GEOMETRY_TYPES):
             recomendaciones.append("Corregir las geometrías inválidas antes de usar los datos")
         
+        topology = validation.get('topology') or {}
+        if (
+            topology.get('duplicadas', {}).get('cantidad')
+            or topology.get('superposiciones', {}).get('cantidad')
+            or (topology.get('huecos') or {}).get('cantidad')
+        ):
+            recomendaciones.append("Eliminar geometrías duplicadas y corregir superposiciones y huecos entre polígonos")
+        
         if len(results.get('validation', {}).get('outliers', [])) > 0:
             recomendaciones.append("Revisar y validar los outliers detectados")
         
@@ -110,6 +120,14 @@ class QualityAssessor:
         
         """
         
+        muestreo = results.get('muestreo')
+        if muestreo:
+            explanation += (
+                f"Métricas estimadas sobre una muestra espacial estratificada de "
+                f"{muestreo['tamaño_muestra']} de {muestreo['total_entidades']} entidades "
+                f"(intervalos de confianza al {muestreo['confianza']:.0%}).\n\n        "
+            )
+        
         if nivel == "verde":
             explanation += "Los datos son confiables y están listos para uso en análisis espaciales."
         elif nivel == "amarillo":
@@ -3,6 +3,7 @@ Evaluador de idoneidad de datos espaciales para diferentes casos de uso
 """
 from typing import Dict, Any, Optional, List
 from app.models.validation_result import ValidationResult
+from app.services.validation.geometric_validator import INVALID_GEOMETRY_TYPES, count_errors
 
 
 class UseCaseAssessor:
@@ -17,6 +18,7 @@ class UseCaseAssessor:
             'crs_requerido': 'oficial',      # MAGNA-SIRGAS
             'geometrias_validas': True,
             'outliers_max': 0.01,            # 1% máximo
+            'topologia_limpia': True,        # Sin duplicados, superposiciones ni huecos
         },
         'topografia_obra': {
             'error_planimetrico_max': 2.0,   # metros
@@ -59,7 +61,7 @@ class UseCaseAssessor:
         """Evalúa idoneidad para catastro"""
         criteria = self.USE_CASE_CRITERIA['catastro']
         score = 0.0
-        max_score = 6.0
+        max_score = 7.0
         reasons = []
         recomendaciones = []
         
@@ -111,12 +113,12 @@ class UseCaseAssessor:
         
         # Criterio 5: Geometrías válidas
         validation = analysis_data.get('validation', {})
-        errors = validation.get('errors', [])
-        if len(errors) == 0:
+        invalid_count = count_errors(validation, INVALID_GEOMETRY_TYPES)
+        if invalid_count == 0:
             score += 0.5
             reasons.append("Todas las geometrías son válidas")
         else:
-            reasons.append(f"Se encontraron {len(errors)} geometrías inválidas")
+            reasons.append(f"Se encontraron {invalid_count} geometrías inválidas")
             recomendaciones.append("Corregir geometrías inválidas antes de usar en catastro")
         
         # Criterio 6: Outliers
@@ -130,6 +132,27 @@ class UseCaseAssessor:
             reasons.append(f"Ratio de outliers alto ({outlier_ratio:.2%} > {criteria['outliers_max']:.2%})")
             recomendaciones.append("Revisar y validar outliers antes de usar en catastro")
         
+        # Criterio 7: Topología (predios sin duplicados, superposiciones ni huecos)
+        topology = validation.get('topology')
+        if topology:
+            huecos = (topology.get('huecos') or {}).get('cantidad', 0)
+            problemas = {
+                'duplicados': topology['duplicadas']['cantidad'],
+                'superposiciones': topology['superposiciones']['cantidad'],
+                'huecos': huecos
+            }
+            if not any(problemas.values()):
+                score += 1.0
+                reasons.append("Topología limpia: sin duplicados, superposiciones ni huecos")
+            else:
+                detalle = ', '.join(f"{cantidad} {nombre}" for nombre, cantidad in problemas.items() if cantidad)
+                reasons.append(f"Errores topológicos: {detalle}")
+                recomendaciones.append("Eliminar duplicados y corregir superposiciones y huecos entre predios")
+        else:
+            # Sin resultado (rasters, diagnósticos anteriores): el criterio no cuenta en el puntaje
+            max_score -= 1.0
+            reasons.append("Topología no evaluada")
+        
         # Determinar idoneidad
         idoneidad = score >= max_score * 0.7  # 70% del score máximo
         
@@ -185,12 +208,12 @@ class UseCaseAssessor:
         
         # Criterio 4: Geometrías válidas
         validation = analysis_data.get('validation', {})
-        errors = validation.get('errors', [])
-        if len(errors) == 0:
+        invalid_count = count_errors(validation, INVALID_GEOMETRY_TYPES)
+        if invalid_count == 0:
             score += 1.0
             reasons.append("Todas las geometrías son válidas")
         else:
-            reasons.append(f"Se encontraron {len(errors)} geometrías inválidas")
+            reasons.append(f"Se encontraron {invalid_count} geometrías inválidas")
             recomendaciones.append("Corregir geometrías inválidas")
         
         idoneidad = score >= max_score * 0.6  # 60% del score máximo
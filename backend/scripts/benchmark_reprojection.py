@@ -0,0 +1,77 @@
+"""
+Benchmark de la reproyección particionada
+
+Genera curvas de nivel sintéticas en MAGNA-SIRGAS Bogotá (EPSG:3116), las
+lleva a Origen Nacional (EPSG:9377) en serie y con 1..N procesos, y reporta
+tiempos, aceleración y la diferencia máxima frente a ``GeoDataFrame.to_crs``.
+
+Uso (desde backend/):
+    python -m scripts.benchmark_reprojection --vertices 5000000 --workers 1 2 4 8
+"""
+import argparse
+import os
+import time
+import numpy as np
+import shapely
+import geopandas as gpd
+from app.services.spatial.crs_pool import get_transformer
+from app.services.transformation.parallel_reprojection import ParallelReprojector
+
+CRS_SOURCE = 'EPSG:3116'
+CRS_TARGET = 'EPSG:9377'
+
+
+def contour_layer(vertices: int, vertices_per_line: int = 1000, seed: int = 42) -> gpd.GeoDataFrame:
+    """Líneas onduladas alrededor de Bogotá con ``vertices`` vértices en total"""
+    rng = np.random.default_rng(seed)
+    lines = max(1, vertices // vertices_per_line)
+    t = np.linspace(0, 2 * np.pi, vertices_per_line)
+    offsets = rng.uniform(-50_000, 50_000, size=(lines, 2)) + 1_000_000
+    x = offsets[:, :1] + 2_000 * np.cos(t)
+    y = offsets[:, 1:] + 2_000 * np.sin(t) + 200 * np.sin(7 * t)
+    coords = np.stack([x, y], axis=-1).reshape(-1, 2)
+    indices = np.repeat(np.arange(lines), vertices_per_line)
+    geoms = shapely.linestrings(coords, indices=indices)
+    return gpd.GeoDataFrame(geometry=geoms, crs=CRS_SOURCE)
+
+
+def timed(func, repeat: int):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--vertices', type=int, default=5_000_000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument('--chunk-size', type=int, default=None)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    gdf = contour_layer(args.vertices)
+    geoms = np.asarray(gdf.geometry.values, dtype=object)
+    transformer = get_transformer(CRS_SOURCE, CRS_TARGET)
+    print(f"{len(gdf)} líneas, {shapely.get_num_coordinates(geoms).sum()} vértices, {os.cpu_count()} núcleos")
+
+    baseline, expected = timed(lambda: gdf.to_crs(CRS_TARGET), args.repeat)
+    expected = shapely.get_coordinates(np.asarray(expected.geometry.values, dtype=object))
+    print(f"{'gpd.to_crs':>12}  {baseline:8.3f} s")
+
+    for workers in sorted(set(args.workers)):
+        reprojector = ParallelReprojector(mode='process', max_workers=workers, chunk_size=args.chunk_size, min_coordinates=1)
+        try:
+            # La primera llamada arranca el pool; no se cuenta
+            reprojector.transform_geometries(geoms[:1], transformer)
+            elapsed, result = timed(lambda: reprojector.transform_geometries(geoms, transformer), args.repeat)
+        finally:
+            reprojector.shutdown()
+        error = np.abs(shapely.get_coordinates(result) - expected).max()
+        print(f"{workers:>10} p  {elapsed:8.3f} s  x{baseline / elapsed:5.2f}  dif. máx {error:.2e} m")
+
+
+if __name__ == '__main__':
+    main()
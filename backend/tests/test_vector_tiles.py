@@ -0,0 +1,150 @@
+"""
+Ida y vuelta del codificador MVT: se decodifica la tesela con un lector protobuf mínimo
+"""
+from typing import Dict, List, Tuple
+
+import geopandas as gpd
+import pytest
+import shapely
+from shapely.geometry import LineString, MultiPoint, Polygon
+from shapely.geometry.polygon import orient
+
+from app.core.config import settings
+from app.services.spatial.vector_tiles import WEB_MERCATOR_CRS, WEB_MERCATOR_HALF, TileLayer
+
+# Tesela z=1, x=1, y=0: cuadrante noreste, con origen de la rejilla en (0, WEB_MERCATOR_HALF)
+Z, X, Y = 1, 1, 0
+
+
+def read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value, shift = 0, 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def read_fields(data: bytes) -> List[Tuple[int, object]]:
+    """Campos (número, valor) de un mensaje con solo varints y campos delimitados"""
+    fields, pos = [], 0
+    while pos < len(data):
+        key, pos = read_varint(data, pos)
+        field, wire_type = key >> 3, key & 0x7
+        if wire_type == 0:
+            value, pos = read_varint(data, pos)
+        elif wire_type == 2:
+            size, pos = read_varint(data, pos)
+            value, pos = data[pos:pos + size], pos + size
+        else:
+            raise AssertionError(f"Tipo de campo inesperado: {wire_type}")
+        fields.append((field, value))
+    return fields
+
+
+def decode_geometry(data: bytes) -> List[List[Tuple[int, int]]]:
+    """Trayectorias de una geometría MVT; cada ClosePath se marca con None al final"""
+    values, pos = [], 0
+    while pos < len(data):
+        value, pos = read_varint(data, pos)
+        values.append(value)
+
+    paths: List[List[Tuple[int, int]]] = []
+    x = y = 0
+    i = 0
+    while i < len(values):
+        command, count = values[i] & 0x7, values[i] >> 3
+        i += 1
+        if command == 7:
+            paths[-1].append(None)
+            continue
+        for _ in range(count):
+            dx, dy = values[i], values[i + 1]
+            i += 2
+            x += (dx >> 1) ^ -(dx & 1)
+            y += (dy >> 1) ^ -(dy & 1)
+            if command == 1:
+                paths.append([(x, y)])
+            else:
+                assert command == 2
+                paths[-1].append((x, y))
+    return paths
+
+
+def decode_tile(tile: bytes) -> Dict[str, object]:
+    (field, layer), = read_fields(tile)
+    assert field == 3
+    decoded = {'features': []}
+    for field, value in read_fields(layer):
+        if field == 15:
+            decoded['version'] = value
+        elif field == 1:
+            decoded['name'] = value.decode('utf-8')
+        elif field == 5:
+            decoded['extent'] = value
+        elif field == 2:
+            feature = dict(read_fields(value))
+            decoded['features'].append({
+                'id': feature[1], 'type': feature[3], 'geometry': feature[4], 'paths': decode_geometry(feature[4])
+            })
+    return decoded
+
+
+def signed_area(ring: List[Tuple[int, int]]) -> float:
+    """Área con signo en coordenadas de tesela (eje Y hacia abajo)"""
+    return sum(x0 * y1 - x1 * y0 for (x0, y0), (x1, y1) in zip(ring, ring[1:] + ring[:1])) / 2
+
+
+@pytest.mark.parametrize('sign', [1.0, -1.0])
+def test_round_trip_polygon_with_hole_multipoint_and_clipped_line(sign):
+    extent = settings.TILE_EXTENT
+    pixel = WEB_MERCATOR_HALF / extent  # Metros por unidad de la rejilla en z=1
+
+    def mercator(points):
+        return [(px * pixel, WEB_MERCATOR_HALF - py * pixel) for px, py in points]
+
+    exterior = [(100, 100), (1000, 100), (1000, 1000), (100, 1000)]
+    hole = [(300, 300), (300, 500), (500, 500), (500, 300)]
+    # La orientación de entrada (exterior horario o antihorario) no debe importar
+    polygon = orient(Polygon(mercator(exterior), [mercator(hole)]), sign=sign)
+    points = MultiPoint(mercator([(10, 20), (30, 40)]))
+    line = LineString(mercator([(2000, 2000), (extent + 1000, 2000)]))
+    layer = TileLayer(gpd.GeoDataFrame(geometry=[polygon, points, line], crs=WEB_MERCATOR_CRS), name='prueba')
+
+    tile = decode_tile(layer.render(Z, X, Y))
+
+    assert tile['version'] == 2
+    assert tile['name'] == 'prueba'
+    assert tile['extent'] == extent
+    # Se codifican por dimensión (puntos, líneas, polígonos); el id es la fila + 1
+    features = {feature['id']: feature for feature in tile['features']}
+    assert [feature['id'] for feature in tile['features']] == [2, 3, 1]
+
+    # Multipunto: un solo MoveTo con ambos puntos
+    assert features[2]['type'] == 1
+    assert read_varint(features[2]['geometry'], 0)[0] == (2 << 3) | 1
+    assert features[2]['paths'] == [[(10, 20)], [(30, 40)]]
+
+    # Línea recortada en el borde de la tesela más el margen
+    assert features[3]['type'] == 2
+    assert features[3]['paths'] == [[(2000, 2000), (extent + layer.buffer, 2000)]]
+
+    # Polígono: exterior con área positiva y hueco negativa, anillos sin vértice de cierre
+    assert features[1]['type'] == 3
+    outer, inner = features[1]['paths']
+    assert outer[-1] is None and inner[-1] is None
+    outer, inner = outer[:-1], inner[:-1]
+    assert len(outer) == 4 and set(outer) == set(exterior)
+    assert len(inner) == 4 and set(inner) == set(hole)
+    assert signed_area(outer) == 900 * 900
+    assert signed_area(inner) == -200 * 200
+
+
+def test_feature_outside_tile_is_not_encoded():
+    layer = TileLayer(gpd.GeoDataFrame(
+        geometry=[shapely.Point(-5e6, -5e6), shapely.Point(1000.0, 1000.0)], crs=WEB_MERCATOR_CRS
+    ))
+    tile = decode_tile(layer.render(Z, X, Y))
+    assert [feature['id'] for feature in tile['features']] == [2]
@@ -11,7 +11,7 @@ export default function FileUploader({ onUploadSuccess, onUploadError }: FileUpl
   const [isUploading, setIsUploading] = useState(false)
 
   const handleFile = useCallback(async (file: File) => {
-    const validExtensions = ['.shp', '.geojson', '.json', '.csv']
+    const validExtensions = ['.shp', '.geojson', '.json', '.csv', '.zip']
     const fileExtension = file.name.toLowerCase().substring(file.name.lastIndexOf('.'))
     
     if (!validExtensions.includes(fileExtension)) {
@@ -71,7 +71,7 @@ export default function FileUploader({ onUploadSuccess, onUploadError }: FileUpl
       <input
         type="file"
         id="file-input"
-        accept=".shp,.geojson,.json,.csv"
+        accept=".shp,.geojson,.json,.csv,.zip"
         onChange={handleFileInput}
         disabled={isUploading}
         className="hidden"
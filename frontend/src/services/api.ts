@@ -31,6 +31,18 @@ export interface AnalysisResponse {
   explicacion_tecnica: string | null
 }
 
+export interface DiagnosisJobResponse {
+  id: string
+  archivo_id: number
+  estado: 'pendiente' | 'en_proceso' | 'completado' | 'error'
+  etapa_actual: string | null
+  progreso: Record<string, string>
+  porcentaje: number
+  analisis_id: number | null
+  resultado: AnalysisResponse | null
+  error: string | null
+}
+
 export interface AnalysisPreview {
   geojson: any
   crs_aplicado: string
@@ -86,11 +98,42 @@ export const uploadFile = async (file: File): Promise<FileUploadResponse> => {
   return response.data
 }
 
-export const diagnoseFile = async (fileId: number): Promise<AnalysisResponse> => {
-  const response = await api.post<AnalysisResponse>(`/analysis/${fileId}/diagnose`)
+export const submitDiagnosis = async (fileId: number): Promise<DiagnosisJobResponse> => {
+  const response = await api.post<DiagnosisJobResponse>(`/analysis/${fileId}/diagnose`)
+  return response.data
+}
+
+export const getDiagnosisJob = async (jobId: string): Promise<DiagnosisJobResponse> => {
+  const response = await api.get<DiagnosisJobResponse>(`/analysis/jobs/${jobId}`)
   return response.data
 }
 
+// Encola el diagnóstico y consulta el trabajo hasta que termina
+export const diagnoseFile = async (
+  fileId: number,
+  onProgress?: (job: DiagnosisJobResponse) => void,
+  pollIntervalMs: number = 1000,
+  maxWaitMs: number = 30 * 60 * 1000
+): Promise<AnalysisResponse> => {
+  let job = await submitDiagnosis(fileId)
+  const deadline = Date.now() + maxWaitMs
+  while (job.estado === 'pendiente' || job.estado === 'en_proceso') {
+    onProgress?.(job)
+    if (Date.now() >= deadline) {
+      throw { response: { data: { detail: 'El análisis tardó demasiado; consulte el trabajo más tarde' } } }
+    }
+    await new Promise((resolve) => setTimeout(resolve, pollIntervalMs))
+    job = await getDiagnosisJob(job.id)
+  }
+  onProgress?.(job)
+
+  if (job.estado === 'error' || !job.resultado) {
+    // Mismo formato que los errores HTTP para que las páginas muestren `detail`
+    throw { response: { data: { detail: job.error || 'Error al analizar el archivo' } } }
+  }
+  return job.resultado
+}
+
 export const getAnalysis = async (analysisId: number): Promise<AnalysisResponse> => {
   const response = await api.get<AnalysisResponse>(`/analysis/${analysisId}`)
   return response.data